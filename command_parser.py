@@ -0,0 +1,306 @@
+#!/usr/bin/python3
+"""Module with the parser of the console's dot syntax.
+
+Commands like <class name>.<method>(<arguments>)[.<method>(...)] are
+split into tokens by a single regular expression going once through the
+line, and the tokens are read by a small recursive descent parser that
+builds typed arguments directly:
+
+    "text" or 'text': the string, with backslash escapes.
+    12, -3, 1.5, 2e3: int or float.
+    {...} and [...]: dict and list, with keys and values read the same
+        way. true, false and null are True, False and None inside them.
+    <attribute><operator><value>: a condition, where the operator is one
+        of =, ==, !=, <, <=, > and >=.
+    Other words, like ids: the word as a string.
+
+Usage:
+    python3 command_parser.py [<number of commands>]
+
+runs a benchmark printing how many commands are parsed per second.
+"""
+
+import re
+import sys
+import time
+
+_token = re.compile(r"""
+    (?P<space>\s+)
+    | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?
+        (?=[\s,)\]}:]|$))
+    | (?P<op>==|!=|<=|>=|[=<>])
+    | (?P<punct>[.,(){}\[\]:])
+    | (?P<word>[^\s.,(){}\[\]:=<>!'"]+)
+    | (?P<error>.)
+    """, re.VERBOSE | re.DOTALL)
+_escape = re.compile(r'\\(.)')
+_literals = {'true': True, 'false': False, 'null': None}
+
+
+class ParseError(ValueError):
+    """Error raised for a line that doesn't follow the dot syntax
+
+    Attributes:
+        method (str): Name of the first method called by the line, or None
+            if the error comes before it.
+    """
+
+    def __init__(self, message, method=None):
+        """Initialize a ParseError
+
+        Args:
+            message (str): Description of the error.
+            method (str): Name of the first method called by the line.
+        """
+
+        super().__init__(message)
+        self.method = method
+
+
+def tokenize(line):
+    """Splits a line into tokens
+
+    Args:
+        line (str): Command line.
+
+    Returns:
+        list: (kind, text) tuples, where kind is the name of a group of
+            the token expression. Spaces are left out, and characters that
+            can't start a token are 'error' tokens, reported by the parser
+            when it gets to them.
+    """
+
+    tokens = []
+    pos = 0
+    end = len(line)
+    match = _token.match
+    while pos < end:
+        found = match(line, pos)
+        kind = found.lastgroup
+        if kind != 'space':
+            tokens.append((kind, found.group()))
+        pos = found.end()
+
+    return tokens
+
+
+class _Parser(object):
+    """Recursive descent parser over the tokens of a line"""
+
+    def __init__(self, tokens):
+        """Initialize a parser
+
+        Args:
+            tokens (list): Tokens returned by tokenize().
+        """
+
+        self.tokens = tokens
+        self.pos = 0
+        self.method = None
+
+    def error(self, message):
+        """Returns a ParseError for the current position"""
+
+        kind, text = self.peek()
+        if kind == 'error':
+            message = f"unexpected character {text!r}"
+        return ParseError(message, self.method)
+
+    def peek(self):
+        """Returns the current token, or (None, None) at the end"""
+
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def expect(self, text):
+        """Consumes a punctuation token
+
+        Args:
+            text (str): Expected punctuation.
+        """
+
+        if self.peek() != ('punct', text):
+            raise self.error(f"expected {text!r}")
+        self.pos += 1
+
+    def name(self):
+        """Consumes and returns a word"""
+
+        kind, text = self.peek()
+        if kind != 'word':
+            raise self.error("expected a name")
+        self.pos += 1
+        return text
+
+    def command(self):
+        """Parses <class name>.<method>(<arguments>)[.<method>(...)]
+
+        Returns:
+            tuple: Class name and list of the calls, as returned by call().
+        """
+
+        class_name = self.name()
+        calls = []
+        while True:
+            self.expect('.')
+            calls.append(self.call())
+            if self.peek() == (None, None):
+                return class_name, calls
+
+    def call(self):
+        """Parses <method>(<arguments>)
+
+        Returns:
+            tuple: Method name, list of the positional arguments and list
+                of the (attribute name, operator, value) conditions.
+        """
+
+        method = self.name()
+        if self.method is None:
+            self.method = method
+        self.expect('(')
+        args = []
+        conditions = []
+        if self.peek() != ('punct', ')'):
+            while True:
+                kind, text = self.peek()
+                if (kind == 'word' and self.pos + 1 < len(self.tokens)
+                        and self.tokens[self.pos + 1][0] == 'op'):
+                    op = self.tokens[self.pos + 1][1]
+                    self.pos += 2
+                    conditions.append((text, op, self.value(False)))
+                else:
+                    args.append(self.value(False))
+                if self.peek() != ('punct', ','):
+                    break
+                self.pos += 1
+        self.expect(')')
+
+        return method, args, conditions
+
+    def value(self, nested):
+        """Parses a value
+
+        Args:
+            nested (bool): Whether the value is inside a dict or a list,
+                where true, false and null are literals.
+
+        Returns:
+            str | int | float | dict | list | bool | None: Typed value.
+        """
+
+        kind, text = self.peek()
+        self.pos += 1
+        if kind == 'string':
+            text = text[1:-1]
+            return _escape.sub(r'\1', text) if '\\' in text else text
+        if kind == 'number':
+            if '.' in text or 'e' in text or 'E' in text:
+                return float(text)
+            return int(text)
+        if kind == 'word':
+            if nested and text in _literals:
+                return _literals[text]
+            return text
+        if (kind, text) == ('punct', '{'):
+            return self.container('}', True)
+        if (kind, text) == ('punct', '['):
+            return self.container(']', False)
+        self.pos -= 1
+        raise self.error("expected a value")
+
+    def container(self, close, mapping):
+        """Parses the rest of a dict or a list after its opening bracket
+
+        Args:
+            close (str): Closing bracket.
+            mapping (bool): Whether it's a dict.
+
+        Returns:
+            dict | list: Parsed container.
+        """
+
+        items = {} if mapping else []
+        if self.peek() == ('punct', close):
+            self.pos += 1
+            return items
+
+        while True:
+            if mapping:
+                start = self.pos
+                key = self.value(True)
+                if isinstance(key, (dict, list)):
+                    self.pos = start
+                    raise self.error("expected a key")
+                self.expect(':')
+                items[key] = self.value(True)
+            else:
+                items.append(self.value(True))
+            if self.peek() != ('punct', ','):
+                break
+            self.pos += 1
+        self.expect(close)
+
+        return items
+
+
+def parse(line):
+    """Parses a command in the dot syntax
+
+    Example:
+        >>> parse('Place.where(price_by_night<100).limit(5)')
+        ('Place', [('where', [], [('price_by_night', '<', 100)]),
+                   ('limit', [5], [])])
+
+    Args:
+        line (str): Command line.
+
+    Returns:
+        tuple: Class name and list of (method name, arguments, conditions)
+            tuples, one per call.
+
+    Raises:
+        ParseError: If the line doesn't follow the syntax.
+    """
+
+    return _Parser(tokenize(line)).command()
+
+
+samples = [
+    'User.all()',
+    'User.count()',
+    'User.show("246c227a-d5c1-403d-9bc7-6a47bb9f0f68")',
+    'User.destroy(246c227a-d5c1-403d-9bc7-6a47bb9f0f68)',
+    'User.update("38f22813-2753-4d42-b37c-57a17f1e4f88", "first_name", '
+    '"John")',
+    'User.update("38f22813-2753-4d42-b37c-57a17f1e4f88", {"first_name": '
+    '"John", "age": 89, "tags": ["a", "b"]})',
+    'Place.where(price_by_night<100, max_guest>=4).order_by('
+    'price_by_night).limit(20)',
+    ]
+
+
+def benchmark(count):
+    """Parses the sample commands in turn and reports the throughput
+
+    Args:
+        count (int): Number of commands to parse.
+
+    Returns:
+        float: Commands parsed per second.
+    """
+
+    lines = [samples[i % len(samples)] for i in range(count)]
+    start = time.perf_counter()
+    for line in lines:
+        parse(line)
+    elapsed = time.perf_counter() - start
+
+    return count / elapsed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{benchmark(count):.0f} commands parsed per second")
@@ -1,8 +1,18 @@
 #!/usr/bin/python3
 """Module containing command interpreter"""
+import argparse
 import cmd
+import contextlib
+import itertools
 import json
-
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import command_parser
+# Importing the models adds them to BaseModel.registry.
 from models.base_model import BaseModel
 from models.user import User
 from models.place import Place
@@ -13,21 +23,89 @@ from models.state import State
 from models import storage
 
 
+class _ErrorFilter(object):
+    """Output stream of the commands of a batch script, keeping their error
+    messages apart.
+
+    Lines starting with *, like "** no instance found **" or
+    "*** Unknown syntax: ...", are error messages. They're kept in
+    `messages`, other lines are passed through to the stream as they're
+    written.
+
+    Attributes:
+        messages (list): Error messages written, without their newline.
+    """
+
+    def __init__(self, out):
+        """Initialize an _ErrorFilter
+
+        Args:
+            out (file): Stream the other lines are written to.
+        """
+
+        self.out = out
+        self.messages = []
+        self.line = None
+        self.start = True
+
+    def write(self, text):
+        """Writes text, keeping the error messages
+
+        Args:
+            text (str): Text to write.
+
+        Returns:
+            int: Number of characters written.
+        """
+
+        size = len(text)
+        while text:
+            if self.start:
+                self.start = False
+                if text[0] == '*':
+                    self.line = ''
+            head, newline, text = text.partition('\n')
+            if self.line is None:
+                self.out.write(head + newline)
+            else:
+                self.line += head
+                if newline:
+                    self.messages.append(self.line)
+                    self.line = None
+            self.start = bool(newline)
+
+        return size
+
+    def __getattr__(self, name):
+        """Return the other attributes of the stream, like flush"""
+
+        return getattr(self.out, name)
+
+
 class HBNBCommand(cmd.Cmd):
     """HBNBCommand Class"""
 
     prompt = '(hbnb) '
 
     objects = storage.all()
-    classes = {
-        'BaseModel': BaseModel,
-        'User': User,
-        'Amenity': Amenity,
-        'Place': Place,
-        'City': City,
-        'Review': Review,
-        'State': State,
-    }
+    classes = BaseModel.registry
+
+    # Size in characters of the chunks written by all.
+    buffer_size = 1 << 16
+
+    # Output formats of show, all, count and where, changed with set.
+    formats = ('text', 'json')
+    output_format = 'text'
+
+    # Commands changing the storage, refused when it's read-only.
+    writes = ('create', 'create_many', 'destroy', 'destroy_where', 'update')
+
+    # Messages for invalid arguments of the <class name>.<method>() syntax.
+    __invalid = {
+        'create_many': "** invalid instances **",
+        'destroy_where': "** invalid filter **",
+        'where': "** invalid query **",
+        }
 
     @staticmethod
     def __check_class_and_id(cmd, line):
@@ -68,16 +146,44 @@ class HBNBCommand(cmd.Cmd):
     def do_create(self, line):
         """Creates a new instance of the given class.
 
+        Example:
+        (hbnb) create Place -> Creates a Place and prints its id.
+        (hbnb) create Place 100 -> Creates 100 Places, saved at once, and
+            prints their ids.
+
         Args:
-            line (str): Class to be created.
+            line (str): Class to be created and number of instances.
         """
         className = self.__check_class_and_id('create', line)
 
         if className:
-            # new_obj = HBNBCommand.classes[className]()
-            new_obj = eval(className)()
-            new_obj.save()
-            print(f"{new_obj.id}")
+            args = line.split()
+            if len(args) == 1:
+                new_obj = HBNBCommand.classes[className]()
+                new_obj.save()
+                print(f"{new_obj.id}")
+            elif args[1].isdigit():
+                self.__create_many(className, int(args[1]))
+            else:
+                print("** invalid number of instances **")
+
+    @staticmethod
+    def __create_many(className, items):
+        """Creates instances with create_many() and prints their ids.
+
+        Args:
+            className (str): Class of the instances.
+            items (int | list): Number of instances, or list of dictionaries
+                of attributes of each instance.
+        """
+        try:
+            new_objs = HBNBCommand.classes[className].create_many(items)
+        except (TypeError, ValueError):
+            print("** invalid instances **")
+            return
+
+        if new_objs:
+            print('\n'.join(obj.id for obj in new_objs))
 
     def do_show(self, line):
         """Prints the string representation of an instance based on class
@@ -88,46 +194,223 @@ class HBNBCommand(cmd.Cmd):
         """
         key = self.__check_class_and_id('show', line)
         if key:
-            print(HBNBCommand.objects[key])
+            if self.output_format == 'json':
+                print(self.__json(HBNBCommand.objects[key].to_dict()))
+            else:
+                print(HBNBCommand.objects[key])
 
     def do_destroy(self, line):
-        """Deletes an instance based on the class name and id.
+        """Deletes an instance based on the class name and id, or all the
+        instances of a class having the given attribute values.
+
+        Example:
+        (hbnb) destroy Review 1234-1234 -> Deletes the Review with that id.
+        (hbnb) destroy Review place_id=1234-1234 -> Deletes the Reviews of
+            that place, saved at once, and prints how many were deleted.
 
         Args:
-            line (str): Class name and id.
+            line (str): Class name and id, or class name and filters.
         """
+        args = line.split()
+        if len(args) > 1 and '=' in args[1]:
+            if args[0] not in HBNBCommand.classes:
+                print("** class doesn't exist **")
+                return
+            attrs = {}
+            for item in args[1:]:
+                name, sep, value = item.partition('=')
+                name = name.strip('\'"')
+                if not sep or not name:
+                    print("** invalid filter **")
+                    return
+                if value[:1] in ('"', "'"):
+                    attrs[name] = value.strip('"\'')
+                else:
+                    attrs[name] = self.__cast(value)
+            self.__destroy_where(args[0], attrs)
+            return
+
         key = self.__check_class_and_id('destroy', line)
         if key:
-            del HBNBCommand.objects[key]
+            storage.delete(HBNBCommand.objects[key])
             storage.save()
 
+    @staticmethod
+    def __cast(value):
+        """Casts an attribute value given in a command to its type.
+
+        Args:
+            value (str): Attribute value without quotes.
+
+        Returns:
+            int | float | str: value as an integer or a float if it's a
+                number, otherwise value.
+        """
+        if value.isdigit():
+            return int(value)
+        if value.replace('.', '', 1).isdigit():
+            return float(value)
+        return value
+
+    @staticmethod
+    def __destroy_where(className, attrs):
+        """Deletes the instances of a class having the given attribute
+        values with destroy_where() and prints how many were deleted.
+
+        Args:
+            className (str): Class of the instances.
+            attrs (dict): Attribute names and the values they must equal.
+        """
+        try:
+            count = HBNBCommand.classes[className].destroy_where(**attrs)
+        except (TypeError, ValueError):
+            print("** invalid filter **")
+            return
+
+        print(count)
+
     def do_all(self, line):
         """Prints all string representations of all instances based on or
         not on the class name.
 
+        The list is written as the instances are gone through, in chunks
+        of buffer_size characters, instead of being built first. In the
+        json format, one line is written per instance instead.
+
         Example:
         (hbnb) all -> Prints all string representations of all classes.
         (hbnb) all BaseModel -> Prints all string representations of BaseModel
             classes only.
+        (hbnb) all Place --offset 40 --limit 20 -> Prints the third page of
+            20 Places.
+        (hbnb) all Place --page -> Prints the Places through $PAGER (less by
+            default) when the output is a terminal.
 
         Args:
-            line (str): Class name.
+            line (str): Class name and options.
         """
-        list_objs = []
-        if not line:
-            list_objs = [
-                obj.__str__() for obj in HBNBCommand.objects.values()
-                ]
-        elif line.split()[0] in HBNBCommand.classes:
-            list_objs = [
-                obj.__str__() for obj in HBNBCommand.objects.values()
-                if obj.__class__ .__name__ == line.split()[0]
-                ]
+        args = line.split()
+        className = None
+        if args and not args[0].startswith('--'):
+            className = args.pop(0)
+            if className not in HBNBCommand.classes:
+                print("** class doesn't exist **")
+                return
+
+        options = {'--limit': None, '--offset': 0, '--page': False}
+        while args:
+            option = args.pop(0)
+            if option == '--page':
+                options[option] = True
+            elif (option in options and args and args[0].isdigit()
+                    and int(args[0]) <= sys.maxsize):
+                options[option] = int(args.pop(0))
+            else:
+                print("** invalid options **")
+                return
+
+        start, count = options['--offset'], options['--limit']
+        if className is None:
+            stop = None if count is None else min(start + count, sys.maxsize)
+            objs = itertools.islice(
+                HBNBCommand.objects.values(), start, stop)
         else:
-            print("** class doesn't exist **")
+            objs = storage.query(className).offset(start)
+            if count is not None:
+                objs.limit(count)
+
+        if options['--page'] and sys.stdout.isatty():
+            self.__page(objs)
+        else:
+            with storage.lock:
+                self.__write_objects(objs, sys.stdout)
+
+    @staticmethod
+    def __json(record):
+        """Returns the JSON text of a record, on a single line.
+
+        Args:
+            record (dict): Dictionary to convert. Datetimes are written in
+                ISO format like in to_dict().
+
+        Returns:
+            str: JSON text.
+        """
+        return json.dumps(record, default=lambda value: (
+            value.isoformat() if isinstance(value, datetime) else str(value)))
 
-        if list_objs:
-            print(list_objs)
+    @staticmethod
+    def __list_text(objs):
+        """Yields the parts of the printed list of the string
+        representations of objects, or nothing if there are no objects.
+
+        Args:
+            objs (iterable): Objects.
+        """
+        sep = '['
+        for obj in objs:
+            yield sep
+            yield repr(str(obj))
+            sep = ', '
+        if sep != '[':
+            yield ']\n'
+
+    def __write_objects(self, objs, out, lock=None):
+        """Writes objects in the output format without building the whole
+        text: the printed list of their string representations, or one
+        line of JSON per object.
+
+        Parts are joined and written in chunks of buffer_size characters.
+
+        Args:
+            objs (iterable): Objects or dictionaries to write.
+            out (file): Stream written to.
+            lock (threading.RLock): Lock held while a chunk is made, but not
+                while it's written.
+        """
+        if self.output_format == 'json':
+            parts = (
+                self.__json(obj if type(obj) is dict else obj.to_dict())
+                + '\n' for obj in objs)
+        else:
+            parts = self.__list_text(objs)
+
+        parts = iter(parts)
+        while True:
+            with lock or contextlib.nullcontext():
+                chunk = []
+                size = 0
+                for part in parts:
+                    chunk.append(part)
+                    size += len(part)
+                    if size >= HBNBCommand.buffer_size:
+                        break
+            if not chunk:
+                break
+            out.write(''.join(chunk))
+        out.flush()
+
+    def __page(self, objs):
+        """Writes the list of objects through the pager in $PAGER.
+
+        The storage lock is only held while the objects are listed and
+        while every chunk is made, so that write-behind flushes aren't
+        blocked while the pager is open.
+
+        Args:
+            objs (iterable): Objects to write.
+        """
+        with storage.lock:
+            objs = list(objs)
+        pager = subprocess.Popen(os.environ.get('PAGER', 'less'), shell=True,
+                                 stdin=subprocess.PIPE, text=True)
+        try:
+            with pager.stdin as pipe:
+                self.__write_objects(objs, pipe, storage.lock)
+        except BrokenPipeError:
+            # The pager was quit before the end of the list.
+            pass
+        pager.wait()
 
     @staticmethod
     def __check_update_args(line):
@@ -182,11 +465,7 @@ class HBNBCommand(cmd.Cmd):
         if args:
             key, attr_name, attr_value = args
             obj = HBNBCommand.objects[key]
-            if attr_value.isdigit():
-                attr_value = int(attr_value)
-            elif attr_value.replace('.', '', 1).isdigit():
-                attr_value = float(attr_value)
-            setattr(obj, attr_name, attr_value)
+            setattr(obj, attr_name, self.__cast(attr_value))
             obj.save()
 
     def do_count(self, line):
@@ -196,117 +475,181 @@ class HBNBCommand(cmd.Cmd):
             line (str): Class name
         """
         if line in HBNBCommand.classes:
-            count = 0
-            for obj in HBNBCommand.objects.values():
-                if obj.__class__.__name__ == line:
-                    count += 1
-            print(count)
+            if self.output_format == 'json':
+                print(self.__json(
+                    {'__class__': line, 'count': storage.count(line)}))
+            else:
+                print(storage.count(line))
         else:
             print("** class doesn't exist **")
 
-    @staticmethod
-    def parse_default_args(line):
-        """Parse arguments from default commands.
-
-        Args:
-            line (str): String containing arguments and command.
-
-        Returns:
-            tuple: Tuple of the arguments parsed from the string given.
-                The tuple consists of:
-            (<class name>, <instance id>, <attribute name>, <attribute value>)
-        """
-        args = line.split('.', 1)
-        # Get arguments within the braces
-        brace_args = args[1].split('(')[1].strip(')').split(',')
-        print(len(brace_args))
-
-        arguments_tuple = (args[0],)  # class name
-        if len(brace_args) >= 1:
-            arguments_tuple += (brace_args[0].strip(' \'"'),)  # instance id
-        if len(brace_args) >= 2:
-            arguments_tuple += (brace_args[1].strip(' \'"'),)  # attribute name
-        if len(brace_args) >= 3:
-            arguments_tuple += (brace_args[2].strip(),)  # attribute value
-
-        return arguments_tuple
-
-    def __update_from_default(self, line):
+    def __update(self, className, args):
         """Handles updating from the default syntax.
 
         Syntax:
             <class name>.update(<id>, <attribute name>, <attribute value>)
             <class name>.update(<id>, <dictionary representation>)
 
+        Values keep the type they're given with: quoted values are strings
+        and the values of a dictionary keep their types.
+
         Args:
-            line (str): Command as passed in console.
+            className (str): Class name.
+            args (list): Typed arguments of the call.
+        """
+        key = self.__check_class_and_id(
+            'update', ' '.join([className] + [str(arg) for arg in args[:1]]))
+        if not key:
+            return
+
+        if len(args) > 1 and type(args[1]) is dict:
+            attrs = args[1]
+        elif len(args) == 1:
+            print("** attribute name missing **")
+            return
+        elif len(args) == 2:
+            print("** value missing **")
+            return
+        else:
+            attrs = {str(args[1]): args[2]}
+
+        obj = HBNBCommand.objects[key]
+        # All attributes are saved at once at the end of the batch.
+        with storage.batch():
+            for attr_name, attr_value in attrs.items():
+                setattr(obj, str(attr_name), attr_value)
+            obj.save()
+
+    def __query(self, className, calls):
+        """Handles querying from the default syntax.
 
-        Raises:
-            TypeError: If the attributes and values are not in dictionary
-                representation.
+        Syntax:
+            <class name>.where(<attribute><operator><value>, ...)
+                [.order_by([-]<attribute>)][.limit(<count>)]
+                [.select(<attribute>, ...)]
+
+        Operators are ==, =, !=, <, <=, > and >=. Results are printed
+        like all does, or one line of JSON per result in the json format.
+
+        Args:
+            className (str): Class name.
+            calls (list): Parsed calls of the command.
         """
+        query = storage.query(className)
         try:
-            # Try loading the dictionary to a variable.
-            # Raises IndexError or json.decoder.JSONDecodeError.
-            attrs = json.loads(
-                line.split('.', 1)[1].split('(', 1)[1].strip(')').
-                split(',', 1)[1].replace("'", '"')
-            )
-            if type(attrs) is not dict:
-                raise TypeError
-
-            # Get class name and id from first two elements of arguments tuple
-            className, instance_id = self.parse_default_args(line)[:2]
-
-            # Check if object exists before looping through attributes.
-            # Print only one error message instead of numerous.
-            if f'{className}.{instance_id}' in HBNBCommand.objects:
-                for attr_name, attr_value in attrs.items():
-                    self.do_update(
-                        f'{className} {instance_id} {attr_name} "{attr_value}"'
-                    )
-            else:
-                print("** no instance found")
-
-        except IndexError:
-            args = self.parse_default_args(line)
-            self.do_update(' '.join(args))
-        except TypeError:
-            args = self.parse_default_args(line)
-            self.do_update(' '.join(args))
-        except json.decoder.JSONDecodeError:
-            args = self.parse_default_args(line)
-            self.do_update(' '.join(args))
+            for method, args, conditions in calls:
+                if method == 'where' and not args:
+                    query.where(*conditions)
+                elif conditions:
+                    raise ValueError
+                elif method == 'order_by' and len(args) == 1:
+                    query.order_by(str(args[0]))
+                elif method == 'limit' and len(args) == 1:
+                    query.limit(args[0])
+                elif method == 'select' and args:
+                    query.select(*[str(arg) for arg in args])
+                else:
+                    raise ValueError
+            results = list(query)
+        except (TypeError, ValueError):
+            print("** invalid query **")
+            return
+
+        if self.output_format == 'json':
+            self.__write_objects(results, sys.stdout)
+        elif results:
+            print([
+                str(result) if query.fields is None else result
+                for result in results
+                ])
 
     def default(self, line):
         """Run default commands.
         Format:
             <class name>.all()
             <class name>.count()
+            <class name>.create()
+            <class name>.create_many(<number or list of dictionaries>)
             <class name>.show(<id>)
             <class name>.destroy(<id>)
+            <class name>.destroy_where(<attribute name>=<value>, ...)
             <class name>.update(<id>, <attribute name>, <attribute value>)
             <class name>.update(<id>, <dictionary representation>)
+            <class name>.where(<condition>, ...)[.order_by(<attribute>)]
+                [.limit(<count>)][.select(<attribute>, ...)]
+
+        The line is parsed in a single pass by command_parser, which gives
+        the arguments with their types: quoted strings, numbers, and
+        dictionaries and lists in JSON or Python notation.
 
         Args:
             line (str): Command to be executed. Can be any of the above
             formats.
         """
         try:
-            command = line.split('.', 1)[1].split('(')[0]
-            func = getattr(self, f'do_{command}')
-            if command == 'update':
-                self.__update_from_default(line)
+            className, calls = command_parser.parse(line)
+        except command_parser.ParseError as error:
+            print(self.__invalid.get(
+                error.method, f'*** Unknown syntax: {line}'))
+            return
+
+        command, args, conditions = calls[0]
+        if command in self.__invalid:
+            if className not in HBNBCommand.classes:
+                print("** class doesn't exist **")
+            elif command == 'where':
+                self.__query(className, calls)
+            elif len(calls) > 1:
+                print(f'*** Unknown syntax: {line}')
+            elif command == 'create_many':
+                if len(args) != 1 or conditions:
+                    print("** invalid instances **")
+                else:
+                    self.__create_many(className, args[0])
+            elif args or any(op not in ('=', '==')
+                             for _, op, _ in conditions):
+                print("** invalid filter **")
             else:
-                args = self.parse_default_args(line)
-                func(' '.join(args).strip())
-        except IndexError:
-            print(f'*** Unknown syntax: {line}')
-        except AttributeError:
+                self.__destroy_where(
+                    className,
+                    {attr: value for attr, _, value in conditions})
+            return
+
+        func = getattr(self, f'do_{command}', None)
+        if func is None or len(calls) > 1 or conditions:
             print(f'*** Unknown syntax: {line}')
+        elif command == 'update':
+            self.__update(className, args)
+        else:
+            func(' '.join([className] + [str(arg) for arg in args]))
+
+    def do_set(self, line):
+        """Sets an option of the console.
+
+        Example:
+        (hbnb) set format json -> show, all, count and where print one line
+            of JSON per record, from to_dict() for instances.
+        (hbnb) set format text -> Back to the default format.
+        (hbnb) set format -> Prints the current format.
+
+        Args:
+            line (str): Option name and value.
+        """
+        args = line.split()
+        if not args:
+            print("** option name missing **")
+        elif args[0] != 'format':
+            print("** option doesn't exist **")
+        elif len(args) == 1:
+            print(self.output_format)
+        elif args[1] not in self.formats:
+            print("** invalid format **")
+        else:
+            self.output_format = args[1]
 
     def do_EOF(self, line):
         """Exit program when EOF is encountered"""
+        storage.flush()
         return True
 
     def do_quit(self, line):
@@ -314,12 +657,133 @@ class HBNBCommand(cmd.Cmd):
         Args:
             line (str): Argument to command
         """
+        storage.flush()
         return True
 
+    def run_batch(self, lines):
+        """Runs commands from a script in a single storage batch.
+
+        Saves made by the commands are written once, after the last one.
+        A command raising an exception or printing an error message is
+        reported on stderr with its line number, and the changes of a
+        command raising an exception are rolled back. The next commands
+        still run. Blank lines and lines starting with # are skipped, and
+        quit or EOF ends the script. A timing summary is printed on stderr
+        at the end.
+
+        Args:
+            lines (iterable): Lines of the script.
+
+        Returns:
+            int: Number of commands that failed.
+        """
+        start = time.perf_counter()
+        commands = errors = 0
+        storage.refresh()
+        with storage.batch():
+            for number, line in enumerate(lines, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                commands += 1
+                output = _ErrorFilter(sys.stdout)
+                try:
+                    with storage.batch(), \
+                            contextlib.redirect_stdout(output):
+                        stop = self.onecmd(line)
+                except Exception as error:
+                    output.messages.append(repr(error))
+                    stop = False
+                if output.line is not None:
+                    output.messages.append(output.line)
+                if output.messages:
+                    errors += 1
+                for message in output.messages:
+                    print(f'line {number}: {line}: {message}',
+                          file=sys.stderr)
+                if stop:
+                    break
+            run = time.perf_counter()
+        storage.flush()
+        end = time.perf_counter()
+
+        print(f'{commands} commands, {errors} failed, '
+              f'{run - start:.3f}s running, {end - run:.3f}s saving',
+              file=sys.stderr)
+        return errors
+
     def emptyline(self):
         """Do nothing if empty line"""
         pass
 
+    def onecmd(self, line):
+        """Run a command while holding the storage lock, so that a
+        write-behind flush doesn't change the objects it goes through. The
+        all command takes the lock itself.
+
+        Commands changing the storage are refused if it's read-only.
+
+        Args:
+            line (str): Command line.
+        """
+        command = self.__command(line)
+        if storage.read_only and command in self.writes:
+            print("** storage is read-only **")
+            return False
+        if command == 'all':
+            # do_all takes the lock itself, to release it while paging.
+            return super().onecmd(line)
+
+        with storage.lock:
+            return super().onecmd(line)
+
+    def __command(self, line):
+        """Returns the name of the command of a line.
+
+        Args:
+            line (str): Command line, in either syntax.
+
+        Returns:
+            str: Command name, or the first method called in the
+                <class name>.<method>() syntax. None if there's none.
+        """
+        command = self.parseline(line)[0]
+        if command is None or hasattr(self, f'do_{command}'):
+            return command
+        try:
+            return command_parser.parse(line)[1][0][0]
+        except command_parser.ParseError:
+            return None
+
+    def precmd(self, line):
+        """Pick up the objects saved by other processes before running a
+        command
+
+        Args:
+            line (str): Command line.
+        """
+        storage.refresh()
+        return line
+
 
 if __name__ == "__main__":
-    HBNBCommand().cmdloop()
+    parser = argparse.ArgumentParser(description="HBNB command interpreter")
+    parser.add_argument(
+        '--batch', nargs='?', const='-', metavar='SCRIPT',
+        help="run the commands of SCRIPT (or stdin) in a single batch, "
+             "saved once at the end")
+    parser.add_argument(
+        '--format', choices=HBNBCommand.formats,
+        default=HBNBCommand.output_format,
+        help="output format of show, all, count and where, like "
+             "'set format'")
+    options = parser.parse_args()
+    console = HBNBCommand()
+    console.output_format = options.format
+    if options.batch is None:
+        console.cmdloop()
+    elif options.batch == '-':
+        sys.exit(1 if console.run_batch(sys.stdin) else 0)
+    else:
+        with open(options.batch, 'r') as script:
+            sys.exit(1 if console.run_batch(script) else 0)
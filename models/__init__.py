@@ -1,6 +1,14 @@
 #!/usr/bin/python3
 
+from os import getenv
+
 from . import engine
 
-storage = engine.file_storage.FileStorage()
+if getenv("HBNB_TYPE_STORAGE") == "db":
+    storage = engine.db_storage.DBStorage()
+else:
+    storage = engine.file_storage.FileStorage()
+if getenv("HBNB_COMPACT_MODELS") == "1":
+    from models import compact
+    compact.install()
 storage.reload()
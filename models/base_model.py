@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Module containing the BaseModel class implementation"""
 
+import os
 import uuid
 from datetime import datetime
 
@@ -8,7 +9,169 @@ from models import storage
 
 
 class BaseModel(object):
-    """BaseModel Class"""
+    """BaseModel Class
+
+    Attributes:
+        indexes (tuple): Names of attributes indexed by storage so that
+            storage.find() can look objects up by their values.
+        range_indexes (tuple): Names of numeric attributes kept sorted by
+            storage so that queries can look objects up by ranges of
+            values and sort them without going through all of them.
+        references (dict): Names of attributes holding the id of another
+            object, mapped to the name of that object's class. Deleting
+            an object from storage deletes the objects referencing it.
+        registry (dict): BaseModel and all its subclasses by class name.
+            Subclasses are added when they are defined.
+    """
+
+    indexes = ()
+    range_indexes = ()
+    references = {}
+    registry = {}
+
+    def __init_subclass__(cls, register=True, **kwargs):
+        """Add a new subclass to the registry
+
+        Args:
+            register (bool): Whether to add the subclass to the registry.
+            kwargs (dict): Keyword arguments of the class definition.
+        """
+
+        super().__init_subclass__(**kwargs)
+        if register:
+            BaseModel.registry[cls.__name__] = cls
+
+    @classmethod
+    def model_attributes(cls):
+        """Returns the attributes declared by the model class and its bases
+
+        Returns:
+            dict: Attribute names and default values, in declaration order.
+        """
+
+        return {
+            name: value
+            for base in reversed(cls.__mro__) if issubclass(base, BaseModel)
+            for name, value in vars(base).items()
+            if not name.startswith('_') and not hasattr(value, '__get__')
+            and name not in vars(BaseModel)
+            }
+
+    @classmethod
+    def create_many(cls, items):
+        """Creates instances of the class and saves them at once.
+
+        The ids come from a single call to os.urandom() and all the
+        instances get the same timestamps. Storage is written once, after
+        the last instance is created, and none of them is kept if creating
+        one fails.
+
+        Example:
+            Place.create_many(10000)
+            Place.create_many([{'name': 'Loft'}, {'name': 'Barn'}])
+
+        Args:
+            items (int | list): Number of instances to create, or a list of
+                dictionaries of attributes, one per instance. created_at
+                and updated_at are loaded like in a record, id and
+                __class__ can't be given.
+
+        Returns:
+            list: The new instances.
+
+        Raises:
+            TypeError: If items is neither a number nor a list of
+                dictionaries, or if a timestamp is not a string.
+            ValueError: If items is a negative number, if a dictionary
+                holds id or __class__, if a timestamp is not an ISO
+                formatted date and time, or if a new id is already taken.
+        """
+
+        if type(items) is int:
+            if items < 0:
+                raise ValueError("number of instances must not be negative")
+            items = [{}] * items
+        else:
+            items = list(items)
+            if not all(type(attrs) is dict for attrs in items):
+                raise TypeError("instances must be given as dictionaries")
+            for i, attrs in enumerate(items):
+                if 'id' in attrs or '__class__' in attrs:
+                    raise ValueError("id and __class__ can't be given")
+                # Parsed right away, even by models loading the timestamps
+                # of records lazily, since they come from users.
+                timestamps = {
+                    attr: BaseModel._timestamp(attrs[attr])
+                    for attr in ('created_at', 'updated_at') if attr in attrs
+                    }
+                if timestamps:
+                    items[i] = {**attrs, **timestamps}
+
+        ids = os.urandom(16 * len(items))
+        now = datetime.now()
+        objs = []
+        with storage.batch():
+            for i, attrs in enumerate(items):
+                obj = cls.__new__(cls)
+                # Bypass __setattr__, the instance isn't in storage yet.
+                obj_id = str(uuid.UUID(
+                    bytes=ids[16 * i:16 * (i + 1)], version=4))
+                if f'{cls.__name__}.{obj_id}' in storage.all():
+                    raise ValueError(f"id {obj_id} is already taken")
+                obj._assign('id', obj_id)
+                obj._assign('created_at', now)
+                obj._assign('updated_at', now)
+                for name, value in attrs.items():
+                    obj._assign(name, value)
+                storage.new(obj)
+                objs.append(obj)
+            storage.save()
+
+        return objs
+
+    @classmethod
+    def destroy_where(cls, **attrs):
+        """Deletes the instances of the class having the given attribute
+        values and saves storage once.
+
+        Example:
+            Review.destroy_where(place_id=place.id)
+            Review.destroy_where()  # Deletes every Review.
+
+        Args:
+            attrs (dict): Attribute names and the values to match, looked
+                up with storage.find().
+
+        Returns:
+            int: Number of deleted instances.
+        """
+
+        with storage.batch():
+            objs = storage.find(cls, **attrs)
+            for obj in objs:
+                storage.delete(obj)
+            if objs:
+                storage.save()
+
+        return len(objs)
+
+    @staticmethod
+    def _timestamp(value):
+        """Returns the value of created_at or updated_at loaded from a
+        record.
+
+        Args:
+            value (str): ISO formatted date and time.
+
+        Returns:
+            datetime: Parsed date and time.
+
+        Raises:
+            TypeError: If value is not a string.
+            ValueError: If value is not an ISO formatted date and time.
+        """
+
+        return datetime.fromisoformat(value)
 
     def __init__(self, *args, **kwargs):
         """Initialize a BaseModel instance
@@ -24,8 +187,9 @@ class BaseModel(object):
             for attr, value in kwargs.items():
                 if attr != '__class__':
                     if attr in timestamps:
-                        value = datetime.fromisoformat(value)
-                    setattr(self, attr, value)
+                        value = self._timestamp(value)
+                    # Bypass __setattr__, the instance isn't in storage yet.
+                    self._assign(attr, value)
         else:
             self.id = str(uuid.uuid4())
             self.created_at = datetime.now()
@@ -42,6 +206,47 @@ class BaseModel(object):
         return "[{0}] ({1}) {2}".format(
             self.__class__.__name__, self.id, self.__dict__)
 
+    def __setattr__(self, name, value):
+        """Set an attribute and mark the instance as changed in storage
+
+        Args:
+            name (str): Attribute name.
+            value (any): Attribute value.
+        """
+
+        # Keeps a write-behind flush from writing the instance meanwhile.
+        with storage.lock:
+            storage.touch(self)
+            self._assign(name, value)
+
+    def _assign(self, name, value):
+        """Sets an attribute without marking the instance as changed
+
+        Args:
+            name (str): Attribute name.
+            value (any): Attribute value.
+        """
+
+        object.__setattr__(self, name, value)
+
+    def _unassign(self, name):
+        """Deletes an attribute without marking the instance as changed
+
+        Args:
+            name (str): Attribute name.
+        """
+
+        object.__delattr__(self, name)
+
+    def attributes(self):
+        """Returns a copy of the attributes set on the instance.
+
+        Returns:
+            dict: Attribute names and values.
+        """
+
+        return dict(self.__dict__)
+
     def save(self):
         """Updates the public instance attribute updated_at with
         the current datetime"""
@@ -64,3 +269,6 @@ class BaseModel(object):
         instance_dict['__class__'] = self.__class__.__name__
 
         return instance_dict
+
+
+BaseModel.registry[BaseModel.__name__] = BaseModel
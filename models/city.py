@@ -8,3 +8,6 @@ class City(BaseModel):
 
     name = ''
     state_id = ''
+
+    indexes = ('state_id',)
+    references = {'state_id': 'State'}
@@ -0,0 +1,412 @@
+#!/usr/bin/python3
+"""Module containing compact versions of the model classes.
+
+A compact class derives from a model class and has the same name. The
+attributes declared by the model (id, created_at, updated_at and the
+class attributes of the model) are kept in slots instead of the
+instance's __dict__. Attributes that are not part of the model, like the
+ones added with the update command, are kept in a dictionary in another
+slot, so that the __dict__ of an instance is never created.
+
+created_at and updated_at loaded from a record are kept as their ISO
+strings. A string is only parsed the first time the attribute is read,
+and to_dict() writes it back without formatting the datetime again.
+
+Compact classes replace the model classes in BaseModel.registry when
+install() is called, which models/__init__.py does when the
+HBNB_COMPACT_MODELS environment variable is set to 1.
+"""
+import copy
+from datetime import datetime
+
+from models.base_model import BaseModel
+from models.user import User
+from models.place import Place
+from models.amenity import Amenity
+from models.city import City
+from models.review import Review
+from models.state import State
+
+
+class Timestamp(object):
+    """Descriptor of the created_at and updated_at slots of compact classes
+
+    The slot holds either the ISO string the timestamp was loaded from or
+    a datetime. Reading the attribute always returns a datetime, parsing
+    the string and keeping the result the first time.
+
+    Attributes:
+        slot (member_descriptor): Descriptor of the slot holding the value.
+    """
+
+    def __init__(self, slot):
+        """Initialize a Timestamp descriptor
+
+        Args:
+            slot (member_descriptor): Descriptor of the slot it wraps.
+        """
+
+        self.slot = slot
+
+    def __get__(self, obj, cls=None):
+        """Returns the timestamp of obj as a datetime"""
+
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj, cls)
+        if type(value) is str:
+            value = datetime.fromisoformat(value)
+            self.slot.__set__(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        """Sets the timestamp of obj"""
+
+        self.slot.__set__(obj, value)
+
+    def __delete__(self, obj):
+        """Deletes the timestamp of obj"""
+
+        self.slot.__delete__(obj)
+
+    def isoformat(self, obj):
+        """Returns the timestamp of obj as an ISO string without parsing it
+
+        Args:
+            obj (CompactModel): Instance of a compact class.
+
+        Raises:
+            AttributeError: If the timestamp isn't set.
+        """
+
+        value = self.slot.__get__(obj, type(obj))
+        return value if type(value) is str else value.isoformat()
+
+
+class CompactModel(BaseModel, register=False):
+    """Base class of compact model classes
+
+    Attributes that aren't model attributes are kept in the _extra slot.
+    Attributes are listed in the order they were first set, like in a
+    __dict__. While that's the order of the slots followed by the extra
+    attributes, the _order slot only holds the position of the last model
+    attribute set. Otherwise it holds bytes listing the attributes: the
+    position of a model attribute, or EXTRA for the next extra attribute.
+
+    The copies of mutable defaults made when they're read are kept in the
+    _copies slot, and aren't listed until they're assigned, like class
+    attributes read from an instance of the model class.
+
+    Attributes:
+        defaults (dict): Default values of the model attributes kept in
+            slots.
+        positions (dict): Position of every model attribute in the slots.
+    """
+
+    __slots__ = ('_extra', '_order', '_copies')
+    EXTRA = 255
+    defaults = {}
+    positions = {}
+
+    @classmethod
+    def model_attributes(cls):
+        """Returns the attributes declared by the model class and its bases
+
+        Returns:
+            dict: Attribute names and default values.
+        """
+
+        return dict(cls.defaults)
+
+    @staticmethod
+    def _timestamp(value):
+        """Returns the value of created_at or updated_at loaded from a
+        record.
+
+        Strings shaped like the output of datetime.isoformat() are kept
+        as they are and parsed when the attribute is first read, so an
+        invalid date of that shape raises ValueError on that read. Other
+        values are parsed right away.
+
+        Args:
+            value (str): ISO formatted date and time.
+
+        Returns:
+            str | datetime: value or the parsed date and time.
+
+        Raises:
+            TypeError: If value is not a string.
+            ValueError: If value is not an ISO formatted date and time.
+        """
+
+        if (type(value) is str and len(value) in (19, 26)
+                and value[4] == value[7] == '-' and value[10] == 'T'
+                and value[13] == value[16] == ':'):
+            return value
+        return datetime.fromisoformat(value)
+
+    def __getattr__(self, name):
+        """Return an extra attribute, or the default value of a model
+        attribute that isn't set.
+
+        Mutable defaults are copied for the instance so that instances
+        don't share them. The copy isn't an attribute of the instance
+        until it's assigned.
+
+        Args:
+            name (str): Attribute name.
+
+        Raises:
+            AttributeError: If name isn't set nor a model attribute.
+        """
+
+        extra = self.__extra()
+        if extra is not None and name in extra:
+            return extra[name]
+
+        try:
+            value = type(self).defaults[name]
+        except KeyError:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            ) from None
+
+        if isinstance(value, (list, dict)):
+            try:
+                copies = CompactModel._copies.__get__(self)
+            except AttributeError:
+                copies = {}
+                object.__setattr__(self, '_copies', copies)
+            value = copies.setdefault(name, copy.copy(value))
+        return value
+
+    def __delattr__(self, name):
+        """Deletes an attribute
+
+        Args:
+            name (str): Attribute name.
+        """
+
+        self._unassign(name)
+
+    def __extra(self):
+        """Returns the dictionary of the extra attributes, or None"""
+
+        try:
+            return CompactModel._extra.__get__(self)
+        except AttributeError:
+            return None
+
+    def __order(self):
+        """Returns the bytes listing the attributes, or the position of the
+        last model attribute set (-1 if none is set)"""
+
+        try:
+            return CompactModel._order.__get__(self)
+        except AttributeError:
+            return -1
+
+    def __has(self, name):
+        """Returns whether the model attribute name is set
+
+        Args:
+            name (str): Model attribute name.
+        """
+
+        slot = type(self).__dict__[name]
+        if type(slot) is Timestamp:
+            slot = slot.slot
+        try:
+            slot.__get__(self)
+        except AttributeError:
+            return False
+        return True
+
+    def __names(self):
+        """Returns the names of the attributes set, in the order they were
+        first set"""
+
+        slots = type(self).__slots__
+        extra = iter(self.__extra() or ())
+        order = self.__order()
+        if type(order) is bytes:
+            return [slots[i] if i != self.EXTRA else next(extra)
+                    for i in order]
+
+        names = [name for name in slots if self.__has(name)]
+        names.extend(extra)
+        return names
+
+    def __encode(self, names):
+        """Returns the bytes listing names
+
+        Args:
+            names (list): Attribute names.
+        """
+
+        positions = type(self).positions
+        return bytes(positions.get(name, self.EXTRA) for name in names)
+
+    def _assign(self, name, value):
+        """Sets an attribute without marking the instance as changed
+
+        Args:
+            name (str): Attribute name.
+            value (any): Attribute value.
+        """
+
+        position = type(self).positions.get(name)
+        extra = self.__extra()
+        if position is not None:
+            if not self.__has(name):
+                order = self.__order()
+                if type(order) is int and position > order and not extra:
+                    order = position
+                else:
+                    if type(order) is int:
+                        order = self.__encode(self.__names())
+                    order += bytes((position,))
+                object.__setattr__(self, '_order', order)
+            object.__setattr__(self, name, value)
+            try:
+                CompactModel._copies.__get__(self).pop(name, None)
+            except AttributeError:
+                pass
+            return
+
+        if extra is None:
+            extra = {}
+            object.__setattr__(self, '_extra', extra)
+        if name not in extra:
+            order = self.__order()
+            if type(order) is bytes:
+                object.__setattr__(self, '_order',
+                                   order + bytes((self.EXTRA,)))
+        extra[name] = value
+
+    def _unassign(self, name):
+        """Deletes an attribute without marking the instance as changed
+
+        Args:
+            name (str): Attribute name.
+
+        Raises:
+            AttributeError: If the attribute isn't set.
+        """
+
+        cls = type(self)
+        extra = self.__extra()
+        order = self.__order()
+        if name in cls.positions:
+            object.__delattr__(self, name)
+            if type(order) is bytes:
+                order = order.replace(bytes((cls.positions[name],)), b'')
+            else:
+                order = max((cls.positions[n] for n in cls.__slots__
+                             if self.__has(n)), default=-1)
+        elif extra is not None and name in extra:
+            if type(order) is bytes:
+                names = self.__names()
+                del names[names.index(name)]
+                order = self.__encode(names)
+            del extra[name]
+        else:
+            raise AttributeError(
+                f"'{cls.__name__}' object has no attribute '{name}'")
+        object.__setattr__(self, '_order', order)
+
+    def attributes(self):
+        """Returns a dictionary of the attributes set on the instance.
+
+        It holds the same values, in the same order, as the __dict__ of an
+        instance of the model class.
+
+        Returns:
+            dict: Attribute names and values.
+        """
+
+        cls = type(self)
+        extra = self.__extra()
+        return {
+            name: (cls.__dict__[name].__get__(self, cls)
+                   if name in cls.positions else extra[name])
+            for name in self.__names()
+            }
+
+    def __str__(self):
+        """Return string representation of the instance
+
+            Returns:
+                str: String representation of the instance
+        """
+
+        return "[{0}] ({1}) {2}".format(
+            self.__class__.__name__, self.id, self.attributes())
+
+    def to_dict(self):
+        """Returns a dictionary containing all attributes of the instance.
+        A __class__ key is added with name of object.
+
+        Returns:
+            dict: Dictionary representation of the instance.
+        """
+
+        cls = type(self)
+        extra = self.__extra()
+        instance_dict = {}
+        for name in self.__names():
+            if name in cls.positions:
+                slot = cls.__dict__[name]
+                if type(slot) is Timestamp:
+                    instance_dict[name] = slot.isoformat(self)
+                else:
+                    instance_dict[name] = slot.__get__(self, cls)
+            else:
+                value = extra[name]
+                instance_dict[name] = (
+                    value.isoformat() if type(value) is datetime else value)
+        instance_dict['__class__'] = self.__class__.__name__
+
+        return instance_dict
+
+
+def compact(cls):
+    """Create the compact version of a model class
+
+    Args:
+        cls (type): Model class.
+
+    Returns:
+        type: Compact class with the same name as cls.
+    """
+
+    defaults = cls.model_attributes()
+    slots = ('id', 'created_at', 'updated_at') + tuple(defaults)
+    namespace = {
+        '__doc__': f"Compact {cls.__name__} class.",
+        '__module__': __name__,
+        '__qualname__': cls.__name__,
+        '__slots__': slots,
+        'defaults': defaults,
+        'positions': {name: i for i, name in enumerate(slots)},
+    }
+
+    compact_cls = type(
+        cls.__name__, (CompactModel, cls), namespace, register=False)
+    for name in ('created_at', 'updated_at'):
+        setattr(compact_cls, name, Timestamp(vars(compact_cls)[name]))
+
+    return compact_cls
+
+
+classes = {
+    cls.__name__: compact(cls)
+    for cls in (User, Place, City, State, Amenity, Review)
+    }
+
+
+def install():
+    """Replace the model classes in BaseModel.registry with their compact
+    versions"""
+
+    BaseModel.registry.update(classes)
@@ -1,3 +1,3 @@
 #!/usr/bin/python3
 
-from . import file_storage
+from . import db_storage, file_storage
@@ -0,0 +1,835 @@
+#!/usr/bin/python3
+"""Module with BaseStorage class implementation"""
+
+import atexit
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+from models.engine.lazy_objects import LazyObjects
+from models.engine.query import Query
+
+
+class BaseStorage(object):
+    """Bookkeeping shared by the storage engines.
+
+    An engine derives from BaseStorage and implements _write(), which
+    persists the changed objects, reload(), which passes the stored
+    records to _load(), and refresh(), which passes the stored records
+    to _merge() when other processes changed them. Every engine class
+    gets its own objects, indexes and logs when it's defined, shared by
+    all its instances.
+
+    Objects changed since the last save are tracked in _dirty.
+
+    The keys of the objects of every class are indexed in _by_class so
+    that the objects of one class can be listed and counted without going
+    through all the objects. The attributes named in a model's `indexes`
+    are indexed the same way in _by_attr, keyed by attribute value, so
+    that find() doesn't have to go through all the objects of a class.
+    The numbers held by the attributes named in a model's
+    `range_indexes` are kept sorted in _by_range, along with the keys of
+    their objects, so that range conditions and sorted queries only go
+    through the matching part of the index. Objects changed since they
+    were indexed are kept in _stale and indexed again by the next find()
+    or query with conditions or an order over their class.
+    Queries built with query() get the objects to check from
+    _candidates(), which picks the index to use.
+
+    Saves made inside batch() are deferred to the end of the outermost
+    batch. The attributes of every object changed in a batch are kept in
+    _undo so that the changes can be rolled back if the batch fails.
+
+    With HBNB_WRITE_BEHIND set to a number of milliseconds, save() doesn't
+    write anything. A background thread writes the changes at most that
+    long after the first deferred save, or as soon as
+    HBNB_WRITE_BEHIND_LIMIT objects (1000 by default) are waiting to be
+    written. flush() writes them right away and is called when the
+    interpreter exits. The thread holds `lock` while it writes, and the
+    changes made through the storage and the models take it too, so that
+    an object is never written while it's being changed. An error raised
+    by a background write is raised again by the next save() or flush().
+
+    Attributes:
+        lock (threading.RLock): Lock held while objects are changed or
+            written.
+        read_only (bool): Whether the engine refuses to save.
+    """
+
+    read_only = False
+    _flush_delay = int(os.getenv("HBNB_WRITE_BEHIND", "0")) / 1000
+    _flush_limit = int(os.getenv("HBNB_WRITE_BEHIND_LIMIT", "1000"))
+
+    def __init_subclass__(cls, **kwargs):
+        """Give a new engine class its own objects, indexes and logs
+
+        Args:
+            kwargs (dict): Keyword arguments of the class definition.
+        """
+
+        super().__init_subclass__(**kwargs)
+        cls._objects = LazyObjects()
+        cls._dirty = set()
+        cls._by_class = {}
+        cls._by_attr = {}
+        cls._by_range = {}
+        cls._indexed_values = {}
+        cls._stale = {}
+        cls._undo = []
+        cls._save_pending = False
+        cls.lock = threading.RLock()
+        cls._flush_ready = threading.Condition(cls.lock)
+        cls._flush_pending = None
+        cls._flush_thread = None
+        cls._flush_error = None
+
+    @staticmethod
+    def __class_name(cls):
+        """Returns the name of a class given as a class or a string.
+
+        Args:
+            cls (type | str): Class or class name.
+
+        Raises:
+            TypeError: If cls is neither a class nor a string.
+        """
+
+        if isinstance(cls, type):
+            return cls.__name__
+        if isinstance(cls, str):
+            return cls
+        raise TypeError("cls must be a class or a class name")
+
+    def all(self, cls=None):
+        """Returns the dictionary __object
+
+        Args:
+            cls (type | str): If given, only the objects of this class are
+                returned in a new dictionary.
+
+        Returns:
+            dict: Dictionary of <class name>.<id> keys to objects.
+        """
+
+        if cls is None:
+            return self._objects
+
+        objects = self._objects
+        keys = self._by_class.get(self.__class_name(cls), {})
+        return {key: objects[key] for key in keys}
+
+    def count(self, cls=None):
+        """Returns the number of objects in storage
+
+        Args:
+            cls (type | str): If given, only the objects of this class are
+                counted.
+
+        Returns:
+            int: Number of objects.
+        """
+
+        if cls is None:
+            return len(self._objects)
+        return len(self._by_class.get(self.__class_name(cls), {}))
+
+    def find(self, cls, **attrs):
+        """Returns the objects of a class having the given attribute values.
+
+        Indexed attributes are used to narrow down the objects to check.
+
+        Example:
+            storage.find(Review, place_id=place.id)
+
+        Args:
+            cls (type | str): Class or class name.
+            attrs (dict): Attribute names and the values to match.
+
+        Returns:
+            list: Matching objects.
+        """
+
+        name = self.__class_name(cls)
+        keys = self._candidates(
+            name, [(attr, '==', value) for attr, value in attrs.items()])
+
+        objects = self._objects
+        missing = object()
+        return [
+            objects[key] for key in keys
+            if all(getattr(objects[key], attr, missing) == value
+                   for attr, value in attrs.items())
+            ]
+
+    def query(self, cls):
+        """Returns a query over the objects of a class.
+
+        Example:
+            storage.query(Place).where(
+                ('price_by_night', '<', 100)).order_by('name').limit(20)
+
+        Args:
+            cls (type | str): Class or class name.
+
+        Returns:
+            Query: Query matching every object of the class until
+                conditions are added.
+        """
+
+        return Query(self, self.__class_name(cls))
+
+    def _candidates(self, name, conditions):
+        """Returns the keys of the objects of a class that may match
+        conditions.
+
+        This is the query planner. A condition comparing an attribute in
+        `indexes` with == gives the keys found in its index. The
+        conditions comparing an attribute in `range_indexes` with a
+        number using ==, <, <=, > or >= give the keys of the part of its
+        sorted index within all their bounds. The smallest set of keys is
+        returned, or the keys of all the objects of the class if no
+        condition can use an index. Unhashable values, which are never
+        indexed, can't use an index. Without conditions, no object is
+        indexed again, so that records not decoded yet stay that way.
+
+        Args:
+            name (str): Class name.
+            conditions (list): (attribute name, operator, value) tuples.
+
+        Returns:
+            dict | list: Keys of the objects to check.
+        """
+
+        if conditions:
+            self.__refresh_indexes(name)
+        keys = None
+        bounds = {}
+        for attr, op, value in conditions:
+            index = self._by_attr.get((name, attr))
+            if op == '==' and index is not None:
+                try:
+                    found = index.get(value, {})
+                except TypeError:
+                    continue
+                if keys is None or len(found) < len(keys):
+                    keys = found
+            elif (op in ('==', '<', '<=', '>', '>=')
+                    and (name, attr) in self._by_range
+                    and isinstance(value, (int, float)) and value == value):
+                bounds.setdefault(attr, []).append((op, value))
+
+        for attr, ops in bounds.items():
+            values, range_keys = self._by_range[(name, attr)]
+            low, high = 0, len(values)
+            for op, value in ops:
+                if op in ('==', '>='):
+                    low = max(low, bisect.bisect_left(values, value))
+                elif op == '>':
+                    low = max(low, bisect.bisect_right(values, value))
+                if op in ('==', '<='):
+                    high = min(high, bisect.bisect_right(values, value))
+                elif op == '<':
+                    high = min(high, bisect.bisect_left(values, value))
+            found = range_keys[low:high]
+            if keys is None or len(found) < len(keys):
+                keys = found
+
+        if keys is None:
+            keys = self._by_class.get(name, {})
+
+        return keys
+
+    def _ordered(self, name, attr, reverse=False):
+        """Returns the keys of the objects of a class sorted by the value
+        of an attribute in `range_indexes`.
+
+        Objects holding the same value are kept in the order of the
+        index in both directions, like a stable sort.
+
+        Args:
+            name (str): Class name.
+            attr (str): Attribute name.
+            reverse (bool): Whether to sort in descending order.
+
+        Returns:
+            list: Keys in order of the attribute values, or None if the
+                attribute has no range index or some objects don't hold a
+                number in it.
+        """
+
+        self.__refresh_indexes(name)
+        index = self._by_range.get((name, attr))
+        if index is None or len(index[1]) != len(self._by_class.get(name, {})):
+            return None
+
+        values, keys = index
+        if not reverse:
+            return keys[:]
+        ordered = []
+        end = len(values)
+        while end:
+            start = bisect.bisect_left(values, values[end - 1], 0, end)
+            ordered.extend(keys[start:end])
+            end = start
+        return ordered
+
+    def __index(self, key, obj, cls, sort=True):
+        """Adds obj to the indexes of its class's indexed attributes
+
+        Args:
+            key (str): Key of obj in _objects.
+            obj (object | dict | tuple): Object to index, the record it's
+                loaded from or the arguments decoding its record.
+            cls (type): Class of the object.
+            sort (bool): Whether to insert obj at its place in the range
+                indexes. If not, it's appended and the caller sorts them.
+        """
+
+        indexes = getattr(cls, "indexes", ())
+        ranges = getattr(cls, "range_indexes", ())
+        if not indexes and not ranges:
+            return
+        if type(obj) is tuple:
+            # Not decoded yet, it's indexed by the next find().
+            self._stale[key] = None
+            return
+
+        if type(obj) is dict:
+            values = tuple(
+                (attr, obj.get(attr, getattr(cls, attr, None)))
+                for attr in indexes + ranges)
+        else:
+            values = tuple(
+                (attr, getattr(obj, attr, None)) for attr in indexes + ranges)
+        values, ranged = values[:len(indexes)], values[len(indexes):]
+        # Unhashable values, like lists, can't be index keys. The objects
+        # holding them are found by going through the class.
+        values = tuple(
+            (attr, value) for attr, value in values
+            if self.__hashable(value))
+
+        name = key.split(".", 1)[0]
+        for attr, value in values:
+            self._by_attr.setdefault(
+                (name, attr), {}).setdefault(value, {})[key] = None
+        # Only numbers can be sorted together, other values never match a
+        # range condition.
+        ranged = tuple(
+            (attr, value) for attr, value in ranged
+            if isinstance(value, (int, float)) and value == value)
+        for attr, value in ranged:
+            index = self._by_range.setdefault((name, attr), ([], []))
+            i = bisect.bisect_right(index[0], value) if sort else len(index[0])
+            index[0].insert(i, value)
+            index[1].insert(i, key)
+        self._indexed_values[key] = (values, ranged)
+
+    @staticmethod
+    def __hashable(value):
+        """Returns whether value can be a dictionary key
+
+        Args:
+            value (object): Value to check.
+        """
+
+        try:
+            hash(value)
+        except TypeError:
+            return False
+        return True
+
+    def __unindex(self, key):
+        """Removes the object with the given key from the attribute indexes
+
+        Args:
+            key (str): Key of the object in _objects.
+        """
+
+        values = self._indexed_values.pop(key, None)
+        if values is None:
+            return
+
+        values, ranged = values
+        name = key.split(".", 1)[0]
+        for attr, value in values:
+            index = self._by_attr[(name, attr)]
+            index[value].pop(key, None)
+            if not index[value]:
+                del index[value]
+        for attr, value in ranged:
+            sorted_values, keys = self._by_range[(name, attr)]
+            i = keys.index(
+                key, bisect.bisect_left(sorted_values, value),
+                bisect.bisect_right(sorted_values, value))
+            del sorted_values[i]
+            del keys[i]
+
+    def __sort_ranges(self):
+        """Sorts the range indexes filled without sorting"""
+
+        for sorted_values, keys in self._by_range.values():
+            pairs = sorted(zip(sorted_values, keys), key=lambda p: p[0])
+            sorted_values[:] = [value for value, key in pairs]
+            keys[:] = [key for value, key in pairs]
+
+    def __refresh_indexes(self, name):
+        """Indexes again the objects of a class changed since they were
+        indexed
+
+        Args:
+            name (str): Class name.
+        """
+
+        keys = self._by_class.get(name, {})
+        stale = self._stale
+        if len(stale) < len(keys):
+            keys = [key for key in stale if key.split(".", 1)[0] == name]
+        else:
+            keys = [key for key in keys if key in stale]
+        for key in keys:
+            obj = self._objects.get(key)
+            if obj is not None:
+                self.__unindex(key)
+                self.__index(key, obj, type(obj))
+            self._stale.pop(key, None)
+
+    def __remember(self, key):
+        """Keeps the current state of the object stored under key in the
+        undo log of the current batch.
+
+        Only the first state of an object in a batch is kept.
+
+        Args:
+            key (str): Key of the object.
+        """
+
+        undo = self._undo[-1]
+        if key not in undo:
+            obj = self._objects.get(key)
+            undo[key] = (obj, obj.attributes() if obj is not None else None)
+
+    def new(self, obj):
+        """Sets in __objects the obj with key <obj class name>.id
+        Args:
+            obj (object): New object
+        """
+
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        with self.lock:
+            if self._undo:
+                self.__remember(key)
+            if key in self._objects:
+                self.__unindex(key)
+                self._stale.pop(key, None)
+            self._objects[key] = obj
+            self._by_class.setdefault(obj.__class__.__name__, {})[key] = None
+            self.__index(key, obj, type(obj))
+            self._dirty.add(key)
+
+    def delete(self, obj=None):
+        """Deletes obj from __objects if it's inside
+
+        The objects referencing obj through an attribute named in their
+        class's `references` are deleted too, and so on down the
+        relationships, so that deleting a State deletes its cities, their
+        places and the places' reviews. They're all written by the next
+        save.
+
+        Args:
+            obj (object): Object to delete. Nothing is done if it's None.
+        """
+
+        if obj is None:
+            return
+
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        if key not in self._objects:
+            return
+
+        references = self.__references()
+        objs = [obj]
+        with self.lock:
+            while objs:
+                obj = objs.pop()
+                name = obj.__class__.__name__
+                key = f"{name}.{obj.id}"
+                if key not in self._objects:
+                    continue
+                if self._undo:
+                    self.__remember(key)
+                self.__unindex(key)
+                self._stale.pop(key, None)
+                del self._objects[key]
+                self._by_class[name].pop(key, None)
+                self._dirty.add(key)
+                for cls, attr in references.get(name, ()):
+                    objs.extend(self.find(cls, **{attr: obj.id}))
+
+    def __references(self):
+        """Returns the attributes referencing each model class
+
+        Returns:
+            dict: Class names to lists of (class, attribute name) tuples of
+                the attributes holding ids of objects of that class.
+        """
+
+        references = {}
+        for cls in self._classes().values():
+            for attr, target in getattr(cls, "references", {}).items():
+                references.setdefault(target, []).append((cls, attr))
+
+        return references
+
+    def touch(self, obj):
+        """Marks obj as changed so that it's written on the next save.
+
+        It's called before an attribute of obj is changed. Objects that are
+        not the ones held in __objects are ignored.
+
+        Args:
+            obj (object): Object about to change.
+        """
+
+        key = f"{obj.__class__.__name__}.{getattr(obj, 'id', None)}"
+        with self.lock:
+            if self._objects.get(key) is obj:
+                if self._undo:
+                    self.__remember(key)
+                self._dirty.add(key)
+                if key in self._indexed_values:
+                    self._stale[key] = None
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Defers saves made inside the block to a single save at its end.
+
+        If the block raises an exception, the objects created, changed or
+        deleted in it are restored and nothing is saved. Batches can be
+        nested, a nested batch that fails only rolls back its own changes.
+        With write-behind, the background thread doesn't write while a
+        batch is open.
+
+        Example:
+            with storage.batch():
+                for i in range(100):
+                    User().save()
+
+        Yields:
+            BaseStorage: The storage.
+        """
+
+        self._undo.append({})
+        try:
+            yield self
+        except BaseException:
+            with self.lock:
+                self.__rollback(self._undo.pop())
+            raise
+
+        undo = self._undo.pop()
+        if self._undo:
+            for key, state in undo.items():
+                self._undo[-1].setdefault(key, state)
+        elif self._save_pending:
+            type(self)._save_pending = False
+            self.save()
+        elif type(self)._flush_pending is not None:
+            with self.lock:
+                type(self)._flush_ready.notify()
+
+    def __rollback(self, undo):
+        """Restores the objects kept in an undo log
+
+        Args:
+            undo (dict): Undo log of a batch.
+        """
+
+        for key, (obj, attrs) in undo.items():
+            current = self._objects.get(key)
+            if current is not None:
+                self.__unindex(key)
+                self._stale.pop(key, None)
+                del self._objects[key]
+                self._by_class[key.split(".", 1)[0]].pop(key, None)
+
+            if obj is not None:
+                self.__assign(obj, attrs)
+                self._objects[key] = obj
+                self._by_class.setdefault(
+                    key.split(".", 1)[0], {})[key] = None
+                self.__index(key, obj, type(obj))
+            self._dirty.add(key)
+
+        if not self._undo:
+            type(self)._save_pending = False
+        if undo and self._flush_delay > 0:
+            # Have the background thread write the restored objects too.
+            cls = type(self)
+            if cls._flush_pending is None:
+                cls._flush_pending = time.monotonic()
+            if not self._undo:
+                cls._flush_ready.notify()
+
+    @staticmethod
+    def __assign(obj, attrs):
+        """Replaces the attributes of obj without marking it as changed
+
+        Args:
+            obj (object): Object to change.
+            attrs (dict): Attribute names and values obj ends up with.
+        """
+
+        for name in obj.attributes():
+            obj._unassign(name)
+        for name, value in attrs.items():
+            obj._assign(name, value)
+
+    def save(self):
+        """Writes the objects changed since the last save.
+
+        Inside a batch, the save is deferred to the end of the batch. With
+        write-behind, it's deferred to the background thread.
+
+        Raises:
+            Exception: The error raised by the last background write, if it
+                failed.
+        """
+
+        with self.lock:
+            if self._undo:
+                type(self)._save_pending = True
+                return
+
+            self.__raise_flush_error()
+            if self._flush_delay > 0:
+                self.__defer()
+            else:
+                self._write()
+
+    def flush(self):
+        """Writes the changes of the saves deferred by write-behind right
+        away. Nothing is done if no save is waiting.
+
+        The changes of a failed background write are still waiting, so
+        they're written before its error is raised.
+
+        Raises:
+            Exception: The error raised by this write, or else by the last
+                background write, if it failed.
+        """
+
+        with self.lock:
+            error = type(self)._flush_error
+            type(self)._flush_error = None
+            self.__flush()
+            if error is not None:
+                raise error
+
+    def __raise_flush_error(self):
+        """Raises the error of the last background write, if it failed"""
+
+        error = type(self)._flush_error
+        if error is not None:
+            type(self)._flush_error = None
+            raise error
+
+    def __flush(self):
+        """Writes the changes of the deferred saves. The lock must be held.
+
+        They're still waiting if the write fails.
+        """
+
+        if type(self)._flush_pending is not None:
+            self._write()
+            type(self)._flush_pending = None
+
+    def __defer(self):
+        """Leaves a save to the background thread, starting it if needed.
+        The lock must be held.
+        """
+
+        cls = type(self)
+        if cls._flush_pending is None:
+            cls._flush_pending = time.monotonic()
+
+        thread = cls._flush_thread
+        if thread is None:
+            atexit.register(self.flush)
+        if thread is None or not thread.is_alive():
+            # A forked process doesn't inherit the thread of its parent.
+            thread = threading.Thread(
+                target=self.__flush_behind, name=f"{cls.__name__}-flush",
+                daemon=True)
+            cls._flush_thread = thread
+            thread.start()
+        cls._flush_ready.notify()
+
+    def __flush_behind(self):
+        """Writes the deferred saves in the background, once the delay
+        since the first of them has passed or enough objects are waiting,
+        and no batch is open.
+        """
+
+        cls = type(self)
+        with self.lock:
+            while True:
+                if cls._flush_pending is None or self._undo:
+                    cls._flush_ready.wait()
+                    continue
+                remaining = (cls._flush_pending + self._flush_delay
+                             - time.monotonic())
+                if remaining > 0 and len(self._dirty) < self._flush_limit:
+                    cls._flush_ready.wait(remaining)
+                    continue
+                try:
+                    self.__flush()
+                except Exception as error:
+                    # Try again once the delay has passed.
+                    cls._flush_error = error
+                    cls._flush_pending = time.monotonic()
+
+    def _write(self):
+        """Persists the objects changed since the last save and clears
+        _dirty. Implemented by the engines."""
+
+        raise NotImplementedError
+
+    def reload(self):
+        """Loads the stored objects. Implemented by the engines."""
+
+        raise NotImplementedError
+
+    def refresh(self):
+        """Merges the changes saved by other processes with _merge().
+        Implemented by the engines.
+
+        Returns:
+            bool: Whether anything had changed.
+        """
+
+        raise NotImplementedError
+
+    @staticmethod
+    def _classes():
+        """Returns the model classes by name
+
+        Returns:
+            dict: BaseModel.registry once all the models are imported.
+        """
+
+        from models.base_model import BaseModel
+        # Importing the models adds them to the registry.
+        from models import amenity, city, place, review, state, user
+
+        return BaseModel.registry
+
+    def __loader(self):
+        """Returns the function building an object from its record
+
+        Returns:
+            callable: Function taking a record and returning an object of
+                the class named in the record.
+        """
+
+        classes = self._classes()
+
+        def loader(value):
+            return classes[value['__class__']](**value)
+
+        return loader
+
+    def _load(self, records, lazy=False, decoder=None):
+        """Replaces the objects in storage with the ones of records.
+
+        Args:
+            records (dict): Records (as returned by to_dict()) by key.
+            lazy (bool): Whether to keep the records and only build an
+                object the first time it's accessed.
+            decoder (callable): If given, records holds tuples of
+                arguments of decoder instead of records, and each record is
+                only decoded the first time its object is accessed.
+        """
+
+        classes = self._classes()
+        loader = self.__loader()
+
+        # Update in place so references returned by all() stay valid.
+        objects = self._objects
+        objects.clear()
+        objects.loader = loader
+        objects.decoder = decoder
+        if lazy or decoder is not None:
+            objects.update(records)
+        else:
+            objects.update({
+                key: loader(value) for key, value in records.items()
+                })
+
+        self._by_class.clear()
+        self._by_attr.clear()
+        self._by_range.clear()
+        self._indexed_values.clear()
+        self._stale.clear()
+        for key in records:
+            name = key.split(".", 1)[0]
+            self._by_class.setdefault(name, {})[key] = None
+            self.__index(
+                key, dict.get(objects, key), classes.get(name), sort=False)
+        self.__sort_ranges()
+        self._dirty.clear()
+
+    def _merge(self, records, lazy=False):
+        """Brings the objects in storage up to date with records written by
+        another process.
+
+        Objects changed since the last save are kept as they are, so that
+        the next save writes them over the records. The other objects are
+        created, deleted or changed in place to match records, so that
+        references to them stay valid.
+
+        Args:
+            records (dict): Records (as returned by to_dict()) by key.
+            lazy (bool): Whether to keep the records of new objects and
+                only build them the first time they're accessed.
+
+        Returns:
+            list: Keys of the objects that were created, deleted or changed.
+        """
+
+        classes = self._classes()
+        objects = self._objects
+        objects.loader = self.__loader()
+        dirty = self._dirty
+        changed = []
+
+        for key in list(dict.keys(objects)):
+            if key not in records and key not in dirty:
+                self.__unindex(key)
+                self._stale.pop(key, None)
+                dict.__delitem__(objects, key)
+                self._by_class[key.split(".", 1)[0]].pop(key, None)
+                changed.append(key)
+
+        for key, record in records.items():
+            if key in dirty:
+                continue
+            current = dict.get(objects, key)
+            if current is None or type(current) is dict:
+                if current == record:
+                    continue
+                value = record if lazy else objects.loader(record)
+            elif current.to_dict() != record:
+                value = current
+                self.__assign(current, objects.loader(record).attributes())
+            else:
+                continue
+            self.__unindex(key)
+            self._stale.pop(key, None)
+            dict.__setitem__(objects, key, value)
+            self._by_class.setdefault(key.split(".", 1)[0], {})[key] = None
+            self.__index(key, value, classes.get(record['__class__']))
+            changed.append(key)
+
+        return changed
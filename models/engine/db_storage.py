@@ -0,0 +1,260 @@
+#!/usr/bin/python3
+"""Module with DBStorage class implementation"""
+
+import json
+import os
+import sqlite3
+
+from models.engine.base_storage import BaseStorage
+
+
+class DBStorage(BaseStorage):
+    """Storage engine keeping the objects in a SQLite database.
+
+    The database is the file named by HBNB_DB_PATH (hbnb.db by default)
+    and is opened in WAL mode, so that other processes can read it while
+    it's written.
+
+    Every model class has its own table, named after the class, with an
+    id primary key, a column for created_at, updated_at and every
+    attribute declared by the model, and an _extra column holding the
+    other attributes as a JSON object. Columns are created without a type
+    so that SQLite stores values as they are given. Values that are not
+    strings or numbers (lists, booleans, None) are kept in _extra too. The
+    attributes named in a model's `indexes` get a SQL index.
+
+    A save upserts the rows of the objects changed since the last save and
+    deletes the rows of the deleted ones, in a single transaction. The
+    statements of a table are built once and reused, so that sqlite3
+    keeps them prepared.
+
+    Indexes, change tracking and batches are implemented by BaseStorage.
+    """
+
+    __db_path = os.getenv("HBNB_DB_PATH", "hbnb.db")
+    __connection = None
+    __connection_path = None
+    __tables = {}
+    __data_version = None
+
+    def __connect(self):
+        """Returns the connection to the database, opening it if needed
+
+        Returns:
+            sqlite3.Connection: Connection to the database at __db_path.
+        """
+
+        path = DBStorage.__db_path
+        if (DBStorage.__connection is not None
+                and DBStorage.__connection_path == path):
+            return DBStorage.__connection
+
+        self.close()
+        # Access from the write-behind thread is serialized by the lock.
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        DBStorage.__connection = connection
+        DBStorage.__connection_path = path
+        # Tables found in the database are checked before their first write.
+        DBStorage.__tables = {
+            name: None for name, in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+        return connection
+
+    def close(self):
+        """Closes the connection to the database.
+
+        It's opened again by the next save or reload.
+        """
+
+        with self.lock:
+            if DBStorage.__connection is not None:
+                DBStorage.__connection.close()
+            DBStorage.__connection = None
+            DBStorage.__connection_path = None
+            DBStorage.__tables = {}
+            DBStorage.__data_version = None
+
+    def __table(self, connection, cls):
+        """Returns the columns and the upsert statement of a class's table.
+
+        The table, its missing columns and its indexes are created the
+        first time it's used.
+
+        Args:
+            connection (sqlite3.Connection): Connection to the database.
+            cls (type): Model class.
+
+        Returns:
+            tuple: Names of the columns holding attributes and the upsert
+                statement taking their values followed by _extra.
+        """
+
+        name = cls.__name__
+        table = DBStorage.__tables.get(name)
+        if table is not None:
+            return table
+
+        columns = ('id', 'created_at', 'updated_at') + tuple(
+            cls.model_attributes())
+        with connection:
+            connection.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" '
+                '("id" TEXT PRIMARY KEY, "_extra")')
+            existing = {
+                row[1] for row in
+                connection.execute(f'PRAGMA table_info("{name}")')
+                }
+            for column in columns:
+                if column not in existing:
+                    connection.execute(
+                        f'ALTER TABLE "{name}" ADD COLUMN "{column}"')
+            for attr in getattr(cls, 'indexes', ()):
+                if attr in columns:
+                    connection.execute(
+                        f'CREATE INDEX IF NOT EXISTS "{name}_{attr}" '
+                        f'ON "{name}" ("{attr}")')
+
+        names = ", ".join(f'"{column}"' for column in columns)
+        updates = ", ".join(
+            f'"{column}" = excluded."{column}"'
+            for column in columns[1:] + ('_extra',))
+        statement = (
+            f'INSERT INTO "{name}" ({names}, "_extra") '
+            f'VALUES ({", ".join("?" * (len(columns) + 1))}) '
+            f'ON CONFLICT ("id") DO UPDATE SET {updates}')
+        table = DBStorage.__tables[name] = (columns, statement)
+        return table
+
+    @staticmethod
+    def __row(columns, record):
+        """Returns the values of a table row for a record
+
+        Args:
+            columns (tuple): Names of the columns holding attributes.
+            record (dict): Dictionary representation of an object.
+
+        Returns:
+            tuple: Values of the columns followed by the JSON of the other
+                attributes, or None if there's none.
+        """
+
+        record = dict(record)
+        del record['__class__']
+        values = []
+        for column in columns:
+            value = record.get(column)
+            if type(value) in (str, int, float):
+                del record[column]
+                values.append(value)
+            else:
+                values.append(None)
+        values.append(json.dumps(record) if record else None)
+
+        return tuple(values)
+
+    def _write(self):
+        """Writes the objects changed since the last save to the database"""
+
+        if not self._dirty:
+            return
+
+        connection = self.__connect()
+        changed = {}
+        deleted = []
+        for key in self._dirty:
+            obj = self._objects.get(key)
+            if obj is None:
+                deleted.append(key.split(".", 1))
+            else:
+                changed.setdefault(type(obj), []).append(obj)
+
+        tables = {cls: self.__table(connection, cls) for cls in changed}
+        with connection:
+            for cls, objs in changed.items():
+                columns, statement = tables[cls]
+                connection.executemany(statement, [
+                    self.__row(columns, obj.to_dict()) for obj in objs
+                    ])
+            for name, id in deleted:
+                if name in DBStorage.__tables:
+                    connection.execute(
+                        f'DELETE FROM "{name}" WHERE "id" = ?', (id,))
+        self._dirty.clear()
+
+    def __read_records(self, connection):
+        """Returns the records of all the objects in the database
+
+        Args:
+            connection (sqlite3.Connection): Connection to the database.
+
+        Returns:
+            dict: Records (as returned by to_dict()) by key.
+        """
+
+        classes = self._classes()
+        records = {}
+        for name in list(DBStorage.__tables):
+            if name not in classes:
+                continue
+            cursor = connection.execute(f'SELECT * FROM "{name}"')
+            columns = [column[0] for column in cursor.description]
+            for row in cursor:
+                record = {}
+                extra = None
+                for column, value in zip(columns, row):
+                    if column == '_extra':
+                        extra = value
+                    elif value is not None:
+                        record[column] = value
+                if extra is not None:
+                    record.update(json.loads(extra))
+                record['__class__'] = name
+                records[f"{name}.{record['id']}"] = record
+
+        return records
+
+    @staticmethod
+    def __version(connection):
+        """Returns the data version of the database, which changes when
+        another connection commits a change.
+
+        Args:
+            connection (sqlite3.Connection): Connection to the database.
+        """
+
+        return connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def reload(self):
+        """Loads the objects of every model class from the database"""
+
+        with self.lock:
+            connection = self.__connect()
+            DBStorage.__data_version = self.__version(connection)
+            self._load(self.__read_records(connection))
+
+    def refresh(self):
+        """Merges the changes committed by other processes since the
+        database was last read.
+
+        Objects changed since the last save are kept. Nothing is read if
+        no other process has committed a change.
+
+        Returns:
+            bool: Whether the database had changed.
+        """
+
+        with self.lock:
+            connection = self.__connect()
+            version = self.__version(connection)
+            if version == DBStorage.__data_version:
+                return False
+
+            # Tables may have been created by the other processes.
+            for name, in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"):
+                DBStorage.__tables.setdefault(name, None)
+            self._merge(self.__read_records(connection))
+            DBStorage.__data_version = version
+            return True
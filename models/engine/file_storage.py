@@ -1,66 +1,688 @@
 #!/usr/bin/python3
 """Module with FileStorage class implementation"""
 
+import contextlib
+import functools
 import json
+import mmap
+import os
+import shutil
+import warnings
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, files aren't locked there.
+    fcntl = None
 
-class FileStorage(object):
-    """FileStorage class implementation"""
+from models.engine import serializers
+from models.engine.base_storage import BaseStorage
+
+
+class FileStorage(BaseStorage):
+    """FileStorage class implementation
+
+    Four storage modes are supported and selected with the
+    HBNB_FILE_MODE environment variable (other values are handled like
+    snapshot):
+
+        snapshot (default): every save rewrites the whole file.
+        journal: every save appends only the changed or deleted records,
+            one JSON line per mutation, to a journal next to the file.
+            The journal is compacted into the file once it holds
+            HBNB_JOURNAL_COMPACT entries.
+        sharded: objects are stored in a <file>.shards directory, in one
+            file per class, or HBNB_FILE_SHARDS files per class spread by
+            a hash of the ids. A save only rewrites the shards holding
+            changed objects. Shards are read in parallel. If the directory
+            doesn't exist yet, the single file is loaded and every shard
+            is written by the next save. The number of shards per class
+            is kept in <file>.shards/count, and every shard is written
+            again when it changes.
+        mapped: read-only mode for processes that only read the store. A
+            binary file is memory mapped and only an index of the offsets
+            of its records is built. A record is only decoded when its
+            object is accessed, and processes mapping the same file share
+            its pages. The journal isn't read, and save() raises
+            PermissionError. Files in another format are loaded lazily.
+
+    The file is written in the format named by HBNB_FILE_FORMAT, one of
+    the formats of models.engine.serializers (json by default). The
+    format of the file is detected when it's loaded.
+
+    Files are written to a temporary file that replaces the previous one
+    once it's synced to disk, so that an interrupted save never leaves a
+    partially written file. With HBNB_FILE_BACKUPS set to N, the N
+    previous files are kept as <file>.1 (newest) to <file>.N and reload()
+    falls back to them if the file can't be decoded.
+
+    With HBNB_FILE_LAZY=1, reload() keeps the loaded records and an object
+    is only built from its record the first time it's accessed.
+
+    The encoded text of every saved object is kept in __cache so that a
+    snapshot only re-encodes the objects changed since the last save. The
+    cache is dropped when the format changes.
+
+    Processes sharing the file take an advisory lock on <file>.lock, shared
+    while reading and exclusive while writing. The inode, size and mtime of
+    the file and journal are kept in __stamp after every read and write.
+    Before writing, a process whose stamp doesn't match the files anymore
+    merges the records written by the others with its own changes.
+    refresh() does the same merge without writing, and only reads the
+    files if they changed.
+
+    Indexes, change tracking and batches are implemented by BaseStorage.
+    """
 
     __file_path = "file.json"
-    __objects = {}
 
-    def all(self):
-        """Returns the dictionary __object"""
+    __mode = os.getenv("HBNB_FILE_MODE", "snapshot")
+    __compact_every = int(os.getenv("HBNB_JOURNAL_COMPACT", "1000"))
+    __lazy = os.getenv("HBNB_FILE_LAZY") == "1"
+    __format = os.getenv("HBNB_FILE_FORMAT", "json")
+    __backups = int(os.getenv("HBNB_FILE_BACKUPS", "0"))
+    __shards = int(os.getenv("HBNB_FILE_SHARDS", "1"))
+    __cache_format = None
+    __journal_len = 0
+    __cache = {}
+    __stamp = None
+    __map = None
+
+    @property
+    def read_only(self):
+        """bool: Whether the storage refuses to save, in mapped mode"""
+
+        return FileStorage.__mode == "mapped"
+
+    def _write(self):
+        """Serializes the objects to the file.
+
+        In journal mode only the objects changed since the last save are
+        appended to the journal. Changes saved by other processes since
+        the files were last read are merged first.
+
+        Raises:
+            PermissionError: In mapped mode.
+        """
+
+        if FileStorage.__mode == "mapped":
+            raise PermissionError("storage is read-only in mapped mode")
+
+        with self.__locked(exclusive=True):
+            self.__merge_store()
+            if FileStorage.__mode == "sharded":
+                self.__write_shards()
+            else:
+                if FileStorage.__mode == "journal":
+                    self.__append_journal()
+                # Unknown modes are saved like snapshot.
+                if (FileStorage.__mode != "journal" or
+                        FileStorage.__journal_len >=
+                        FileStorage.__compact_every):
+                    self.__write_snapshot()
+            FileStorage.__stamp = self.__file_stamp()
+
+    def refresh(self):
+        """Merges the changes saved by other processes since the file was
+        last read or written.
+
+        Objects changed since the last save are kept, except in mapped
+        mode where the file is mapped again. Nothing is read if the file
+        and journal haven't changed.
 
-        return FileStorage.__objects
+        Returns:
+            bool: Whether the file or journal had changed.
+        """
+
+        with self.lock, self.__locked(exclusive=False):
+            if FileStorage.__mode != "mapped":
+                return self.__merge_store()
+
+            stamp = self.__file_stamp()
+            if stamp == FileStorage.__stamp:
+                return False
+            self.__map_snapshot()
+            FileStorage.__stamp = stamp
+            return True
+
+    def __merge_store(self):
+        """Merges the records of the file and journal if they changed since
+        __stamp was taken. The lock must be held.
+
+        Returns:
+            bool: Whether the file or journal had changed.
+        """
+
+        stamp = self.__file_stamp()
+        if stamp == FileStorage.__stamp:
+            return False
+
+        store = self.__read_store()
+        if store is not None:
+            records, FileStorage.__journal_len = store
+            for key in self._merge(records, FileStorage.__lazy):
+                FileStorage.__cache.pop(key, None)
+        FileStorage.__stamp = stamp
+        return True
+
+    @staticmethod
+    @contextlib.contextmanager
+    def __locked(exclusive):
+        """Holds the advisory lock of the file while the block runs
 
-    def new(self, obj):
-        """Sets in __objects the obj with key <obj class name>.id
         Args:
-            obj (object): New object
+            exclusive (bool): Whether to take an exclusive lock (to write)
+                instead of a shared one (to read).
         """
 
-        key = f"{obj.__class__.__name__}.{obj.id}"
-        FileStorage.__objects[key] = obj
+        if fcntl is None:
+            yield
+            return
 
-    def save(self):
-        """Serializes __objects to the JSON file"""
+        with open(f"{FileStorage.__file_path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
 
-        objects_dict = {
-            key: value.to_dict()
-            for key, value in FileStorage.__objects.items()
-            }
-        with open(FileStorage.__file_path, "w") as f:
-            json.dump(objects_dict, f, indent=4)
+    def __file_stamp(self):
+        """Returns what identifies the current content of the stored files.
 
-    def reload(self):
-        """Deserializes the json file to __objects"""
-
-        from models.base_model import BaseModel
-        from models.user import User
-        from models.place import Place
-        from models.amenity import Amenity
-        from models.city import City
-        from models.review import Review
-        from models.state import State
-
-        classes = {
-            'User': User,
-            'BaseModel': BaseModel,
-            'Place': Place,
-            'Amenity': Amenity,
-            'City': City,
-            'State': State,
-            'Review': Review,
-        }
+        Writers replace the files and append to the journal, so that the
+        inode or size of one of them changes with every write.
+
+        Returns:
+            tuple: Inode, size and mtime of the file and of the journal,
+                None for a file that doesn't exist, or of every file in
+                the directory of shards.
+        """
+
+        paths = self.__shard_paths()
+        if paths is None:
+            paths = (FileStorage.__file_path,
+                     f"{FileStorage.__file_path}.journal")
+
+        stamp = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                stamp.append(None)
+            else:
+                stamp.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        return tuple(stamp)
+
+    @staticmethod
+    def __shard_paths():
+        """Returns the paths of the shard files in sharded mode
+
+        Returns:
+            list: Paths of the shards, or None if the store isn't sharded
+                or its directory doesn't exist yet.
+        """
+
+        if FileStorage.__mode != "sharded":
+            return None
+
+        directory = f"{FileStorage.__file_path}.shards"
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return None
+        # Shards are named <class>.<bucket>, backups and temporary files
+        # have more dots and the count file has none.
+        return [
+            os.path.join(directory, name) for name in names
+            if name.count(".") == 1
+            ]
+
+    @staticmethod
+    def __shard(key):
+        """Returns the name of the shard holding the object stored under key
+
+        Args:
+            key (str): Key of the object.
+
+        Returns:
+            str: <class name>.<bucket>, where bucket is derived from the id.
+        """
+
+        name, id = key.split(".", 1)
+        return f"{name}.{zlib.crc32(id.encode()) % FileStorage.__shards}"
+
+    @staticmethod
+    def __shard_count(directory):
+        """Returns the number of shards per class the directory was written
+        with
+
+        Args:
+            directory (str): Directory of the shards.
+
+        Returns:
+            int: Number of shards, or None if it isn't recorded.
+        """
+
+        try:
+            with open(os.path.join(directory, "count"), "r") as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def __write_shard_count(directory):
+        """Records the number of shards per class in the directory
+
+        Args:
+            directory (str): Directory of the shards.
+        """
+
+        path = os.path.join(directory, "count")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(FileStorage.__shards))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def __serializer():
+        """Returns the serializer of the current format, dropping the cached
+        fragments if the format changed.
+
+        Returns:
+            object: Serializer of models.engine.serializers.
+        """
+
+        serializer = serializers.formats[FileStorage.__format]
+        if FileStorage.__cache_format != serializer.name:
+            FileStorage.__cache = {}
+            FileStorage.__cache_format = serializer.name
+        return serializer
+
+    def __fragment(self, serializer, cache, key, obj):
+        """Returns the cached fragment of obj, encoding it again if it
+        changed since it was cached.
+
+        Args:
+            serializer (object): Serializer of the current format.
+            cache (dict): Cached (object, fragment) tuples by key.
+            key (str): Key of obj.
+            obj (object | dict | tuple): Object, record of an object not
+                built yet or arguments decoding the record.
+
+        Returns:
+            tuple: obj and its fragment.
+        """
+
+        cached = cache.get(key)
+        if cached is None or cached[0] is not obj or key in self._dirty:
+            # Records of objects not built yet are written as they are.
+            if type(obj) is dict:
+                record = obj
+            elif type(obj) is tuple:
+                record = self._objects.record(key)
+            else:
+                record = obj.to_dict()
+            cached = (obj, serializer.fragment(key, record))
+        return cached
+
+    def __write_file(self, path, serializer, fragments):
+        """Writes fragments to a temporary file replacing path once it's
+        synced, keeping the previous file as a backup.
+
+        Args:
+            path (str): Path of the file.
+            serializer (object): Serializer of the current format.
+            fragments (list): Fragments of the records of the file.
+        """
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                serializer.write(f, fragments)
+                f.flush()
+                os.fsync(f.fileno())
+            self.__rotate_backups(path, FileStorage.__backups)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __write_shards(self):
+        """Writes the shards holding the objects changed or deleted since
+        the last save, or every shard if the directory doesn't exist or
+        was written with another number of shards.
+
+        Shards left without objects are removed.
+        """
+
+        serializer = self.__serializer()
+        cache = FileStorage.__cache
+        objects = self._objects
+        directory = f"{FileStorage.__file_path}.shards"
+        if self.__shard_count(directory) == FileStorage.__shards:
+            shards = {self.__shard(key): [] for key in self._dirty}
+            names = {shard.split(".", 1)[0] for shard in shards}
+        else:
+            os.makedirs(directory, exist_ok=True)
+            shards = None
+            names = list(self._by_class)
 
+        contents = shards if shards is not None else {}
+        for name in names:
+            for key in self._by_class.get(name, {}):
+                shard = self.__shard(key)
+                if shards is None or shard in shards:
+                    contents.setdefault(shard, []).append(key)
+
+        for shard, keys in contents.items():
+            path = os.path.join(directory, shard)
+            if not keys:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            fragments = []
+            for key in keys:
+                cached = cache[key] = self.__fragment(
+                    serializer, cache, key, dict.get(objects, key))
+                fragments.append(cached[1])
+            self.__write_file(path, serializer, fragments)
+        if shards is None:
+            # Shards of another count hold stale copies of the objects.
+            for path in self.__shard_paths():
+                if os.path.basename(path) not in contents:
+                    os.remove(path)
+            self.__write_shard_count(directory)
+        self.__fsync_dir(os.path.join(directory, "shard"))
+
+        for key in self._dirty:
+            if key not in objects:
+                cache.pop(key, None)
+        self._dirty.clear()
+
+    def __write_snapshot(self):
+        """Writes all objects to the file and drops the journal.
+
+        Only changed objects are encoded again, the cached fragments of
+        the others are reused.
+        """
+
+        serializer = self.__serializer()
+        cache = FileStorage.__cache
+
+        # Fragments of deleted objects are left out of the new cache.
+        fragments = []
+        new_cache = {}
+        for key, obj in dict.items(self._objects):
+            cached = new_cache[key] = self.__fragment(
+                serializer, cache, key, obj)
+            fragments.append(cached[1])
+
+        path = FileStorage.__file_path
+        self.__write_file(path, serializer, fragments)
+        self.__fsync_dir(path)
+
+        try:
+            os.remove(f"{FileStorage.__file_path}.journal")
+        except FileNotFoundError:
+            pass
+        FileStorage.__cache = new_cache
+        FileStorage.__journal_len = 0
+        self._dirty.clear()
+
+    @staticmethod
+    def __rotate_backups(path, count):
+        """Keeps the current file as the newest of count backups
+
+        Args:
+            path (str): Path of the file.
+            count (int): Number of backups to keep.
+        """
+
+        if count <= 0 or not os.path.exists(path):
+            return
+
+        # Frees <path>.1 for the link when a single backup is kept.
         try:
-            with open(FileStorage.__file_path, "r") as f:
-                loaded_dict = json.load(f)
-            FileStorage.__objects = {
-                key: eval(value['__class__'], classes)(**value)
-                for key, value in loaded_dict.items()
-                }
+            os.remove(f"{path}.{count}")
         except FileNotFoundError:
             pass
+        for i in range(count - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        # A hard link keeps the file in place until it's replaced.
+        try:
+            os.link(path, f"{path}.1")
+        except OSError:
+            shutil.copy2(path, f"{path}.1")
+
+    @staticmethod
+    def __fsync_dir(path):
+        """Syncs the directory containing path so that a rename is durable
+
+        Args:
+            path (str): Path of a file in the directory.
+        """
+
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def __read(path):
+        """Returns the records of the file at path
+
+        Args:
+            path (str): Path of the file.
+
+        Raises:
+            ValueError: If the file can't be decoded.
+        """
+
+        with open(path, "rb") as f:
+            data = f.read()
+        return serializers.detect(data).loads(data)
+
+    def __read_snapshot(self, path):
+        """Returns the records of a file or of its newest valid backup
+
+        Args:
+            path (str): Path of the file.
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            ValueError: If neither the file nor a backup can be decoded.
+        """
+
+        try:
+            return self.__read(path)
+        except ValueError as error:
+            i = 1
+            while os.path.exists(f"{path}.{i}"):
+                try:
+                    records = self.__read(f"{path}.{i}")
+                except ValueError:
+                    i += 1
+                    continue
+                warnings.warn(f"{path} can't be decoded ({error}), "
+                              f"loaded {path}.{i} instead")
+                return records
+            raise
+
+    def __append_journal(self):
+        """Appends a journal entry for every changed or deleted object.
+
+        An entry is a JSON object on its own line. Deleted objects are
+        written with a null value. A torn last line left by an interrupted
+        append is cut off first, so that the new entries start on their
+        own line.
+        """
+
+        if not self._dirty:
+            return
+
+        lines = []
+        for key in self._dirty:
+            FileStorage.__cache.pop(key, None)
+            obj = self._objects.get(key)
+            value = obj.to_dict() if obj is not None else None
+            lines.append(json.dumps({"key": key, "value": value}) + "\n")
+
+        with open(f"{FileStorage.__file_path}.journal", "a+b") as f:
+            self.__cut_torn_line(f)
+            f.write("".join(lines).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        FileStorage.__journal_len += len(lines)
+        self._dirty.clear()
+
+    @staticmethod
+    def __cut_torn_line(f):
+        """Truncates a file after its last newline
+
+        Args:
+            f (file): File opened for reading and writing in binary mode.
+        """
+
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(pos - 4096, 0)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                if start + newline + 1 < end:
+                    f.truncate(start + newline + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+    def __read_store(self):
+        """Returns the records of the shards, or of the file with the
+        journal replayed over them.
+
+        Returns:
+            tuple: Records by key and number of journal entries, or None if
+                neither the file nor the journal exists.
+        """
+
+        paths = self.__shard_paths()
+        if paths is not None:
+            loaded_dict = {}
+            with ThreadPoolExecutor() as executor:
+                for records in executor.map(self.__read_snapshot, paths):
+                    loaded_dict.update(records)
+            return loaded_dict, 0
+
+        found = False
+        loaded_dict = {}
+        try:
+            loaded_dict = self.__read_snapshot(FileStorage.__file_path)
+            found = True
+        except FileNotFoundError:
+            pass
+
+        journal_len = 0
+        try:
+            with open(f"{FileStorage.__file_path}.journal", "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.decoder.JSONDecodeError:
+                        # A torn last line left by an interrupted append.
+                        break
+                    if entry["value"] is None:
+                        loaded_dict.pop(entry["key"], None)
+                    else:
+                        loaded_dict[entry["key"]] = entry["value"]
+                    journal_len += 1
+            found = True
+        except FileNotFoundError:
+            pass
+
+        if not found:
+            return None
+        return loaded_dict, journal_len
+
+    def __map_snapshot(self):
+        """Maps the file and loads the index of its records.
+
+        Files that are not in the binary format or that can't be indexed
+        are read and loaded lazily instead.
+        """
+
+        path = FileStorage.__file_path
+        serializer = serializers.formats["binary"]
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            # An empty file can't be mapped.
+            mapped = None
+
+        frames = None
+        if (mapped is not None and
+                mapped[:len(serializer.magic)] == serializer.magic):
+            try:
+                frames = {
+                    key: (offset, length)
+                    for key, offset, length in serializer.frames(mapped)
+                    }
+            except ValueError as error:
+                warnings.warn(f"{path} can't be indexed ({error})")
+        else:
+            warnings.warn(f"{path} is not a binary file, it's loaded "
+                          "without being mapped")
+
+        previous = FileStorage.__map
+        if frames is None:
+            if mapped is not None:
+                mapped.close()
+            FileStorage.__map = None
+            store = self.__read_store()
+            if store is not None:
+                self._load(store[0], lazy=True)
+        else:
+            FileStorage.__map = mapped
+            self._load(frames, decoder=functools.partial(
+                serializer.load_frame, mapped))
+        if previous is not None:
+            previous.close()
+
+    def reload(self):
+        """Deserializes the file to __objects.
+
+        Entries found in the journal are replayed over the objects loaded
+        from the file.
+        """
+
+        with self.lock, self.__locked(exclusive=False):
+            stamp = self.__file_stamp()
+            if FileStorage.__mode == "mapped":
+                self.__map_snapshot()
+                FileStorage.__stamp = stamp
+                return
+
+            store = self.__read_store()
+            if store is None:
+                return
+
+            loaded_dict, FileStorage.__journal_len = store
+            self._load(loaded_dict, FileStorage.__lazy)
+            FileStorage.__cache.clear()
+            FileStorage.__stamp = stamp
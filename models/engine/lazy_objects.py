@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+"""Module with LazyObjects class implementation"""
+
+from collections.abc import ItemsView, ValuesView
+
+
+class _Values(ValuesView):
+    """View of the objects of a LazyObjects, building the ones not built
+    yet"""
+
+    def __iter__(self):
+        """Yields all objects"""
+
+        for key in list(self._mapping):
+            yield self._mapping[key]
+
+
+class _Items(ItemsView):
+    """View of the key/object pairs of a LazyObjects, building the objects
+    not built yet"""
+
+    def __iter__(self):
+        """Yields all key/object pairs"""
+
+        for key in list(self._mapping):
+            yield key, self._mapping[key]
+
+
+class LazyObjects(dict):
+    """Dictionary of objects that can hold the records of objects not
+    built yet.
+
+    A record is the dictionary an object is loaded from (as returned by
+    to_dict()). It's turned into an object by `loader` the first time its
+    key is accessed and the object replaces it in the dictionary.
+
+    A record that hasn't been decoded yet can be held as a tuple of
+    arguments for `decoder`, which returns the record.
+
+    Attributes:
+        loader (callable): Function taking a record and returning the
+            object built from it.
+        decoder (callable): Function returning the record held as a tuple
+            of its arguments.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize a LazyObjects instance
+
+        Args:
+            args (tuple): Arguments passed to dict.
+            kwargs (dict): Keyword arguments passed to dict.
+        """
+
+        super().__init__(*args, **kwargs)
+        self.loader = None
+        self.decoder = None
+
+    def __load(self, key, value):
+        """Returns the object for value, building it if it's a record
+
+        Args:
+            key (str): Key of the value.
+            value (object | dict | tuple): Object, record or arguments of
+                decoder stored under key.
+        """
+
+        if type(value) is tuple:
+            value = self.decoder(*value)
+        if type(value) is dict:
+            value = self.loader(value)
+            super().__setitem__(key, value)
+        return value
+
+    def record(self, key):
+        """Returns the record stored under key if it has not been built.
+
+        Args:
+            key (str): Key of the object.
+
+        Returns:
+            dict: The record or None if the object has been built.
+        """
+
+        value = super().get(key)
+        if type(value) is tuple:
+            return self.decoder(*value)
+        return value if type(value) is dict else None
+
+    def __getitem__(self, key):
+        """Returns the object stored under key"""
+
+        return self.__load(key, super().__getitem__(key))
+
+    def __iter__(self):
+        """Yields all keys
+
+        Overriding it makes dict() and ** copy the objects through
+        __getitem__ instead of the stored records.
+        """
+
+        return super().__iter__()
+
+    def get(self, key, default=None):
+        """Returns the object stored under key or default"""
+
+        if key in self:
+            return self[key]
+        return default
+
+    def pop(self, key, *default):
+        """Removes key and returns its object"""
+
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *default)
+
+    def values(self):
+        """Returns a view of all objects, building the ones not built yet"""
+
+        return _Values(self)
+
+    def items(self):
+        """Returns a view of all key/object pairs, building the objects not
+        built yet"""
+
+        return _Items(self)
+
+    def copy(self):
+        """Returns a dict with all the objects built"""
+
+        return dict(self.items())
+
+    def __eq__(self, other):
+        """Compares the built objects with other"""
+
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        """Compares the built objects with other"""
+
+        return not self == other
+
+    def __repr__(self):
+        """Returns the representation of the built objects"""
+
+        return repr(dict(self.items()))
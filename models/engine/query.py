@@ -0,0 +1,233 @@
+#!/usr/bin/python3
+"""Module with Query class implementation"""
+
+import heapq
+import itertools
+import operator
+import sys
+
+
+class Query(object):
+    """Query over the objects of one class in storage.
+
+    A query is built by chaining where(), order_by(), limit(), offset() and
+    select(), and is run when it's iterated. The objects to check are
+    chosen by the storage's planner, which uses the attribute indexes when
+    a condition allows it, and are filtered one at a time. Results are
+    streamed unless they have to be sorted, and only the `limit` first of
+    them are kept while sorting. Queries going through all the objects of
+    a class and sorted by an attribute with a range index walk that index
+    instead, stopping after the `offset` + `limit` first results.
+
+    Example:
+        query = storage.query(Place).where(
+            ('price_by_night', '<', 100), max_guest=4).order_by(
+            'price_by_night').limit(20)
+        for place in query:
+            print(place)
+
+    Attributes:
+        operators (dict): Functions comparing an attribute value to the
+            value of a condition, by operator.
+    """
+
+    operators = {
+        '==': operator.eq,
+        '!=': operator.ne,
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge,
+        }
+
+    def __init__(self, storage, name):
+        """Initialize a query over all the objects of a class
+
+        Args:
+            storage (BaseStorage): Storage holding the objects.
+            name (str): Class name.
+        """
+
+        self.storage = storage
+        self.name = name
+        self.conditions = []
+        self.order = None
+        self.count = None
+        self.start = 0
+        self.fields = None
+
+    def where(self, *conditions, **attrs):
+        """Keeps only the objects matching all the given conditions.
+
+        Args:
+            conditions (tuple): (attribute name, operator, value) tuples.
+                The operator is one of ==, !=, <, <=, > and >=, or = which
+                is the same as ==.
+            attrs (dict): Attribute names and the values they must equal.
+
+        Returns:
+            Query: The query, so that calls can be chained.
+
+        Raises:
+            ValueError: If an operator is not supported.
+        """
+
+        for attr, op, value in conditions:
+            op = '==' if op == '=' else op
+            if op not in self.operators:
+                raise ValueError(f"unsupported operator: {op}")
+            self.conditions.append((attr, op, value))
+        for attr, value in attrs.items():
+            self.conditions.append((attr, '==', value))
+
+        return self
+
+    def order_by(self, attr):
+        """Sorts the results by the value of an attribute.
+
+        Args:
+            attr (str): Attribute name, prefixed with - to sort in
+                descending order.
+
+        Returns:
+            Query: The query, so that calls can be chained.
+        """
+
+        if attr.startswith('-'):
+            self.order = (attr[1:], True)
+        else:
+            self.order = (attr, False)
+
+        return self
+
+    def limit(self, count):
+        """Keeps only the first results
+
+        Args:
+            count (int): Maximum number of results.
+
+        Returns:
+            Query: The query, so that calls can be chained.
+
+        Raises:
+            TypeError: If count is not an integer.
+            ValueError: If count is negative or above sys.maxsize.
+        """
+
+        if type(count) is not int:
+            raise TypeError("limit must be an integer")
+        if not 0 <= count <= sys.maxsize:
+            raise ValueError("limit must be between 0 and sys.maxsize")
+        self.count = count
+
+        return self
+
+    def offset(self, start):
+        """Skips the first results, before applying the limit
+
+        Args:
+            start (int): Number of results to skip.
+
+        Returns:
+            Query: The query, so that calls can be chained.
+
+        Raises:
+            TypeError: If start is not an integer.
+            ValueError: If start is negative or above sys.maxsize.
+        """
+
+        if type(start) is not int:
+            raise TypeError("offset must be an integer")
+        if not 0 <= start <= sys.maxsize:
+            raise ValueError("offset must be between 0 and sys.maxsize")
+        self.start = start
+
+        return self
+
+    def select(self, *attrs):
+        """Returns dictionaries of the given attributes instead of objects
+
+        Args:
+            attrs (tuple): Attribute names.
+
+        Returns:
+            Query: The query, so that calls can be chained.
+        """
+
+        self.fields = attrs
+
+        return self
+
+    def __matches(self, obj):
+        """Returns whether obj matches all the conditions
+
+        Values that can't be compared, like a string and a number, don't
+        match.
+
+        Args:
+            obj (object): Object to check.
+        """
+
+        missing = object()
+        for attr, op, value in self.conditions:
+            current = getattr(obj, attr, missing)
+            if current is missing:
+                return False
+            try:
+                if not self.operators[op](current, value):
+                    return False
+            except TypeError:
+                return False
+
+        return True
+
+    def __iter__(self):
+        """Runs the query
+
+        Yields:
+            object | dict: Matching objects, or dictionaries of their
+                selected attributes.
+
+        Raises:
+            TypeError: If the results are sorted by an attribute holding
+                values that can't be compared.
+        """
+
+        objects = self.storage.all()
+        keys = self.storage._candidates(self.name, self.conditions)
+        ordered = None
+        if (self.order is not None
+                and len(keys) == self.storage.count(self.name)):
+            ordered = self.storage._ordered(self.name, *self.order)
+        if ordered is not None:
+            keys = ordered
+        else:
+            keys = list(keys)
+        results = (
+            obj for obj in (objects[key] for key in keys)
+            if self.__matches(obj)
+            )
+
+        stop = (None if self.count is None
+                else min(self.start + self.count, sys.maxsize))
+        if self.order is not None and ordered is None:
+            attr, reverse = self.order
+
+            def key(obj):
+                return getattr(obj, attr, None)
+
+            if stop is None:
+                results = sorted(results, key=key, reverse=reverse)
+            elif reverse:
+                results = heapq.nlargest(stop, results, key=key)
+            else:
+                results = heapq.nsmallest(stop, results, key=key)
+            results = results[self.start:]
+        elif self.start or stop is not None:
+            results = itertools.islice(results, self.start, stop)
+
+        for obj in results:
+            if self.fields is None:
+                yield obj
+            else:
+                yield {attr: getattr(obj, attr, None) for attr in self.fields}
@@ -0,0 +1,289 @@
+#!/usr/bin/python3
+"""Module with the formats used to write the storage file.
+
+A serializer turns every stored record (the dictionary returned by
+to_dict()) into a fragment of bytes and joins the fragments into a
+file. Fragments of unchanged objects can therefore be reused by the
+storage between saves.
+
+Formats:
+    json: Indented JSON, the original format of file.json.
+    compact: JSON without indentation and spaces.
+    binary: Frames made of the key and the pickle (protocol 5) of its
+        record, after a magic header. Keys can be read without unpickling
+        the records.
+
+Usage:
+    python3 -m models.engine.serializers <source> <destination> <format>
+"""
+
+import io
+import json
+import pickle
+import struct
+import sys
+
+
+class JSONSerializer(object):
+    """Serializer writing indented JSON"""
+
+    name = "json"
+
+    def fragment(self, key, record):
+        """Returns the bytes of one record.
+
+        Args:
+            key (str): Key of the record.
+            record (dict): Dictionary representation of an object.
+
+        Returns:
+            bytes: Encoded record.
+        """
+
+        return "    {}: {}".format(
+            json.dumps(key),
+            json.dumps(record, indent=4).replace("\n", "\n    ")).encode()
+
+    def write(self, f, fragments):
+        """Writes the fragments of all records to a file.
+
+        The output is the same as json.dump(..., indent=4) of the records.
+
+        Args:
+            f (file): File opened in binary mode.
+            fragments (list): Bytes returned by fragment().
+        """
+
+        if fragments:
+            f.write(b"{\n" + b",\n".join(fragments) + b"\n}")
+        else:
+            f.write(b"{}")
+
+    def loads(self, data):
+        """Returns the records found in data.
+
+        Args:
+            data (bytes): Content of a file.
+
+        Returns:
+            dict: Records by key.
+
+        Raises:
+            ValueError: If data is not valid JSON.
+        """
+
+        return json.loads(data)
+
+
+class CompactJSONSerializer(JSONSerializer):
+    """Serializer writing JSON without indentation or spaces"""
+
+    name = "compact"
+
+    def fragment(self, key, record):
+        """Returns the bytes of one record.
+
+        Args:
+            key (str): Key of the record.
+            record (dict): Dictionary representation of an object.
+
+        Returns:
+            bytes: Encoded record.
+        """
+
+        return "{}:{}".format(
+            json.dumps(key),
+            json.dumps(record, separators=(",", ":"))).encode()
+
+    def write(self, f, fragments):
+        """Writes the fragments of all records to a file.
+
+        Args:
+            f (file): File opened in binary mode.
+            fragments (list): Bytes returned by fragment().
+        """
+
+        f.write(b"{" + b",".join(fragments) + b"}")
+
+
+class RecordUnpickler(pickle.Unpickler):
+    """Unpickler refusing to load anything else than builtin values"""
+
+    def find_class(self, module, name):
+        """Refuse to load any class or function
+
+        Raises:
+            pickle.UnpicklingError: Always.
+        """
+
+        raise pickle.UnpicklingError(f"{module}.{name} is not allowed")
+
+
+class BinarySerializer(object):
+    """Serializer writing pickle frames.
+
+    The file starts with `magic`. Every record follows as a `header`
+    holding the length of its pickle and of its key, the UTF-8 key and
+    the pickle of the record.
+    """
+
+    name = "binary"
+    magic = b"HBNB\x01"
+    header = struct.Struct("<IH")
+
+    def fragment(self, key, record):
+        """Returns the bytes of one record.
+
+        Args:
+            key (str): Key of the record.
+            record (dict): Dictionary representation of an object.
+
+        Returns:
+            bytes: Encoded record.
+        """
+
+        key = key.encode()
+        data = pickle.dumps(record, protocol=5)
+        return self.header.pack(len(data), len(key)) + key + data
+
+    def write(self, f, fragments):
+        """Writes the fragments of all records to a file.
+
+        Args:
+            f (file): File opened in binary mode.
+            fragments (list): Bytes returned by fragment().
+        """
+
+        f.write(self.magic)
+        f.writelines(fragments)
+
+    def frames(self, data):
+        """Yields the key and the position of every record in data.
+
+        Only the keys are decoded, so that an index of the records can be
+        built without unpickling them.
+
+        Args:
+            data (bytes | mmap.mmap): Content of a file.
+
+        Yields:
+            tuple: Key, offset and length of each record's pickle.
+
+        Raises:
+            ValueError: If data is truncated.
+        """
+
+        offset = len(self.magic)
+        size = self.header.size
+        end = len(data)
+        while offset < end:
+            if offset + size > end:
+                raise ValueError("invalid binary file: truncated header")
+            length, key_length = self.header.unpack_from(data, offset)
+            offset += size
+            key = bytes(data[offset:offset + key_length]).decode()
+            offset += key_length
+            if offset + length > end:
+                raise ValueError("invalid binary file: truncated record")
+            yield key, offset, length
+            offset += length
+
+    def load_frame(self, data, offset, length):
+        """Returns the record pickled at a position of data.
+
+        Args:
+            data (bytes | mmap.mmap): Content of a file.
+            offset (int): Position of the pickle.
+            length (int): Length of the pickle.
+
+        Returns:
+            dict: Record.
+
+        Raises:
+            ValueError: If the pickle is invalid or holds anything else
+                than builtin values.
+        """
+
+        frame = io.BytesIO(data[offset:offset + length])
+        try:
+            return RecordUnpickler(frame).load()
+        except (pickle.UnpicklingError, EOFError) as e:
+            raise ValueError(f"invalid binary file: {e}") from e
+
+    def loads(self, data):
+        """Returns the records found in data.
+
+        Args:
+            data (bytes): Content of a file.
+
+        Returns:
+            dict: Records by key.
+
+        Raises:
+            ValueError: If data is not a valid binary file.
+        """
+
+        try:
+            return {
+                key: self.load_frame(data, offset, length)
+                for key, offset, length in self.frames(data)
+                }
+        except (pickle.UnpicklingError, struct.error, EOFError,
+                UnicodeDecodeError) as e:
+            raise ValueError(f"invalid binary file: {e}") from e
+
+
+formats = {
+    serializer.name: serializer
+    for serializer in (
+        JSONSerializer(), CompactJSONSerializer(), BinarySerializer())
+    }
+
+
+def detect(data):
+    """Returns the serializer able to read data.
+
+    Args:
+        data (bytes): Content of a file.
+
+    Returns:
+        object: BinarySerializer if data starts with its magic header,
+            JSONSerializer otherwise. Both JSON formats are read the same
+            way.
+    """
+
+    if data.startswith(BinarySerializer.magic):
+        return formats["binary"]
+    return formats["json"]
+
+
+def convert(source, destination, name):
+    """Converts a storage file to another format.
+
+    Args:
+        source (str): Path of the file to convert. Its format is detected.
+        destination (str): Path of the converted file.
+        name (str): Name of the format to convert to.
+
+    Raises:
+        KeyError: If the format doesn't exist.
+    """
+
+    serializer = formats[name]
+    with open(source, "rb") as f:
+        data = f.read()
+    records = detect(data).loads(data)
+
+    fragments = [
+        serializer.fragment(key, record) for key, record in records.items()
+        ]
+    with open(destination, "wb") as f:
+        serializer.write(f, fragments)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[3] not in formats:
+        print("Usage: {} <source> <destination> <{}>".format(
+            sys.argv[0], "|".join(formats)), file=sys.stderr)
+        sys.exit(1)
+    convert(*sys.argv[1:])
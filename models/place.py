@@ -17,3 +17,8 @@ class Place(BaseModel):
     latitude = 0.0
     longitude = 0.0
     amenity_ids = []
+
+    indexes = ('city_id', 'user_id')
+    range_indexes = ('number_rooms', 'max_guest', 'price_by_night',
+                     'latitude', 'longitude')
+    references = {'city_id': 'City', 'user_id': 'User'}
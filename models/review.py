@@ -9,3 +9,6 @@ class Review(BaseModel):
     place_id = ''
     user_id = ''
     text = ''
+
+    indexes = ('place_id', 'user_id')
+    references = {'place_id': 'Place', 'user_id': 'User'}
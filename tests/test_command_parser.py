@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""Module for testing the parser of the console's dot syntax"""
+
+import unittest
+
+from command_parser import ParseError, parse, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+    """Class for testing the tokenizer"""
+
+    def test_tokens(self):
+        """Test that a line is split into typed tokens without spaces"""
+        self.assertEqual(
+            tokenize('Place.where(price <= 1.5, "a b")'),
+            [('word', 'Place'), ('punct', '.'), ('word', 'where'),
+             ('punct', '('), ('word', 'price'), ('op', '<='),
+             ('number', '1.5'), ('punct', ','), ('string', '"a b"'),
+             ('punct', ')')])
+
+    def test_ids_are_words(self):
+        """Test that ids starting with digits aren't read as numbers"""
+        self.assertEqual(tokenize('1234-abcd 12'),
+                         [('word', '1234-abcd'), ('number', '12')])
+
+    def test_unexpected_characters(self):
+        """Test that characters that can't start a token are kept as
+        errors"""
+        self.assertEqual(tokenize('a !b'),
+                         [('word', 'a'), ('error', '!'), ('word', 'b')])
+
+
+class TestParse(unittest.TestCase):
+    """Class for testing the parser"""
+
+    def test_calls(self):
+        """Test that a command is parsed into its class name and calls"""
+        self.assertEqual(parse('User.all()'), ('User', [('all', [], [])]))
+        self.assertEqual(
+            parse('Place.where(price_by_night<100).order_by(-price_by_night)'
+                  '.limit(5)'),
+            ('Place', [('where', [], [('price_by_night', '<', 100)]),
+                       ('order_by', ['-price_by_night'], []),
+                       ('limit', [5], [])]))
+
+    def test_typed_values(self):
+        """Test that arguments are given with their types"""
+        _, calls = parse('''A.b(id-1, "12", 12, -3, 1.5, 2e3, 'it\\'s')''')
+        self.assertEqual(calls[0][1],
+                         ['id-1', '12', 12, -3, 1.5, 2000.0, "it's"])
+        self.assertIs(type(calls[0][1][2]), int)
+
+    def test_containers(self):
+        """Test that dictionaries and lists are parsed with their values"""
+        _, calls = parse(
+            "A.update(1, {'name': \"Texas\", 'rank': 2, 'tags': [true, "
+            "null, {}], 'empty': []})")
+        self.assertEqual(
+            calls[0][1],
+            [1, {'name': 'Texas', 'rank': 2, 'tags': [True, None, {}],
+                 'empty': []}])
+        _, calls = parse('A.b(true)')
+        self.assertEqual(calls[0][1], ['true'])
+
+    def test_conditions(self):
+        """Test that every operator makes a condition"""
+        for op in ('=', '==', '!=', '<', '<=', '>', '>='):
+            _, calls = parse(f'A.where(rank {op} "3")')
+            self.assertEqual(calls[0][2], [('rank', op, '3')])
+
+    def test_errors(self):
+        """Test that invalid lines raise ParseError with the first method"""
+        for line, method in (('', None), ('A', None), ('A.()', None),
+                             ('A.b', 'b'), ('A.b(1', 'b'), ('A.b(,)', 'b'),
+                             ('A.b() c', 'b'), ('A.b({1 2})', 'b'),
+                             ('A.b().c(!)', 'b'), ('A.b("a)', 'b'),
+                             ('A.b({[1]: 2})', 'b'), ('A.b({{}: 2})', 'b')):
+            with self.assertRaises(ParseError, msg=line) as error:
+                parse(line)
+            self.assertEqual(error.exception.method, method, line)
+        self.assertIsInstance(ParseError('error'), ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 #!/usr/bin/python3
 """Module for testing the console"""
 
+import json
+import os
+import tempfile
 import uuid
 import unittest
 import sys
@@ -9,7 +12,9 @@ from unittest.mock import patch
 
 from console import HBNBCommand
 from models import storage
+from models.engine.file_storage import FileStorage
 from models.base_model import BaseModel
+from models.state import State
 
 
 class TestConsoleCreate(unittest.TestCase):
@@ -86,6 +91,46 @@ class TestConsoleCreate(unittest.TestCase):
         self.assertEqual(instance_id.version, 4)
         self.assertTrue(storage.all()[f'State.{str(instance_id)}'])
 
+    def test_create_many(self):
+        """Test that create with a number creates that many instances"""
+        before = storage.count(State)
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('create State 3')
+        ids = output.getvalue().split()
+        self.assertEqual(len(ids), 3)
+        for instance_id in ids:
+            self.assertIn(f'State.{instance_id}', storage.all())
+        self.assertEqual(storage.count(State), before + 3)
+
+    def test_create_many_with_invalid_number(self):
+        """Test that create prints '** invalid number of instances **' if
+        the number isn't a positive integer"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('create State many')
+        printed_str = output.getvalue()[:-1]
+        self.assertEqual(printed_str, "** invalid number of instances **")
+
+    def test_create_many_from_default(self):
+        """Test the <class name>.create_many() syntax"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd(
+                "State.create_many([{'name': 'Texas'}, {'name': 'Ohio'}])")
+        ids = output.getvalue().split()
+        self.assertEqual(
+            [storage.all()[f'State.{i}'].name for i in ids],
+            ['Texas', 'Ohio'])
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('State.create_many(2)')
+        self.assertEqual(len(output.getvalue().split()), 2)
+
+    def test_create_many_from_default_with_invalid_instances(self):
+        """Test that create_many prints '** invalid instances **' for
+        arguments that aren't a number or a list of dictionaries"""
+        for args in ('', '[1, 2]', '{"name": "Texas"}', '-1'):
+            with patch('sys.stdout', StringIO()) as output:
+                HBNBCommand().onecmd(f'State.create_many({args})')
+            self.assertEqual(output.getvalue(), "** invalid instances **\n")
+
 
 class TestConsoleShow(unittest.TestCase):
     """Class for testing the show command"""
@@ -127,6 +172,489 @@ class TestConsoleShow(unittest.TestCase):
         printed_str = output.getvalue()[:-1]
         self.assertEqual(printed_str, "** no instance found **")
 
+    def test_show_from_default(self):
+        """Test the <class name>.show() syntax, with or without quotes"""
+
+        instance = BaseModel()
+        for line in (f'BaseModel.show({instance.id})',
+                     f'BaseModel.show("{instance.id}")'):
+            with patch('sys.stdout', StringIO()) as output:
+                HBNBCommand().onecmd(line)
+            self.assertEqual(output.getvalue(), f'{instance}\n')
+
+    def test_unknown_syntax(self):
+        """Test that lines the parser rejects print '*** Unknown syntax'"""
+
+        for line in ('BaseModel.show(', 'BaseModel.fly()',
+                     'BaseModel.show().show()', 'BaseModel.all(a=1)'):
+            with patch('sys.stdout', StringIO()) as output:
+                HBNBCommand().onecmd(line)
+            self.assertEqual(output.getvalue(),
+                             f'*** Unknown syntax: {line}\n')
+
+
+class TestConsoleDestroy(unittest.TestCase):
+    """Class for testing the destroy command"""
+
+    def setUp(self):
+        """Setup states with a unique name"""
+        self.name = str(uuid.uuid4())
+        self.states = State.create_many(
+            [{'name': self.name, 'rank': 1}, {'name': self.name, 'rank': 2},
+             {'name': 'other'}])
+
+    def test_destroy(self):
+        """Test that destroy deletes the instance with the given id"""
+        instance = self.states[2]
+        HBNBCommand().onecmd(f'destroy State {instance.id}')
+        self.assertNotIn(f'State.{instance.id}', storage.all())
+
+    def test_destroy_with_filter(self):
+        """Test that destroy with filters deletes the matching instances
+        and prints how many were deleted"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd(f'destroy State name={self.name} rank=2')
+        self.assertEqual(output.getvalue(), '1\n')
+        self.assertEqual(
+            storage.find(State, name=self.name), [self.states[0]])
+
+    def test_destroy_where_from_default(self):
+        """Test the <class name>.destroy_where() syntax"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd(f'State.destroy_where(name="{self.name}")')
+        self.assertEqual(output.getvalue(), '2\n')
+        self.assertEqual(storage.find(State, name=self.name), [])
+        self.assertIn(f'State.{self.states[2].id}', storage.all())
+
+    def test_destroy_where_invalid(self):
+        """Test the errors of destroy with filters"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('destroy Class name=a')
+            HBNBCommand().onecmd('State.destroy_where(name)')
+        self.assertEqual(output.getvalue(), "** class doesn't exist **\n"
+                                            "** invalid filter **\n")
+        self.assertEqual(len(storage.find(State, name=self.name)), 2)
+
+    def test_destroy_where_with_rejected_values(self):
+        """Test that values raising TypeError or ValueError print
+        '** invalid filter **'"""
+        for error in (TypeError, ValueError):
+            with patch.object(State, 'destroy_where', side_effect=error), \
+                    patch('sys.stdout', StringIO()) as output:
+                HBNBCommand().onecmd('State.destroy_where(name=[1])')
+            self.assertEqual(output.getvalue(), "** invalid filter **\n")
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('State.destroy_where(name=[1])')
+        self.assertEqual(output.getvalue(), '0\n')
+
+
+class TestConsoleAll(unittest.TestCase):
+    """Class for testing the all command"""
+
+    def test_all_with_class(self):
+        """Test that all prints only instances of the given class"""
+        instance = State()
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('all State')
+        printed_str = output.getvalue()[:-1]
+        self.assertIn(str(instance), printed_str)
+        self.assertNotIn('[User]', printed_str)
+
+    def test_all_with_invalid_class(self):
+        """Test that all prints '** class doesn't exist **' for an invalid
+        class"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('all ClassNotFound')
+        printed_str = output.getvalue()[:-1]
+        self.assertEqual(printed_str, "** class doesn't exist **")
+
+    def all(self, line):
+        """Run all and return what's printed"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue()
+
+    def test_all_prints_a_list(self):
+        """Test that the streamed output is the printed list of the
+        instances, whatever the size of the chunks"""
+        State.create_many(3)
+        expected = StringIO()
+        print([str(obj) for obj in storage.all(State).values()],
+              file=expected)
+        self.assertEqual(self.all('all State'), expected.getvalue())
+        with patch.object(HBNBCommand, 'buffer_size', 1):
+            self.assertEqual(self.all('State.all()'), expected.getvalue())
+        expected = StringIO()
+        print([str(obj) for obj in storage.all().values()], file=expected)
+        self.assertEqual(self.all('all'), expected.getvalue())
+
+    def test_all_with_limit_and_offset(self):
+        """Test that --limit and --offset print a page of the instances"""
+        State.create_many(3)
+        states = [str(obj) for obj in storage.all(State).values()]
+        self.assertEqual(self.all('all State --offset 1 --limit 2'),
+                         f'{states[1:3]}\n')
+        self.assertEqual(self.all('all State --limit 1'), f'{states[:1]}\n')
+        self.assertEqual(self.all(f'all State --offset {len(states)}'), '')
+        objs = [str(obj) for obj in storage.all().values()]
+        self.assertEqual(self.all('all --limit 2 --offset 1'),
+                         f'{objs[1:3]}\n')
+        for line in ('all State --limit', 'all State --limit -1',
+                     'all State --size 2', 'all State 2',
+                     f'all State --limit {sys.maxsize + 1}'):
+            self.assertEqual(self.all(line), "** invalid options **\n")
+        for line in ('all', 'all State'):
+            self.assertEqual(self.all(
+                f'{line} --offset {sys.maxsize} --limit {sys.maxsize}'), '')
+
+    def test_all_with_pager(self):
+        """Test that --page writes through $PAGER only on a terminal"""
+        instance = State()
+        with tempfile.TemporaryDirectory() as tmp:
+            paged = os.path.join(tmp, 'paged')
+            with patch.dict(os.environ, {'PAGER': f'cat > {paged}'}):
+                self.assertIn(str(instance), self.all('all State --page'))
+                self.assertFalse(os.path.exists(paged))
+                with patch('sys.stdout', StringIO()) as output, \
+                        patch.object(output, 'isatty', return_value=True):
+                    HBNBCommand().onecmd('all State --page')
+                self.assertEqual(output.getvalue(), '')
+                with open(paged, 'r') as f:
+                    self.assertIn(str(instance), f.read())
+
+    def test_pager_runs_without_lock(self):
+        """Test that the storage lock isn't held while the pager is open"""
+        State()
+        held = []
+        with patch('subprocess.Popen') as popen, \
+                patch('sys.stdout', StringIO()) as output, \
+                patch.object(output, 'isatty', return_value=True):
+            popen.return_value.stdin = StringIO()
+            popen.return_value.wait.side_effect = (
+                lambda: held.append(storage.lock._is_owned()))
+            HBNBCommand().onecmd('all State --page')
+        self.assertEqual(held, [False])
+
+
+class TestConsoleWhere(unittest.TestCase):
+    """Class for testing the <class name>.where() queries"""
+
+    def setUp(self):
+        """Setup states with a unique name"""
+        self.name = str(uuid.uuid4())
+        self.states = State.create_many(
+            [{'name': self.name, 'rank': rank, 'motto': f'm{rank}'}
+             for rank in (3, 1, 2)])
+
+    def query(self, line):
+        """Run a query and return what's printed"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue()
+
+    def test_where(self):
+        """Test that where prints the matching instances like all"""
+        printed = self.query(f'State.where(name="{self.name}", rank>=2)')
+        self.assertEqual(
+            printed, f'{[str(self.states[0]), str(self.states[2])]}\n')
+
+    def test_order_by_limit_and_select(self):
+        """Test sorting, limiting and selecting attributes"""
+        printed = self.query(
+            f"State.where(name == '{self.name}').order_by(-rank).limit(2)"
+            ".select(rank, motto)")
+        self.assertEqual(
+            printed, "[{'rank': 3, 'motto': 'm3'}, {'rank': 2, "
+                     "'motto': 'm2'}]\n")
+
+    def test_no_result(self):
+        """Test that nothing is printed when nothing matches"""
+        self.assertEqual(self.query(f'State.where(name="{self.name}", '
+                                    'rank>3)'), '')
+
+    def test_invalid_query(self):
+        """Test that invalid queries print '** invalid query **'"""
+        for line in ('State.where(rank ~ 3)', 'State.where().limit(a)',
+                     'State.where().sort(rank)', 'State.where() rank'):
+            self.assertEqual(self.query(line), "** invalid query **\n")
+        self.assertEqual(self.query('Class.where()'),
+                         "** class doesn't exist **\n")
+
+
+class TestConsoleCount(unittest.TestCase):
+    """Class for testing the count command"""
+
+    def test_count(self):
+        """Test that count prints the number of instances of a class"""
+        before = storage.count(State)
+        State()
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('count State')
+        self.assertEqual(output.getvalue(), f'{before + 1}\n')
+
+    def test_count_with_invalid_class(self):
+        """Test that count prints '** class doesn't exist **' for an invalid
+        class"""
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd('count ClassNotFound')
+        printed_str = output.getvalue()[:-1]
+        self.assertEqual(printed_str, "** class doesn't exist **")
+
+
+class TestConsoleUpdate(unittest.TestCase):
+    """Class for testing the update command"""
+
+    def test_update(self):
+        """Test that update sets and casts the attribute"""
+        instance = State()
+        HBNBCommand().onecmd(f'update State {instance.id} name "New York"')
+        HBNBCommand().onecmd(f'update State {instance.id} code 12')
+        self.assertEqual(instance.name, 'New York')
+        self.assertEqual(instance.code, 12)
+
+    @unittest.skipUnless(isinstance(storage, FileStorage),
+                         "writes file.json")
+    def test_update_with_dictionary_saves_once(self):
+        """Test that updating from a dictionary writes the file once"""
+        instance = State()
+        with patch.object(FileStorage, '_FileStorage__write_snapshot',
+                          autospec=True,
+                          side_effect=FileStorage._FileStorage__write_snapshot
+                          ) as write:
+            HBNBCommand().onecmd(
+                f'State.update("{instance.id}", '
+                '{"name": "Texas", "code": 3, "capital": "Austin"})')
+        self.assertEqual(instance.name, 'Texas')
+        self.assertEqual(instance.code, 3)
+        self.assertEqual(instance.capital, 'Austin')
+        with open('file.json', 'r') as f:
+            saved = json.load(f)[f'State.{instance.id}']
+        self.assertEqual(saved['capital'], 'Austin')
+        self.assertEqual(write.call_count, 1)
+
+    def test_update_from_default_keeps_types(self):
+        """Test that the <class name>.update() syntax keeps the types of
+        the values and prints nothing"""
+        instance = State()
+        with patch('sys.stdout', StringIO()) as output:
+            HBNBCommand().onecmd(
+                f'State.update("{instance.id}", '
+                '{"name": "New York", "code": "12", "tags": ["a", "b"]})')
+            HBNBCommand().onecmd(f'State.update({instance.id}, rank, 2.5)')
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual(instance.name, 'New York')
+        self.assertEqual(instance.code, '12')
+        self.assertEqual(instance.tags, ['a', 'b'])
+        self.assertEqual(instance.rank, 2.5)
+
+    def test_update_from_default_with_missing_arguments(self):
+        """Test the error messages of the <class name>.update() syntax"""
+        instance = State()
+        for args, message in (
+                ('', "** instance id missing **"),
+                ('"1234"', "** no instance found **"),
+                (f'"{instance.id}"', "** attribute name missing **"),
+                (f'"{instance.id}", "name"', "** value missing **")):
+            with patch('sys.stdout', StringIO()) as output:
+                HBNBCommand().onecmd(f'State.update({args})')
+            self.assertEqual(output.getvalue(), f'{message}\n')
+
+
+class TestConsoleFormat(unittest.TestCase):
+    """Class for testing the json output format"""
+
+    def setUp(self):
+        """Setup a console printing NDJSON and states with a unique name"""
+        self.console = HBNBCommand()
+        self.console.onecmd('set format json')
+        self.name = str(uuid.uuid4())
+        self.states = State.create_many(
+            [{'name': self.name, 'rank': rank} for rank in (2, 1)])
+
+    def records(self, line):
+        """Run a command and return the JSON records printed"""
+        with patch('sys.stdout', StringIO()) as output:
+            self.console.onecmd(line)
+        return [json.loads(record) for record in output.getvalue().split('\n')
+                if record]
+
+    def test_set_format(self):
+        """Test that set changes and prints the format"""
+        for line, printed in (
+                ('set format', 'json\n'),
+                ('set', "** option name missing **\n"),
+                ('set color red', "** option doesn't exist **\n"),
+                ('set format xml', "** invalid format **\n")):
+            with patch('sys.stdout', StringIO()) as output:
+                self.console.onecmd(line)
+            self.assertEqual(output.getvalue(), printed)
+        self.console.onecmd('set format text')
+        self.assertEqual(self.console.output_format, 'text')
+        self.assertEqual(HBNBCommand().output_format, 'text')
+
+    def test_show(self):
+        """Test that show prints the dictionary of the instance"""
+        state = self.states[0]
+        for line in (f'show State {state.id}', f'State.show({state.id})'):
+            self.assertEqual(self.records(line), [state.to_dict()])
+
+    def test_all(self):
+        """Test that all prints one line per instance"""
+        expected = [obj.to_dict() for obj in storage.all(State).values()]
+        self.assertEqual(self.records('all State'), expected)
+        self.assertEqual(self.records('State.all()'), expected)
+        self.assertEqual(self.records('all State --limit 1'), expected[:1])
+        with patch.object(HBNBCommand, 'buffer_size', 1):
+            self.assertEqual(len(self.records('all')), storage.count())
+
+    def test_count(self):
+        """Test that count prints a record of the class and its count"""
+        expected = [{'__class__': 'State', 'count': storage.count(State)}]
+        self.assertEqual(self.records('count State'), expected)
+        self.assertEqual(self.records('State.count()'), expected)
+
+    def test_where(self):
+        """Test that where prints the matching or selected records"""
+        self.assertEqual(
+            self.records(f'State.where(name="{self.name}").order_by(rank)'),
+            [self.states[1].to_dict(), self.states[0].to_dict()])
+        records = self.records(
+            f'State.where(name="{self.name}", rank=2).select(rank, '
+            'created_at)')
+        self.assertEqual(records, [{
+            'rank': 2, 'created_at': self.states[0].created_at.isoformat()}])
+
+    def test_errors_are_still_text(self):
+        """Test that error messages aren't changed"""
+        with patch('sys.stdout', StringIO()) as output:
+            self.console.onecmd('show State 1234')
+        self.assertEqual(output.getvalue(), "** no instance found **\n")
+
+
+class TestConsoleWriteBehind(unittest.TestCase):
+    """Class for testing that the console flushes deferred saves"""
+
+    def test_quit_and_eof_flush(self):
+        """Test that quit and EOF write the saves left to write-behind"""
+        for command in ('quit', 'EOF'):
+            with patch.object(type(storage), '_flush_delay', 60):
+                with patch('sys.stdout', StringIO()):
+                    HBNBCommand().onecmd('create State')
+                self.assertIsNotNone(type(storage)._flush_pending)
+                with patch.object(type(storage), '_write', autospec=True,
+                                  side_effect=type(storage)._write) as write:
+                    HBNBCommand().onecmd(command)
+                self.assertEqual(write.call_count, 1)
+                self.assertIsNone(type(storage)._flush_pending)
+
+
+class TestConsoleReadOnly(unittest.TestCase):
+    """Class for testing the console on a read-only storage"""
+
+    def test_writes_are_refused(self):
+        """Test that commands changing the storage are refused up front"""
+        instance = State()
+        count = storage.count()
+        with patch.object(type(storage), 'read_only', True):
+            for line in ('create State', 'State.create()',
+                         'State.create_many(2)',
+                         f'destroy State {instance.id}',
+                         f'State.destroy({instance.id})',
+                         'State.destroy_where()',
+                         f'update State {instance.id} name "Texas"',
+                         f'State.update({instance.id}, name, "Texas")'):
+                with patch('sys.stdout', StringIO()) as output:
+                    HBNBCommand().onecmd(line)
+                self.assertEqual(output.getvalue(),
+                                 "** storage is read-only **\n", line)
+            with patch('sys.stdout', StringIO()) as output:
+                HBNBCommand().onecmd(f'State.show({instance.id})')
+            self.assertEqual(output.getvalue(), f'{instance}\n')
+        self.assertEqual(storage.count(), count)
+        self.assertNotIn('name', instance.to_dict())
+
+
+class TestConsoleBatch(unittest.TestCase):
+    """Class for testing scripts run with run_batch"""
+
+    def run_batch(self, lines):
+        """Run a script and return the number of errors, stdout and
+        stderr"""
+        with patch('sys.stdout', StringIO()) as output, \
+                patch('sys.stderr', StringIO()) as errors:
+            failed = HBNBCommand().run_batch(lines)
+        return failed, output.getvalue(), errors.getvalue()
+
+    def test_saves_once(self):
+        """Test that the saves of all the commands are written once"""
+        with patch.object(type(storage), '_write', autospec=True,
+                          side_effect=type(storage)._write) as write:
+            failed, output, errors = self.run_batch(
+                ['create State\n', '# comment\n', '\n', 'create City\n'])
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(failed, 0)
+        state_id, city_id = output.split()
+        self.assertIn(f'State.{state_id}', storage.all())
+        self.assertIn(f'City.{city_id}', storage.all())
+        self.assertRegex(errors, r'^2 commands, 0 failed, ')
+
+    def test_errors_do_not_abort(self):
+        """Test that a failing command is reported, rolled back and
+        doesn't stop the script"""
+        instance = State()
+        with patch.object(HBNBCommand, 'do_count',
+                          side_effect=RuntimeError('boom')):
+            failed, output, errors = self.run_batch([
+                f'update State {instance.id} name "Texas"',
+                'count State',
+                f'update State {instance.id} code 3',
+                ])
+        self.assertEqual(failed, 1)
+        self.assertEqual(output, '')
+        self.assertIn("line 2: count State: RuntimeError('boom')", errors)
+        self.assertEqual((instance.name, instance.code), ('Texas', 3))
+
+    def test_failed_command_is_rolled_back(self):
+        """Test that the changes of a failing command are undone"""
+        instance = State()
+        instance.name = 'Ohio'
+
+        def fail(obj, name, value):
+            storage.touch(obj)
+            obj.__dict__[name] = value
+            raise ValueError
+
+        with patch.object(State, '__setattr__', fail):
+            failed, output, errors = self.run_batch(
+                [f'update State {instance.id} name "Texas"'])
+        self.assertEqual(failed, 1)
+        self.assertEqual(instance.name, 'Ohio')
+
+    def test_quit_ends_script(self):
+        """Test that the commands after quit are not run"""
+        failed, output, errors = self.run_batch(
+            ['count State', 'quit', 'count ClassNotFound'])
+        self.assertEqual(output, f'{storage.count(State)}\n')
+        self.assertRegex(errors, r'^2 commands, 0 failed, .* saving\n$')
+
+    def test_printed_errors_are_failures(self):
+        """Test that the error messages of the commands are reported with
+        their line numbers and counted as failures"""
+        instance = State()
+        failed, output, errors = self.run_batch([
+            'create Nope', 'show State bad', 'State.update(',
+            f'State.show({instance.id})', 'create',
+            ])
+        self.assertEqual(failed, 4)
+        self.assertEqual(output, f'{instance}\n')
+        self.assertEqual(errors.splitlines()[:4], [
+            "line 1: create Nope: ** class doesn't exist **",
+            "line 2: show State bad: ** no instance found **",
+            "line 3: State.update(: *** Unknown syntax: State.update(",
+            "line 5: create: ** class name missing **",
+            ])
+        self.assertRegex(errors, r'\n5 commands, 4 failed, ')
+
 
 class TestConsoleQuit(unittest.TestCase):
     """Class for testing the quit command"""
@@ -157,7 +685,7 @@ class TestConsoleHelp(unittest.TestCase):
         """Test the help command without any arguments"""
         expected = """\nDocumented commands (type help <topic>):
 ========================================
-EOF  all  count  create  destroy  help  quit  show  update\n"""
+EOF  all  count  create  destroy  help  quit  set  show  update\n"""
         with patch('sys.stdout', StringIO()) as output:
             HBNBCommand().onecmd(f'help')
         printed_str = output.getvalue()[:-1]
@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 """Test module for BaseModel class"""
+import os
 import unittest
 import uuid
 from datetime import datetime
+from unittest.mock import patch
 
 from models.base_model import BaseModel
 from models import storage
@@ -261,5 +263,126 @@ class TestBaseModelToDictMethod(unittest.TestCase):
             self.instance.to_dict(12)
 
 
+class TestBaseModelRegistry(unittest.TestCase):
+    """Class for testing the registry of model classes"""
+
+    def test_registry_contains_models(self):
+        """Test that BaseModel and its subclasses are registered by name"""
+        from models.user import User
+        from models.review import Review
+        self.assertIs(BaseModel.registry['BaseModel'], BaseModel)
+        self.assertIs(BaseModel.registry['User'], User)
+        self.assertIs(BaseModel.registry['Review'], Review)
+
+    def test_new_subclass_is_registered(self):
+        """Test that defining a subclass adds it to the registry"""
+        class Booking(BaseModel):
+            """Booking class used in testing"""
+        self.addCleanup(BaseModel.registry.pop, 'Booking')
+        self.assertIs(BaseModel.registry['Booking'], Booking)
+
+
+class TestBaseModelCreateMany(unittest.TestCase):
+    """Class for testing the create_many class method"""
+
+    def test_create_many_with_number(self):
+        """Test that create_many creates and stores the given number of
+        instances"""
+        objs = BaseModel.create_many(3)
+        self.assertEqual(len(objs), 3)
+        self.assertEqual(len({obj.id for obj in objs}), 3)
+        for obj in objs:
+            self.assertEqual(uuid.UUID(obj.id).version, 4)
+            self.assertIs(type(obj.created_at), datetime)
+            self.assertIs(storage.all()[f'BaseModel.{obj.id}'], obj)
+
+    def test_create_many_with_attributes(self):
+        """Test that create_many sets the attributes of every instance"""
+        objs = BaseModel.create_many([{'name': 'a'}, {'name': 'b', 'n': 1}])
+        self.assertEqual([obj.name for obj in objs], ['a', 'b'])
+        self.assertEqual(objs[1].n, 1)
+        self.assertEqual(set(objs[0].to_dict()),
+                         {'id', 'created_at', 'updated_at', 'name',
+                          '__class__'})
+
+    def test_create_many_saves_once(self):
+        """Test that create_many writes the storage once"""
+        with patch.object(type(storage), '_write', autospec=True,
+                          side_effect=type(storage)._write) as write:
+            BaseModel.create_many(50)
+        self.assertEqual(write.call_count, 1)
+
+    def test_create_many_invalid(self):
+        """Test that create_many rejects invalid arguments"""
+        count = storage.count(BaseModel)
+        with self.assertRaises(ValueError):
+            BaseModel.create_many(-1)
+        with self.assertRaises(TypeError):
+            BaseModel.create_many([{'name': 'a'}, 'b'])
+        with self.assertRaises(TypeError):
+            BaseModel.create_many(None)
+        self.assertEqual(storage.count(BaseModel), count)
+
+    def test_create_many_checks_attributes(self):
+        """Test that ids can't be given and that timestamps are loaded
+        like in a record"""
+        existing = BaseModel()
+        count = storage.count(BaseModel)
+        for attrs in ({'id': existing.id}, {'__class__': 'User'},
+                      {'created_at': 'bad'}, {'updated_at': 12},
+                      {'created_at': '2017-13-14T22:31:03'}):
+            with self.assertRaises((TypeError, ValueError)):
+                BaseModel.create_many([{'name': 'a'}, attrs])
+        self.assertEqual(storage.count(BaseModel), count)
+        self.assertIs(storage.all()[f'BaseModel.{existing.id}'], existing)
+
+        obj, = BaseModel.create_many(
+            [{'created_at': '2017-06-14T22:31:03.285259'}])
+        self.assertEqual(obj.created_at,
+                         datetime(2017, 6, 14, 22, 31, 3, 285259))
+
+    def test_create_many_refuses_taken_ids(self):
+        """Test that nothing is created if a new id is already taken"""
+        existing = BaseModel()
+        count = storage.count(BaseModel)
+        ids = uuid.UUID(existing.id).bytes + os.urandom(16)
+        with patch('os.urandom', return_value=ids[16:] + ids[:16]):
+            with self.assertRaises(ValueError):
+                BaseModel.create_many(2)
+        self.assertEqual(storage.count(BaseModel), count)
+        self.assertIs(storage.all()[f'BaseModel.{existing.id}'], existing)
+
+
+class TestBaseModelDestroyWhere(unittest.TestCase):
+    """Class for testing the destroy_where class method"""
+
+    def setUp(self):
+        """Setup instances with a unique name"""
+        self.name = str(uuid.uuid4())
+        self.objs = BaseModel.create_many(
+            [{'name': self.name}, {'name': self.name}, {'name': 'other'}])
+
+    def test_destroy_where(self):
+        """Test that destroy_where deletes the matching instances"""
+        self.assertEqual(BaseModel.destroy_where(name=self.name), 2)
+        self.assertEqual(storage.find(BaseModel, name=self.name), [])
+        self.assertIn(f'BaseModel.{self.objs[2].id}', storage.all())
+
+    def test_destroy_where_saves_once(self):
+        """Test that destroy_where writes the storage once, and not at all
+        if nothing matches"""
+        with patch.object(type(storage), '_write', autospec=True,
+                          side_effect=type(storage)._write) as write:
+            BaseModel.destroy_where(name=self.name)
+            BaseModel.destroy_where(name=self.name)
+        self.assertEqual(write.call_count, 1)
+
+    def test_destroy_where_without_filter(self):
+        """Test that destroy_where without filter deletes every instance of
+        the class"""
+        BaseModel.destroy_where()
+        self.assertEqual(storage.count(BaseModel), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+"""Module for testing the compact model classes"""
+
+import unittest
+from datetime import datetime
+
+from models import compact
+from models.base_model import BaseModel
+from models.place import Place
+from models.user import User
+
+
+class TestCompactClasses(unittest.TestCase):
+    """Class for testing the creation of compact classes"""
+
+    def test_compact_classes_keep_names(self):
+        """Test that compact classes have the names of the model classes"""
+        for name, cls in compact.classes.items():
+            self.assertEqual(cls.__name__, name)
+
+    def test_compact_classes_inherit_from_models(self):
+        """Test that compact classes are subclasses of the model classes"""
+        self.assertTrue(issubclass(compact.classes['Place'], Place))
+        self.assertTrue(issubclass(compact.classes['User'], BaseModel))
+
+    def test_model_attributes_are_slots(self):
+        """Test that model attributes are declared as slots"""
+        slots = compact.classes['User'].__slots__
+        for name in ('id', 'created_at', 'updated_at', 'email', 'password',
+                     'first_name', 'last_name'):
+            self.assertIn(name, slots)
+
+    def test_compact_classes_are_not_registered(self):
+        """Test that defining compact classes doesn't replace the models"""
+        self.assertIs(BaseModel.registry['User'], User)
+
+    def test_install(self):
+        """Test that install puts the compact classes in the registry"""
+        registry = BaseModel.registry.copy()
+        self.addCleanup(BaseModel.registry.update, registry)
+        compact.install()
+        self.assertIs(BaseModel.registry['User'], compact.classes['User'])
+
+
+class TestCompactInstances(unittest.TestCase):
+    """Class for testing instances of compact classes"""
+
+    def setUp(self):
+        """Setup a Place and its compact copy"""
+        self.place = Place()
+        self.place.name = 'Home'
+        self.place.price_by_night = 100
+        self.place.wifi = True
+        self.compact = compact.classes['Place'](**self.place.to_dict())
+
+    def test_to_dict_is_identical(self):
+        """Test that to_dict of a compact copy is the same"""
+        self.assertEqual(self.compact.to_dict(), self.place.to_dict())
+        self.assertEqual(list(self.compact.to_dict()),
+                         list(self.place.to_dict()))
+
+    def test_str_is_identical(self):
+        """Test that the str representation of a compact copy is the
+        same"""
+        self.assertEqual(str(self.compact), str(self.place))
+
+    def test_extra_attributes_not_in_dict(self):
+        """Test that attributes that aren't in the model aren't kept in
+        __dict__ either"""
+        str(self.compact)
+        self.compact.to_dict()
+        self.compact.garden = True
+        self.assertEqual(self.compact.garden, True)
+        self.assertEqual(self.compact.__dict__, {})
+        del self.compact.garden
+        self.assertFalse(hasattr(self.compact, 'garden'))
+
+    def test_insertion_order(self):
+        """Test that attributes set out of the slots' order are listed in
+        the order they were set"""
+        place = Place()
+        place.name = 'Home'
+        place.wifi = True
+        place.city_id = 'c1'
+        del place.name
+        place.name = 'Flat'
+        copy = compact.classes['Place'](**place.to_dict())
+        self.assertEqual(list(copy.to_dict()), list(place.to_dict()))
+        self.assertEqual(str(copy), str(place))
+        new = compact.classes['Place']()
+        new.name = 'Home'
+        new.city_id = 'c1'
+        self.assertEqual(list(new.attributes())[-2:], ['name', 'city_id'])
+
+    def test_defaults(self):
+        """Test that unset model attributes return the class defaults"""
+        self.assertEqual(self.compact.city_id, '')
+        self.assertEqual(self.compact.latitude, 0.0)
+        with self.assertRaises(AttributeError):
+            self.compact.unknown
+
+    def test_mutable_default_is_not_shared(self):
+        """Test that list defaults are copied into the instance"""
+        self.compact.amenity_ids.append('wifi')
+        self.assertEqual(Place.amenity_ids, [])
+        other = compact.classes['Place'](**self.place.to_dict())
+        self.assertEqual(other.amenity_ids, [])
+
+    def test_read_default_is_not_listed(self):
+        """Test that reading a mutable default doesn't add it to the
+        attributes, until it's assigned"""
+        self.compact.amenity_ids.append('wifi')
+        self.assertEqual(self.compact.amenity_ids, ['wifi'])
+        self.assertEqual(self.compact.to_dict(), self.place.to_dict())
+        self.assertEqual(str(self.compact), str(self.place))
+        self.assertNotIn('amenity_ids', self.compact.attributes())
+        self.compact.amenity_ids = ['pool']
+        self.assertEqual(self.compact.to_dict()['amenity_ids'], ['pool'])
+
+    def test_new_instance(self):
+        """Test that a compact instance can be created without kwargs"""
+        instance = compact.classes['User']()
+        self.assertIsInstance(instance.id, str)
+        self.assertEqual(instance.to_dict()['__class__'], 'User')
+
+
+class TestCompactTimestamps(unittest.TestCase):
+    """Class for testing the timestamps of compact instances"""
+
+    def setUp(self):
+        """Setup a compact User loaded from a record"""
+        self.record = User().to_dict()
+        self.user = compact.classes['User'](**self.record)
+
+    def slot(self, name):
+        """Return the value held in the slot of a timestamp"""
+        return compact.classes['User'].__dict__[name].slot.__get__(self.user)
+
+    def test_loaded_timestamps_are_kept_as_strings(self):
+        """Test that timestamps aren't parsed until they're read"""
+        self.assertEqual(self.slot('created_at'), self.record['created_at'])
+        self.assertEqual(self.user.to_dict(), self.record)
+        self.assertEqual(self.slot('updated_at'), self.record['updated_at'])
+
+    def test_read_timestamps_are_datetimes(self):
+        """Test that reading a timestamp returns a datetime and keeps it"""
+        created_at = self.user.created_at
+        self.assertIs(type(created_at), datetime)
+        self.assertEqual(created_at.isoformat(), self.record['created_at'])
+        self.assertIs(self.slot('created_at'), created_at)
+        self.assertEqual(self.user.to_dict(), self.record)
+
+    def test_set_timestamp(self):
+        """Test that a timestamp set to a datetime is saved formatted"""
+        now = datetime.now()
+        self.user.updated_at = now
+        self.assertEqual(self.user.updated_at, now)
+        self.assertEqual(self.user.to_dict()['updated_at'], now.isoformat())
+
+    def test_invalid_timestamps(self):
+        """Test that invalid timestamps are rejected on load"""
+        cls = compact.classes['User']
+        with self.assertRaises(TypeError):
+            cls(created_at=datetime.now())
+        with self.assertRaises(ValueError):
+            cls(created_at='12:00:00')
+        user = cls(created_at='2017-13-14T22:31:03')
+        with self.assertRaises(ValueError):
+            user.created_at
+
+    def test_other_iso_formats_are_parsed(self):
+        """Test that timestamps in another ISO format are parsed on load"""
+        user = compact.classes['User'](created_at='2017-06-14')
+        self.assertEqual(user.created_at, datetime(2017, 6, 14))
+        self.assertEqual(user.to_dict()['created_at'], '2017-06-14T00:00:00')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+"""Test module for DBStorage class"""
+
+import unittest
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from unittest.mock import patch
+
+from models.user import User
+from models.place import Place
+from models.review import Review
+from models.engine.db_storage import DBStorage
+
+storage = DBStorage()
+
+
+class TestDBStorage(unittest.TestCase):
+    """Class for testing DBStorage with a temporary database"""
+
+    def setUp(self):
+        """Point the storage to an empty temporary database"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'hbnb.db')
+        self.patches = [
+            patch.object(DBStorage, '_DBStorage__db_path', self.path),
+            patch('models.base_model.storage', storage),
+        ]
+        for p in self.patches:
+            p.start()
+        storage.reload()
+
+    def tearDown(self):
+        """Close the database and restore the storage of the models.
+
+        The objects left in storage are dropped by the next reload.
+        """
+        storage.close()
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def query(self, sql, *args):
+        """Return the rows of a query run on a separate connection"""
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(sql, args).fetchall()
+        finally:
+            connection.close()
+
+    def test_all(self):
+        """Test that all returns the objects by key"""
+        user = User()
+        self.assertIs(storage.all()[f'User.{user.id}'], user)
+        self.assertEqual(storage.all(User), {f'User.{user.id}': user})
+
+    def test_save_and_reload(self):
+        """Test that reload loads the saved objects"""
+        place = Place()
+        place.name = 'Loft'
+        place.number_rooms = 3
+        place.latitude = 1.5
+        place.save()
+        before = {key: obj.to_dict() for key, obj in storage.all().items()}
+        storage.reload()
+        self.assertEqual(
+            {key: obj.to_dict() for key, obj in storage.all().items()},
+            before)
+        self.assertIsNot(storage.all()[f'Place.{place.id}'], place)
+
+    def test_one_table_per_class(self):
+        """Test that every class is saved in its own table"""
+        user = User()
+        place = Place()
+        storage.save()
+        self.assertEqual(self.query('SELECT id FROM "User"'), [(user.id,)])
+        self.assertEqual(self.query('SELECT id FROM "Place"'), [(place.id,)])
+
+    def test_indexed_attributes_have_sql_indexes(self):
+        """Test that the attributes in indexes get a SQL index"""
+        Review().save()
+        indexed = {
+            row[1] for row in
+            self.query("SELECT * FROM sqlite_master WHERE type = 'index' "
+                       "AND tbl_name = 'Review' AND sql IS NOT NULL")
+            }
+        self.assertEqual(indexed, {'Review_place_id', 'Review_user_id'})
+
+    def test_wal_mode(self):
+        """Test that the database is in WAL mode"""
+        storage.save()
+        self.assertEqual(self.query('PRAGMA journal_mode'), [('wal',)])
+
+    def test_save_upserts_changed_rows(self):
+        """Test that saving a changed object updates its row"""
+        user = User()
+        user.first_name = 'Betty'
+        user.save()
+        user.first_name = 'Holberton'
+        user.save()
+        self.assertEqual(
+            self.query('SELECT id, first_name FROM "User"'),
+            [(user.id, 'Holberton')])
+
+    def test_only_changed_rows_are_written(self):
+        """Test that a save only writes the objects changed since the last
+        save"""
+        users = [User() for i in range(5)]
+        storage.save()
+        connection = storage._DBStorage__connect()
+        changes = connection.total_changes
+        users[0].first_name = 'Betty'
+        storage.save()
+        self.assertEqual(connection.total_changes - changes, 1)
+
+    def test_delete(self):
+        """Test that saving a deleted object deletes its row"""
+        user = User()
+        storage.save()
+        storage.delete(user)
+        storage.save()
+        self.assertEqual(self.query('SELECT id FROM "User"'), [])
+        storage.reload()
+        self.assertNotIn(f'User.{user.id}', storage.all())
+
+    def test_delete_of_class_never_saved(self):
+        """Test that deleting an object whose table doesn't exist works"""
+        user = User()
+        storage.delete(user)
+        storage.save()
+        self.assertEqual(storage.all(), {})
+
+    def test_other_attributes_are_kept(self):
+        """Test that values that don't fit a column are saved as JSON"""
+        place = Place()
+        place.amenity_ids = ['a', 'b']
+        place.description = None
+        place.pets = True
+        place.code = 12
+        place.save()
+        row = self.query('SELECT amenity_ids, _extra FROM "Place"')[0]
+        self.assertIsNone(row[0])
+        self.assertEqual(
+            json.loads(row[1]),
+            {'amenity_ids': ['a', 'b'], 'description': None, 'pets': True,
+             'code': 12})
+        storage.reload()
+        loaded = storage.all()[f'Place.{place.id}']
+        self.assertEqual(loaded.to_dict(), place.to_dict())
+
+    def test_find(self):
+        """Test that find uses the attribute indexes after a reload"""
+        review = Review()
+        review.place_id = 'p1'
+        Review().save()
+        storage.reload()
+        found = storage.find(Review, place_id='p1')
+        self.assertEqual([obj.id for obj in found], [review.id])
+
+    def test_batch_rollback(self):
+        """Test that a failed batch writes nothing"""
+        with self.assertRaises(RuntimeError):
+            with storage.batch():
+                User().save()
+                raise RuntimeError
+        storage.save()
+        self.assertEqual(self.query(
+            "SELECT name FROM sqlite_master WHERE name = 'User'"), [])
+
+    def test_new_columns_are_added(self):
+        """Test that columns of attributes added to a model are created"""
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute('CREATE TABLE "User" ("id" TEXT PRIMARY KEY, '
+                               '"_extra")')
+        connection.close()
+        storage.close()
+        storage.reload()
+        user = User()
+        user.email = 'a@b.c'
+        user.save()
+        self.assertEqual(self.query('SELECT email FROM "User"'), [('a@b.c',)])
+
+    def test_refresh_merges_other_connections(self):
+        """Test that refresh picks up rows committed by another process"""
+        user = User()
+        storage.save()
+        self.assertFalse(storage.refresh())
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute(
+                'UPDATE "User" SET first_name = ? WHERE id = ?',
+                ('Other', user.id))
+            connection.execute(
+                'INSERT INTO "User" (id, created_at, updated_at) '
+                'VALUES (?, ?, ?)', ('other-id', user.to_dict()['created_at'],
+                                     user.to_dict()['updated_at']))
+        connection.close()
+        self.assertTrue(storage.refresh())
+        self.assertEqual(user.first_name, 'Other')
+        self.assertIn('User.other-id', storage.all())
+
+    def test_write_behind(self):
+        """Test that the background thread can write to the database"""
+        with patch.object(DBStorage, '_flush_delay', 0.01):
+            user = User()
+            user.save()
+            deadline = time.monotonic() + 5
+            while DBStorage._flush_pending is not None:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        storage.flush()
+        self.assertEqual(self.query('SELECT id FROM "User"'), [(user.id,)])
+
+    def test_methods_with_arguments(self):
+        """Test that save and reload take no argument"""
+        with self.assertRaises(TypeError):
+            storage.save(1)
+        with self.assertRaises(TypeError):
+            storage.reload(1)
+        with self.assertRaises(TypeError):
+            storage.all(12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,13 +4,36 @@
 import unittest
 import uuid
 import json
+import multiprocessing
 import os
+import tempfile
+import time
+import zlib
 from datetime import datetime
+from unittest.mock import patch
 
 from models.base_model import BaseModel
+from models.user import User
+from models.review import Review
+from models.state import State
+from models.city import City
+from models.place import Place
+from models.engine import file_storage, serializers
 from models.engine.file_storage import FileStorage
 
 storage = FileStorage()
+# Models use this storage even when HBNB_TYPE_STORAGE selects another engine.
+engine = patch('models.base_model.storage', storage)
+
+
+def setUpModule():
+    """Make the models use the FileStorage under test"""
+    engine.start()
+
+
+def tearDownModule():
+    """Restore the storage used by the models"""
+    engine.stop()
 
 
 class TestFileStorageAllMethod(unittest.TestCase):
@@ -31,6 +54,44 @@ class TestFileStorageAllMethod(unittest.TestCase):
         with self.assertRaises(TypeError):
             storage.all(12)
 
+    def test_all_with_class(self):
+        """Test that all with a class only returns objects of that class"""
+        instance = User()
+        objects = storage.all(User)
+        self.assertIs(objects[f'User.{instance.id}'], instance)
+        for obj in objects.values():
+            self.assertIsInstance(obj, User)
+
+    def test_all_with_class_name(self):
+        """Test that a class name can be used instead of the class"""
+        self.assertEqual(storage.all('User'), storage.all(User))
+
+    def test_all_with_unknown_class_name(self):
+        """Test that all returns an empty dict for an unknown class"""
+        self.assertEqual(storage.all('ClassNotFound'), {})
+
+
+class TestFileStorageCountMethod(unittest.TestCase):
+    """Class for testing the count method"""
+
+    def test_count_without_class(self):
+        """Test that count returns the number of all objects"""
+        self.assertEqual(storage.count(), len(storage.all()))
+
+    def test_count_with_class(self):
+        """Test that count follows creation and deletion of objects"""
+        before = storage.count(User)
+        instance = User()
+        self.assertEqual(storage.count(User), before + 1)
+        self.assertEqual(storage.count('User'), before + 1)
+        storage.delete(instance)
+        self.assertEqual(storage.count(User), before)
+
+    def test_count_with_invalid_argument(self):
+        """Test that count raises TypeError for a non class argument"""
+        with self.assertRaises(TypeError):
+            storage.count(12)
+
 
 class TestFileStorageNewMethod(unittest.TestCase):
     """Class for testing the new method"""
@@ -167,5 +228,1041 @@ class TestFileStorageReloadMethod(unittest.TestCase):
             storage.reload(1)
 
 
+class TemporaryStoreTestCase(unittest.TestCase):
+    """Base class for tests that need an empty store in a temporary file"""
+
+    mode = 'snapshot'
+    lazy = False
+    format = 'json'
+    backups = 0
+    shards = 1
+
+    def setUp(self):
+        """Point the storage to an empty temporary store"""
+        self.saved_objects = storage.all().copy()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'file.json')
+        self.journal = f'{self.path}.journal'
+        self.patches = [
+            patch.object(FileStorage, '_FileStorage__file_path', self.path),
+            patch.object(FileStorage, '_FileStorage__mode', self.mode),
+            patch.object(FileStorage, '_FileStorage__compact_every', 1000),
+            patch.object(FileStorage, '_FileStorage__lazy', self.lazy),
+            patch.object(FileStorage, '_FileStorage__format', self.format),
+            patch.object(FileStorage, '_FileStorage__backups', self.backups),
+            patch.object(FileStorage, '_FileStorage__shards', self.shards),
+        ]
+        for p in self.patches:
+            p.start()
+        with open(self.path, 'w') as f:
+            f.write('{}')
+        storage.reload()
+
+    def tearDown(self):
+        """Restore the storage used by the other tests"""
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+        for obj in list(storage.all().values()):
+            storage.delete(obj)
+        for obj in self.saved_objects.values():
+            storage.new(obj)
+
+
+class TestFileStorageJournalMode(TemporaryStoreTestCase):
+    """Class for testing the journal storage mode"""
+
+    mode = 'journal'
+
+    def read_journal(self):
+        """Return the journal entries as a list of dictionaries"""
+        with open(self.journal, 'r') as f:
+            return [json.loads(line) for line in f]
+
+    def test_save_appends_only_changed_objects(self):
+        """Test that save appends one line per changed object"""
+        first = BaseModel()
+        storage.save()
+        BaseModel()
+        storage.save()
+        entries = self.read_journal()
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['key'], f'BaseModel.{first.id}')
+        self.assertEqual(entries[0]['value'], first.to_dict())
+
+    def test_save_does_not_rewrite_snapshot(self):
+        """Test that the JSON file is left untouched in journal mode"""
+        BaseModel()
+        storage.save()
+        with open(self.path, 'r') as f:
+            self.assertEqual(json.load(f), {})
+
+    def test_unknown_mode_saves_snapshot(self):
+        """Test that a mode that isn't known is saved like snapshot"""
+        instance = BaseModel()
+        with patch.object(FileStorage, '_FileStorage__mode', 'Journal'):
+            storage.save()
+        with open(self.path, 'r') as f:
+            self.assertIn(f'BaseModel.{instance.id}', json.load(f))
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_delete_appends_null_entry(self):
+        """Test that deleting an object journals a null value"""
+        instance = BaseModel()
+        storage.save()
+        storage.delete(instance)
+        storage.save()
+        entry = self.read_journal()[-1]
+        self.assertEqual(entry['key'], f'BaseModel.{instance.id}')
+        self.assertIsNone(entry['value'])
+
+    def test_reload_replays_journal(self):
+        """Test that reload applies the journal over the JSON file"""
+        kept, deleted = BaseModel(), BaseModel()
+        storage.save()
+        kept.name = 'kept'
+        kept.save()
+        storage.delete(deleted)
+        storage.save()
+        storage.reload()
+        self.assertEqual(storage.all()[f'BaseModel.{kept.id}'].name, 'kept')
+        self.assertNotIn(f'BaseModel.{deleted.id}', storage.all())
+
+    def test_reload_ignores_torn_last_line(self):
+        """Test that a partially written last entry is skipped"""
+        instance = BaseModel()
+        storage.save()
+        with open(self.journal, 'a') as f:
+            f.write('{"key": "BaseModel.12')
+        storage.reload()
+        self.assertEqual(list(storage.all()), [f'BaseModel.{instance.id}'])
+
+    def test_save_after_torn_line(self):
+        """Test that the entries appended after a torn last line are
+        loaded"""
+        first = BaseModel()
+        storage.save()
+        with open(self.journal, 'a') as f:
+            f.write('{"key": "BaseModel.12')
+        second = BaseModel()
+        storage.save()
+        third = BaseModel()
+        storage.save()
+        storage.reload()
+        self.assertCountEqual(
+            list(storage.all()),
+            [f'BaseModel.{obj.id}' for obj in (first, second, third)])
+        self.assertEqual(len(self.read_journal()), 3)
+
+    def test_journal_is_compacted(self):
+        """Test that a full journal is folded into the JSON file"""
+        with patch.object(FileStorage, '_FileStorage__compact_every', 3):
+            instances = [BaseModel() for i in range(3)]
+            storage.save()
+        self.assertFalse(os.path.exists(self.journal))
+        with open(self.path, 'r') as f:
+            snapshot = json.load(f)
+        self.assertEqual(len(snapshot), len(instances))
+
+
+class TestFileStorageDirtyTracking(TemporaryStoreTestCase):
+    """Class for testing that saves only encode changed objects"""
+
+    def test_snapshot_matches_json_dump(self):
+        """Test that the spliced snapshot is the same as json.dump output"""
+        for i in range(3):
+            BaseModel().name = f'name {i}'
+        storage.save()
+        expected = json.dumps({
+            key: obj.to_dict() for key, obj in storage.all().items()
+            }, indent=4)
+        with open(self.path, 'r') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_only_changed_objects_are_encoded(self):
+        """Test that to_dict is only called for changed objects"""
+        for i in range(3):
+            BaseModel()
+        storage.save()
+        BaseModel()
+        with patch.object(BaseModel, 'to_dict',
+                          autospec=True, side_effect=BaseModel.to_dict) as m:
+            storage.save()
+        self.assertEqual(m.call_count, 1)
+
+    def test_setattr_marks_object_changed(self):
+        """Test that setting an attribute is written on the next save"""
+        instance = BaseModel()
+        storage.save()
+        instance.name = 'changed'
+        storage.save()
+        with open(self.path, 'r') as f:
+            saved = json.load(f)[f'BaseModel.{instance.id}']
+        self.assertEqual(saved['name'], 'changed')
+
+    def test_touch_ignores_objects_not_in_storage(self):
+        """Test that a copy of a stored object doesn't overwrite it"""
+        instance = BaseModel()
+        storage.save()
+        copy = BaseModel(**instance.to_dict())
+        copy.name = 'copy'
+        storage.save()
+        with open(self.path, 'r') as f:
+            saved = json.load(f)[f'BaseModel.{instance.id}']
+        self.assertNotIn('name', saved)
+
+    def test_deleted_object_is_not_written(self):
+        """Test that a deleted object is removed on the next save"""
+        instance = BaseModel()
+        storage.save()
+        storage.delete(instance)
+        storage.save()
+        with open(self.path, 'r') as f:
+            self.assertEqual(json.load(f), {})
+
+
+class TestFileStorageFindMethod(TemporaryStoreTestCase):
+    """Class for testing the find method and attribute indexes"""
+
+    def setUp(self):
+        """Create reviews of two places"""
+        super().setUp()
+        self.review = Review()
+        self.review.place_id = 'place-1'
+        self.review.user_id = 'user-1'
+        self.other = Review()
+        self.other.place_id = 'place-2'
+        self.other.user_id = 'user-1'
+
+    def test_find_by_indexed_attribute(self):
+        """Test finding objects by an indexed attribute"""
+        self.assertEqual(storage.find(Review, place_id='place-1'),
+                         [self.review])
+        self.assertEqual(storage.find('Review', user_id='user-1'),
+                         [self.review, self.other])
+
+    def test_find_by_several_attributes(self):
+        """Test that every given attribute has to match"""
+        self.assertEqual(
+            storage.find(Review, place_id='place-2', user_id='user-1'),
+            [self.other])
+        self.assertEqual(
+            storage.find(Review, place_id='place-2', user_id='user-2'), [])
+
+    def test_find_by_attribute_that_is_not_indexed(self):
+        """Test finding objects by an attribute without an index"""
+        self.review.text = 'Nice'
+        self.assertEqual(storage.find(Review, text='Nice'), [self.review])
+
+    def test_find_after_update(self):
+        """Test that the index follows attribute updates"""
+        self.review.place_id = 'place-2'
+        self.assertEqual(storage.find(Review, place_id='place-1'), [])
+        self.assertCountEqual(storage.find(Review, place_id='place-2'),
+                              [self.review, self.other])
+
+    def test_find_after_delete(self):
+        """Test that deleted objects are not found"""
+        storage.delete(self.review)
+        self.assertEqual(storage.find(Review, place_id='place-1'), [])
+
+    def test_find_after_reload(self):
+        """Test that indexes are rebuilt on reload"""
+        storage.save()
+        storage.reload()
+        found = storage.find(Review, place_id='place-1')
+        self.assertEqual([obj.id for obj in found], [self.review.id])
+
+    def test_find_with_unhashable_values(self):
+        """Test that objects holding unhashable values in an indexed
+        attribute are found by going through the class, and that the
+        other changes are still indexed"""
+        self.review.place_id = ['x']
+        self.other.place_id = 'place-3'
+        self.assertEqual(storage.find(Review, place_id=['x']), [self.review])
+        self.assertEqual(storage.find(Review, place_id='place-3'),
+                         [self.other])
+        self.assertEqual(storage.find(Review, place_id='place-1'), [])
+        self.review.place_id = 'place-3'
+        self.assertCountEqual(storage.find(Review, place_id='place-3'),
+                              [self.review, self.other])
+
+    def test_find_with_invalid_class(self):
+        """Test that find raises TypeError for a non class argument"""
+        with self.assertRaises(TypeError):
+            storage.find(12, place_id='place-1')
+
+
+class TestFileStorageCascade(TemporaryStoreTestCase):
+    """Class for testing deletes along model references"""
+
+    def setUp(self):
+        """Create a state with a city, a place and reviews"""
+        super().setUp()
+        self.user = User()
+        self.state = State()
+        self.city = City()
+        self.city.state_id = self.state.id
+        self.place = Place()
+        self.place.city_id = self.city.id
+        self.reviews = Review.create_many([
+            {'place_id': self.place.id, 'user_id': 'user-1'},
+            {'place_id': self.place.id, 'user_id': self.user.id},
+            {'place_id': 'place-2', 'user_id': 'user-1'},
+            ])
+        storage.save()
+
+    def test_delete_deletes_dependents(self):
+        """Test that deleting a state deletes its cities, their places and
+        the places' reviews"""
+        storage.delete(self.state)
+        self.assertEqual(
+            set(storage.all()),
+            {f'User.{self.user.id}', f'Review.{self.reviews[2].id}'})
+
+    def test_delete_writes_once(self):
+        """Test that the dependents are written by the same save"""
+        storage.delete(self.state)
+        with patch.object(FileStorage, '_FileStorage__write_snapshot',
+                          autospec=True,
+                          side_effect=FileStorage._FileStorage__write_snapshot
+                          ) as write:
+            storage.save()
+        self.assertEqual(write.call_count, 1)
+        storage.reload()
+        self.assertEqual(storage.count(), 2)
+
+    def test_delete_follows_every_reference(self):
+        """Test that objects referencing another class are deleted too"""
+        storage.delete(self.user)
+        self.assertNotIn(f'Review.{self.reviews[1].id}', storage.all())
+        self.assertEqual(storage.count(Review), 2)
+        self.assertEqual(storage.count(Place), 1)
+
+    def test_rollback_restores_dependents(self):
+        """Test that a failing batch restores the deleted dependents"""
+        with self.assertRaises(ValueError):
+            with storage.batch():
+                storage.delete(self.state)
+                raise ValueError
+        self.assertEqual(storage.count(), 7)
+        self.assertCountEqual(storage.find(Review, place_id=self.place.id),
+                              self.reviews[:2])
+
+
+class TestFileStorageLazyMode(TemporaryStoreTestCase):
+    """Class for testing reload in lazy mode"""
+
+    lazy = True
+
+    def setUp(self):
+        """Save and reload a user and a review"""
+        super().setUp()
+        self.user = User()
+        self.review = Review()
+        self.review.place_id = 'place-1'
+        storage.save()
+        storage.reload()
+        self.user_key = f'User.{self.user.id}'
+        self.review_key = f'Review.{self.review.id}'
+
+    def test_reload_keeps_records(self):
+        """Test that no object is built by reload"""
+        self.assertIsNotNone(storage.all().record(self.user_key))
+        self.assertIsNotNone(storage.all().record(self.review_key))
+
+    def test_object_built_on_access(self):
+        """Test that accessing a key builds the object"""
+        obj = storage.all()[self.user_key]
+        self.assertIsInstance(obj, User)
+        self.assertEqual(obj.to_dict(), self.user.to_dict())
+
+    def test_all_with_class_builds_only_that_class(self):
+        """Test that all(cls) doesn't build objects of other classes"""
+        storage.all(User)
+        self.assertIsNone(storage.all().record(self.user_key))
+        self.assertIsNotNone(storage.all().record(self.review_key))
+
+    def test_count_and_find_use_records(self):
+        """Test that count and find work before objects are built"""
+        self.assertEqual(storage.count(Review), 1)
+        self.assertEqual(len(storage.find(Review, place_id='place-1')), 1)
+        self.assertIsNone(storage.all().record(self.review_key))
+        self.assertIsNotNone(storage.all().record(self.user_key))
+
+    def test_save_writes_records_without_building(self):
+        """Test that saving writes records that were never built"""
+        storage.all()[self.review_key].text = 'Nice'
+        storage.save()
+        self.assertIsNotNone(storage.all().record(self.user_key))
+        with open(self.path, 'r') as f:
+            saved = json.load(f)
+        self.assertEqual(saved[self.user_key], self.user.to_dict())
+        self.assertEqual(saved[self.review_key]['text'], 'Nice')
+
+
+class TestFileStorageFormats(TemporaryStoreTestCase):
+    """Class for testing saving in the other file formats"""
+
+    def save_in(self, name):
+        """Save a review in the given format and return the file content"""
+        self.review = Review()
+        self.review.text = 'Nice'
+        with patch.object(FileStorage, '_FileStorage__format', name):
+            storage.save()
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_compact_format(self):
+        """Test that the compact format is JSON without spaces"""
+        data = self.save_in('compact')
+        self.assertNotIn(b' ', data.replace(b'Nice', b''))
+        self.assertEqual(json.loads(data)[f'Review.{self.review.id}'],
+                         self.review.to_dict())
+
+    def test_binary_format(self):
+        """Test that the binary format starts with its magic header"""
+        data = self.save_in('binary')
+        self.assertTrue(data.startswith(b'HBNB'))
+
+    def test_reload_detects_format(self):
+        """Test that reload reads a file saved in another format"""
+        for name in ('binary', 'compact', 'json'):
+            self.save_in(name)
+            storage.reload()
+            obj = storage.all()[f'Review.{self.review.id}']
+            self.assertEqual(obj.to_dict(), self.review.to_dict())
+
+    def test_changing_format_drops_cached_fragments(self):
+        """Test that a save in a new format encodes every object again"""
+        self.save_in('binary')
+        data = self.save_in('json')
+        self.assertEqual(len(json.loads(data)), 2)
+
+
+class TestFileStorageAtomicSave(TemporaryStoreTestCase):
+    """Class for testing atomic saves and backups"""
+
+    backups = 2
+
+    def saved_ids(self, path):
+        """Return the ids of the objects in the file at path"""
+        with open(path, 'r') as f:
+            return [value['id'] for value in json.load(f).values()]
+
+    def test_failed_save_keeps_previous_file(self):
+        """Test that an error while writing leaves the file untouched"""
+        instance = BaseModel()
+        storage.save()
+        BaseModel()
+        with patch('os.fsync', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                storage.save()
+        self.assertEqual(self.saved_ids(self.path), [instance.id])
+        self.assertEqual(sorted(os.listdir(self.tmp.name)),
+                         ['file.json', 'file.json.1', 'file.json.lock'])
+
+    def test_backups_are_rotated(self):
+        """Test that the previous files are kept as backups"""
+        first = BaseModel()
+        storage.save()
+        second = BaseModel()
+        storage.save()
+        BaseModel()
+        storage.save()
+        self.assertEqual(self.saved_ids(f'{self.path}.1'),
+                         [first.id, second.id])
+        self.assertEqual(self.saved_ids(f'{self.path}.2'), [first.id])
+        self.assertFalse(os.path.exists(f'{self.path}.3'))
+
+    def test_backups_are_linked(self):
+        """Test that backups are hard links, not copies, whatever their
+        number"""
+        for backups in (1, 2):
+            with patch.object(FileStorage, '_FileStorage__backups', backups):
+                BaseModel()
+                storage.save()
+                with patch('shutil.copy2') as copy:
+                    for i in range(backups + 1):
+                        before = os.stat(self.path)
+                        BaseModel()
+                        storage.save()
+                        self.assertEqual(os.stat(f'{self.path}.1').st_ino,
+                                         before.st_ino)
+                copy.assert_not_called()
+
+    def test_reload_falls_back_to_backup(self):
+        """Test that reload loads the newest backup of a torn file"""
+        instance = BaseModel()
+        storage.save()
+        BaseModel()
+        storage.save()
+        with open(self.path, 'w') as f:
+            f.write('{"BaseModel.1": {"id": ')
+        with self.assertWarns(UserWarning):
+            storage.reload()
+        self.assertEqual(list(storage.all()), [f'BaseModel.{instance.id}'])
+
+    def test_reload_without_valid_backup(self):
+        """Test that reload raises an error if nothing can be decoded"""
+        with open(self.path, 'w') as f:
+            f.write('{"BaseModel.1": {"id": ')
+        with self.assertRaises(ValueError):
+            storage.reload()
+
+
+class TestFileStorageBatch(TemporaryStoreTestCase):
+    """Class for testing batches of changes"""
+
+    def setUp(self):
+        """Save a review before the batch"""
+        super().setUp()
+        self.review = Review()
+        self.review.place_id = 'place-1'
+        self.review.save()
+
+    def saved(self):
+        """Return the content of the file"""
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def test_saves_are_deferred(self):
+        """Test that saves inside a batch happen once at its end"""
+        with patch.object(FileStorage, '_FileStorage__write_snapshot',
+                          autospec=True,
+                          side_effect=FileStorage._FileStorage__write_snapshot
+                          ) as write:
+            with storage.batch():
+                for i in range(3):
+                    BaseModel().save()
+                self.assertEqual(len(self.saved()), 1)
+            self.assertEqual(write.call_count, 1)
+        self.assertEqual(len(self.saved()), 4)
+
+    def test_batch_without_save(self):
+        """Test that a batch without saves doesn't write the file"""
+        with storage.batch():
+            BaseModel()
+        self.assertEqual(len(self.saved()), 1)
+
+    def test_rollback(self):
+        """Test that a failing batch restores the objects and doesn't
+        save"""
+        before = self.review.to_dict()
+        with self.assertRaises(ValueError):
+            with storage.batch():
+                instance = BaseModel()
+                self.review.place_id = 'place-2'
+                self.review.text = 'Changed'
+                self.review.save()
+                raise ValueError
+        self.assertEqual(self.review.to_dict(), before)
+        self.assertNotIn(f'BaseModel.{instance.id}', storage.all())
+        self.assertEqual(storage.find(Review, place_id='place-1'),
+                         [self.review])
+        self.assertEqual(storage.find(Review, place_id='place-2'), [])
+        self.assertEqual(len(self.saved()), 1)
+
+    def test_rollback_of_delete(self):
+        """Test that objects deleted in a failing batch are restored"""
+        with self.assertRaises(ValueError):
+            with storage.batch():
+                storage.delete(self.review)
+                storage.save()
+                raise ValueError
+        self.assertIs(storage.all()[f'Review.{self.review.id}'],
+                      self.review)
+        self.assertEqual(storage.count(Review), 1)
+        self.assertEqual(storage.find(Review, place_id='place-1'),
+                         [self.review])
+
+    def test_nested_batch_rollback(self):
+        """Test that a failing nested batch only undoes its own changes"""
+        with storage.batch():
+            self.review.text = 'Outer'
+            with self.assertRaises(ValueError):
+                with storage.batch():
+                    self.review.text = 'Inner'
+                    raise ValueError
+            self.assertEqual(self.review.text, 'Outer')
+            storage.save()
+        self.assertEqual(
+            self.saved()[f'Review.{self.review.id}']['text'], 'Outer')
+
+
+class TestFileStorageShardedMode(TemporaryStoreTestCase):
+    """Class for testing the sharded storage mode"""
+
+    mode = 'sharded'
+    backups = 1
+
+    def setUp(self):
+        """Set the path of the directory of shards"""
+        super().setUp()
+        self.directory = f'{self.path}.shards'
+
+    def shard_names(self):
+        """Return the names of the shard files"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.count('.') == 1)
+
+    def read_shard(self, name):
+        """Return the records of a shard"""
+        with open(os.path.join(self.directory, name), 'r') as f:
+            return json.load(f)
+
+    def test_one_shard_per_class(self):
+        """Test that the objects of every class are saved in their shard"""
+        user = User()
+        review = Review()
+        storage.save()
+        self.assertEqual(self.shard_names(), ['Review.0', 'User.0'])
+        self.assertEqual(self.read_shard('User.0'),
+                         {f'User.{user.id}': user.to_dict()})
+        self.assertEqual(self.read_shard('Review.0'),
+                         {f'Review.{review.id}': review.to_dict()})
+
+    def test_only_changed_shards_are_written(self):
+        """Test that a save leaves the shards of unchanged classes alone"""
+        User()
+        review = Review()
+        storage.save()
+        user_shard = os.stat(os.path.join(self.directory, 'User.0'))
+        review.text = 'Great'
+        storage.save()
+        self.assertEqual(
+            os.stat(os.path.join(self.directory, 'User.0')).st_ino,
+            user_shard.st_ino)
+        self.assertEqual(self.read_shard('Review.0')[
+            f'Review.{review.id}']['text'], 'Great')
+
+    def test_empty_shard_is_removed(self):
+        """Test that the shard of a class without objects is removed"""
+        user = User()
+        Review()
+        storage.save()
+        storage.delete(user)
+        storage.save()
+        self.assertEqual(self.shard_names(), ['Review.0'])
+
+    def test_reload(self):
+        """Test that reload loads the objects of every shard"""
+        objects = [User() for i in range(5)] + [Review() for i in range(5)]
+        storage.save()
+        storage.reload()
+        self.assertEqual(
+            {key: obj.to_dict() for key, obj in storage.all().items()},
+            {f'{type(obj).__name__}.{obj.id}': obj.to_dict()
+             for obj in objects})
+
+    def test_reload_ignores_backups(self):
+        """Test that the backups kept next to the shards are not loaded"""
+        user = User()
+        storage.save()
+        storage.delete(user)
+        other = User()
+        storage.save()
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, 'User.0.1')))
+        storage.reload()
+        self.assertEqual(list(storage.all()), [f'User.{other.id}'])
+
+    def test_single_file_is_imported(self):
+        """Test that the single file is loaded until the store is sharded"""
+        user = User()
+        with open(self.path, 'w') as f:
+            json.dump({f'User.{user.id}': user.to_dict()}, f)
+        storage.reload()
+        self.assertIn(f'User.{user.id}', storage.all())
+        Review()
+        storage.save()
+        self.assertEqual(self.shard_names(), ['Review.0', 'User.0'])
+
+    def test_buckets(self):
+        """Test that objects are spread over HBNB_FILE_SHARDS shards per
+        class"""
+        with patch.object(FileStorage, '_FileStorage__shards', 4):
+            users = [User() for i in range(40)]
+            storage.save()
+            self.assertEqual(self.shard_names(),
+                             ['User.0', 'User.1', 'User.2', 'User.3'])
+            saved = {}
+            for name in self.shard_names():
+                saved.update(self.read_shard(name))
+            self.assertEqual(len(saved), 40)
+
+            before = {name: os.stat(os.path.join(self.directory, name))
+                      for name in self.shard_names()}
+            users[0].first_name = 'Betty'
+            storage.save()
+            rewritten = [
+                name for name in self.shard_names()
+                if os.stat(os.path.join(self.directory, name)).st_ino !=
+                before[name].st_ino
+                ]
+            self.assertEqual(len(rewritten), 1)
+            self.assertIn(f'User.{users[0].id}', self.read_shard(rewritten[0]))
+
+            storage.reload()
+            self.assertEqual(storage.count(User), 40)
+
+    def test_changed_bucket_count(self):
+        """Test that every shard is written again when HBNB_FILE_SHARDS
+        changes"""
+        users = [User() for i in range(8)]
+        storage.save()
+        with patch.object(FileStorage, '_FileStorage__shards', 4):
+            storage.delete(users[0])
+            storage.save()
+            self.assertEqual(
+                self.shard_names(),
+                sorted({f'User.{zlib.crc32(user.id.encode()) % 4}'
+                        for user in users[1:]}))
+            storage.reload()
+            self.assertEqual(storage.count(User), 7)
+            storage.all()[f'User.{users[1].id}'].first_name = 'Betty'
+            before = {name: os.stat(os.path.join(self.directory, name))
+                      for name in self.shard_names()}
+            storage.save()
+            self.assertEqual(
+                sum(os.stat(os.path.join(self.directory, name)).st_ino !=
+                    before[name].st_ino for name in self.shard_names()), 1)
+
+
+class TestFileStorageMappedMode(TemporaryStoreTestCase):
+    """Class for testing the read-only mapped mode"""
+
+    mode = 'mapped'
+
+    def setUp(self):
+        """Save users and reviews in a binary file and map it"""
+        with self.assertWarns(UserWarning):
+            super().setUp()
+        self.users = [User() for i in range(3)]
+        self.reviews = [Review() for i in range(3)]
+        self.reviews[0].place_id = 'place-1'
+        self.write_binary()
+        storage.reload()
+
+    def tearDown(self):
+        """Unmap the file before it's removed"""
+        for obj in list(storage.all().values()):
+            storage.delete(obj)
+        if FileStorage._FileStorage__map is not None:
+            FileStorage._FileStorage__map.close()
+            FileStorage._FileStorage__map = None
+        super().tearDown()
+
+    def write_binary(self):
+        """Save the objects in storage the way a writer process would"""
+        with patch.object(FileStorage, '_FileStorage__mode', 'snapshot'), \
+                patch.object(FileStorage, '_FileStorage__format', 'binary'):
+            storage.save()
+
+    def test_records_are_decoded_on_demand(self):
+        """Test that reload only indexes the records"""
+        values = list(dict.values(storage.all()))
+        self.assertEqual(len(values), 6)
+        self.assertTrue(all(type(value) is tuple for value in values))
+        self.assertEqual(storage.count(User), 3)
+
+        key = f'User.{self.users[0].id}'
+        user = storage.all()[key]
+        self.assertIsInstance(user, User)
+        self.assertEqual(user.to_dict(), self.users[0].to_dict())
+        self.assertEqual(
+            sum(type(value) is tuple
+                for value in dict.values(storage.all())), 5)
+
+    def test_find(self):
+        """Test that indexed attributes are indexed on the first find"""
+        found = storage.find(Review, place_id='place-1')
+        self.assertEqual([review.id for review in found],
+                         [self.reviews[0].id])
+        self.assertEqual(
+            sum(type(value) is tuple
+                for value in dict.values(storage.all())), 3)
+
+    def test_queries_decode_their_class_only(self):
+        """Test that queries only index the records of their class, and
+        only when they have conditions or an order"""
+        places = [Place() for i in range(3)]
+        self.write_binary()
+        storage.reload()
+
+        def undecoded():
+            return sorted(key.split('.')[0] for key, value in
+                          dict.items(storage.all()) if type(value) is tuple)
+
+        list(storage.query(User).limit(1))
+        self.assertEqual(undecoded(), ['Place'] * 3 + ['Review'] * 3 +
+                         ['User'] * 2)
+        list(storage.query(Review).limit(1))
+        self.assertEqual(undecoded().count('Review'), 2)
+        found = list(storage.query(Place).order_by('price_by_night'))
+        self.assertEqual(len(found), len(places))
+        self.assertEqual(undecoded(), ['Review'] * 2 + ['User'] * 2)
+        storage.find(Review, place_id='place-1')
+        self.assertEqual(undecoded(), ['User'] * 2)
+
+    def test_save_is_refused(self):
+        """Test that nothing can be saved in mapped mode"""
+        self.assertTrue(storage.read_only)
+        with self.assertRaises(PermissionError):
+            storage.save()
+
+    def test_refresh_maps_new_file(self):
+        """Test that refresh maps the file again when it's replaced"""
+        self.assertFalse(storage.refresh())
+        serializer = serializers.formats['binary']
+        now = datetime.now().isoformat()
+        user = User(id=str(uuid.uuid4()), created_at=now, updated_at=now)
+        with open(f'{self.path}.other', 'wb') as f:
+            serializer.write(f, [
+                serializer.fragment(f'User.{user.id}', user.to_dict())])
+        os.replace(f'{self.path}.other', self.path)
+        self.assertTrue(storage.refresh())
+        self.assertEqual(list(storage.all()), [f'User.{user.id}'])
+
+    def test_json_file_is_loaded_lazily(self):
+        """Test that a file in another format is loaded without a map"""
+        with open(self.path, 'w') as f:
+            json.dump({f'User.{self.users[0].id}': self.users[0].to_dict()},
+                      f)
+        with self.assertWarns(UserWarning):
+            storage.reload()
+        self.assertEqual(list(storage.all()), [f'User.{self.users[0].id}'])
+        self.assertIs(
+            type(dict.get(storage.all(), f'User.{self.users[0].id}')), dict)
+
+
+class TestFileStorageWriteBehind(TemporaryStoreTestCase):
+    """Class for testing saves deferred to the background thread"""
+
+    def setUp(self):
+        """Enable write-behind with a long delay"""
+        super().setUp()
+        self.delay = patch.object(FileStorage, '_flush_delay', 60)
+        self.delay.start()
+
+    def tearDown(self):
+        """Write what's left in the temporary store"""
+        storage.flush()
+        self.delay.stop()
+        super().tearDown()
+
+    def saved(self):
+        """Return the keys of the records in the file"""
+        with open(self.path, 'r') as f:
+            return set(json.load(f))
+
+    def wait_until_saved(self, key):
+        """Wait for the background thread to write the object of key"""
+        deadline = time.monotonic() + 5
+        while key not in self.saved():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_save_is_deferred(self):
+        """Test that save doesn't write and flush does"""
+        instance = BaseModel()
+        instance.save()
+        self.assertEqual(self.saved(), set())
+        storage.flush()
+        self.assertEqual(self.saved(), {f'BaseModel.{instance.id}'})
+
+    def test_flush_without_pending_save(self):
+        """Test that flush doesn't write unsaved changes"""
+        BaseModel()
+        storage.flush()
+        self.assertEqual(self.saved(), set())
+
+    def test_background_flush_after_delay(self):
+        """Test that the thread writes once the delay has passed"""
+        with patch.object(FileStorage, '_flush_delay', 0.05):
+            instance = BaseModel()
+            instance.save()
+            self.wait_until_saved(f'BaseModel.{instance.id}')
+
+    def test_background_flush_after_limit(self):
+        """Test that the thread writes as soon as enough objects wait"""
+        with patch.object(FileStorage, '_flush_limit', 3):
+            BaseModel().save()
+            self.assertEqual(self.saved(), set())
+            objs = BaseModel.create_many(2)
+            self.wait_until_saved(f'BaseModel.{objs[1].id}')
+            self.assertEqual(len(self.saved()), 3)
+
+    def test_batch_is_deferred(self):
+        """Test that the save at the end of a batch is deferred too"""
+        BaseModel.create_many(3)
+        self.assertEqual(self.saved(), set())
+        storage.flush()
+        self.assertEqual(len(self.saved()), 3)
+
+    def test_no_background_write_inside_batch(self):
+        """Test that the thread waits for the end of a batch, and that a
+        rolled back batch leaves the file as before"""
+        user = User()
+        user.first_name = 'good'
+        with patch.object(FileStorage, '_flush_delay', 0.05):
+            user.save()
+            with self.assertRaises(RuntimeError):
+                with storage.batch():
+                    user.first_name = 'ROLLED_BACK'
+                    ghost = User()
+                    storage.save()
+                    time.sleep(0.2)
+                    self.assertEqual(self.saved(), set())
+                    raise RuntimeError
+            self.wait_until_saved(f'User.{user.id}')
+        with open(self.path, 'r') as f:
+            saved = json.load(f)
+        self.assertEqual(saved[f'User.{user.id}']['first_name'], 'good')
+        self.assertNotIn(f'User.{ghost.id}', saved)
+        self.assertEqual(user.first_name, 'good')
+
+    def test_background_error_is_raised_again(self):
+        """Test that a failed background write is raised by the next save
+        and that its changes are written later"""
+        instance = BaseModel()
+        with patch.object(FileStorage, '_flush_delay', 0.01), \
+                patch.object(FileStorage, '_write', autospec=True,
+                             side_effect=OSError('disk full')):
+            instance.save()
+            deadline = time.monotonic() + 5
+            while FileStorage._flush_error is None:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        with self.assertRaises(OSError):
+            storage.save()
+        storage.save()
+        storage.flush()
+        self.assertEqual(self.saved(), {f'BaseModel.{instance.id}'})
+
+    def test_flush_writes_before_raising_background_error(self):
+        """Test that flush writes the changes of a failed background write
+        before raising its error"""
+        instance = BaseModel()
+        with patch.object(FileStorage, '_flush_delay', 0.01), \
+                patch.object(FileStorage, '_write', autospec=True,
+                             side_effect=OSError('disk full')):
+            instance.save()
+            deadline = time.monotonic() + 5
+            while FileStorage._flush_error is None:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        with self.assertRaises(OSError):
+            storage.flush()
+        self.assertEqual(self.saved(), {f'BaseModel.{instance.id}'})
+
+
+def save_objects(count):
+    """Create and save count objects one at a time, run in a child process"""
+    for i in range(count):
+        BaseModel().save()
+
+
+class TestFileStorageProcesses(TemporaryStoreTestCase):
+    """Class for testing processes sharing the file"""
+
+    def write_from_other_process(self, records):
+        """Replace the file the way another process saving records would"""
+        tmp = f'{self.path}.other'
+        with open(tmp, 'w') as f:
+            json.dump(records, f)
+        os.replace(tmp, self.path)
+
+    def saved(self):
+        """Return the records in the file"""
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def test_save_merges_objects_saved_by_other_process(self):
+        """Test that objects saved by another process are not lost"""
+        first = BaseModel()
+        storage.save()
+        now = datetime.now().isoformat()
+        other = User(id=str(uuid.uuid4()), created_at=now, updated_at=now)
+        records = self.saved()
+        records[f'User.{other.id}'] = other.to_dict()
+        self.write_from_other_process(records)
+        second = BaseModel()
+        storage.save()
+        self.assertCountEqual(
+            self.saved(),
+            [f'BaseModel.{first.id}', f'User.{other.id}',
+             f'BaseModel.{second.id}'])
+        self.assertIn(f'User.{other.id}', storage.all())
+
+    def test_own_changes_win_over_other_process(self):
+        """Test that objects changed since the last save are written over
+        the records of another process"""
+        mine = User()
+        theirs = User()
+        storage.save()
+        records = self.saved()
+        records[f'User.{mine.id}']['first_name'] = 'Other'
+        records[f'User.{theirs.id}']['first_name'] = 'Other'
+        self.write_from_other_process(records)
+        mine.first_name = 'Mine'
+        storage.save()
+        saved = self.saved()
+        self.assertEqual(saved[f'User.{mine.id}']['first_name'], 'Mine')
+        self.assertEqual(saved[f'User.{theirs.id}']['first_name'], 'Other')
+        self.assertEqual(theirs.first_name, 'Other')
+        self.assertIs(storage.all()[f'User.{theirs.id}'], theirs)
+
+    def test_refresh_drops_objects_deleted_by_other_process(self):
+        """Test that refresh removes the objects deleted in the file"""
+        kept = BaseModel()
+        deleted = BaseModel()
+        storage.save()
+        records = self.saved()
+        del records[f'BaseModel.{deleted.id}']
+        self.write_from_other_process(records)
+        self.assertTrue(storage.refresh())
+        self.assertNotIn(f'BaseModel.{deleted.id}', storage.all())
+        self.assertIn(f'BaseModel.{kept.id}', storage.all())
+
+    def test_refresh_skips_unchanged_file(self):
+        """Test that refresh doesn't read a file that didn't change"""
+        BaseModel()
+        storage.save()
+        with patch.object(FileStorage, '_FileStorage__read_store') as read:
+            self.assertFalse(storage.refresh())
+            storage.save()
+        read.assert_not_called()
+
+    @unittest.skipIf(file_storage.fcntl is None, "fcntl is not available")
+    def test_save_takes_exclusive_lock(self):
+        """Test that save holds an exclusive lock and reload a shared one"""
+        fcntl = file_storage.fcntl
+        with patch.object(fcntl, 'flock', wraps=fcntl.flock) as flock:
+            storage.save()
+            storage.reload()
+        operations = [call.args[1] for call in flock.call_args_list]
+        self.assertEqual(
+            operations,
+            [fcntl.LOCK_EX, fcntl.LOCK_UN, fcntl.LOCK_SH, fcntl.LOCK_UN])
+
+    @unittest.skipUnless(
+        'fork' in multiprocessing.get_all_start_methods(),
+        "fork is not available")
+    def test_concurrent_processes_keep_all_objects(self):
+        """Test that no object is lost when processes save at once"""
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=save_objects, args=(20,))
+            for i in range(3)
+            ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        storage.reload()
+        self.assertEqual(storage.count(BaseModel), 60)
+
+
 if __name__ == '__main__':
     unittest.main()
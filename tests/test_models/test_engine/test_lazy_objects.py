@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+"""Test module for LazyObjects class"""
+
+import unittest
+
+from models.engine.lazy_objects import LazyObjects
+
+
+class Built(object):
+    """Object built from a record"""
+
+    def __init__(self, record):
+        """Keep the record the object was built from"""
+        self.record = record
+
+
+class TestLazyObjects(unittest.TestCase):
+    """Class for testing the LazyObjects dictionary"""
+
+    def setUp(self):
+        """Setup a LazyObjects holding one object and one record"""
+        self.built = Built({'id': '1'})
+        self.objects = LazyObjects()
+        self.objects.loader = Built
+        self.objects.update({'A.1': self.built, 'A.2': {'id': '2'}})
+
+    def test_is_dict(self):
+        """Test that LazyObjects is a dictionary"""
+        self.assertIsInstance(self.objects, dict)
+
+    def test_getitem_builds_record(self):
+        """Test that a record is built on access and only once"""
+        obj = self.objects['A.2']
+        self.assertIsInstance(obj, Built)
+        self.assertEqual(obj.record, {'id': '2'})
+        self.assertIs(self.objects['A.2'], obj)
+
+    def test_getitem_returns_built_object(self):
+        """Test that objects already built are returned as they are"""
+        self.assertIs(self.objects['A.1'], self.built)
+
+    def test_record(self):
+        """Test that record only returns records not built yet"""
+        self.assertEqual(self.objects.record('A.2'), {'id': '2'})
+        self.assertIsNone(self.objects.record('A.1'))
+        self.objects['A.2']
+        self.assertIsNone(self.objects.record('A.2'))
+
+    def test_get(self):
+        """Test that get builds records and returns default for missing
+        keys"""
+        self.assertIsInstance(self.objects.get('A.2'), Built)
+        self.assertIsNone(self.objects.get('A.3'))
+        self.assertEqual(self.objects.get('A.3', 0), 0)
+
+    def test_values_and_items(self):
+        """Test that values and items only yield built objects"""
+        for obj in self.objects.values():
+            self.assertIsInstance(obj, Built)
+        for key, obj in self.objects.items():
+            self.assertIs(self.objects[key], obj)
+
+    def test_views(self):
+        """Test that values and items are views that can be reused"""
+        values = self.objects.values()
+        self.assertEqual(len(values), 2)
+        self.assertEqual(list(values), list(values))
+        items = self.objects.items()
+        self.assertEqual(len(items), 2)
+        self.assertIn(('A.1', self.built), items)
+        self.assertEqual(list(items), list(items))
+
+    def test_dict_copies_build_records(self):
+        """Test that dict() and ** copy built objects"""
+        for copy in (dict(self.objects), {**self.objects}):
+            self.assertIsInstance(copy['A.2'], Built)
+        self.assertIsNone(self.objects.record('A.2'))
+
+    def test_contains_and_len_do_not_build(self):
+        """Test that membership and length don't build records"""
+        self.assertIn('A.2', self.objects)
+        self.assertEqual(len(self.objects), 2)
+        self.assertIsNotNone(self.objects.record('A.2'))
+
+    def test_pop(self):
+        """Test that pop returns the built object"""
+        self.assertIsInstance(self.objects.pop('A.2'), Built)
+        self.assertNotIn('A.2', self.objects)
+        self.assertEqual(self.objects.pop('A.2', None), None)
+        with self.assertRaises(KeyError):
+            self.objects.pop('A.2')
+
+    def test_copy_and_equality(self):
+        """Test that copies and comparisons use built objects"""
+        copy = self.objects.copy()
+        self.assertIs(type(copy), dict)
+        self.assertEqual(copy, self.objects)
+        self.assertEqual(self.objects, copy)
+        del copy['A.1']
+        self.assertNotEqual(self.objects, copy)
+
+    def test_decoder(self):
+        """Test that a tuple is decoded into a record on access"""
+        records = {'3': {'id': '3'}}
+        self.objects.decoder = records.get
+        dict.__setitem__(self.objects, 'A.3', ('3',))
+        self.assertEqual(self.objects.record('A.3'), {'id': '3'})
+        obj = self.objects['A.3']
+        self.assertEqual(obj.record, {'id': '3'})
+        self.assertIs(self.objects['A.3'], obj)
+
+
+if __name__ == '__main__':
+    unittest.main()
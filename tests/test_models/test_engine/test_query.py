@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+"""Test module for Query class"""
+
+import sys
+import unittest
+from unittest.mock import patch
+
+from models.place import Place
+from models.engine.base_storage import BaseStorage
+from models.engine.query import Query
+
+
+class MemoryStorage(BaseStorage):
+    """Storage engine keeping the objects in memory only"""
+
+    def _write(self):
+        """Forget the changes"""
+        self._dirty.clear()
+
+
+storage = MemoryStorage()
+
+
+class TestQuery(unittest.TestCase):
+    """Class for testing queries and the query planner"""
+
+    def setUp(self):
+        """Setup places in an empty storage"""
+        storage._load({})
+        self.places = []
+        for i, (city, price, guests) in enumerate(
+                [('c1', 50, 4), ('c1', 150, 4), ('c2', 80, 2), ('c2', 80, 6),
+                 ('c3', 120, 4)]):
+            place = Place(id=str(i), name=f'p{i}', city_id=city,
+                          price_by_night=price, max_guest=guests)
+            storage.new(place)
+            self.places.append(place)
+
+    def test_query_returns_query(self):
+        """Test that storage.query returns a query over a class"""
+        query = storage.query(Place)
+        self.assertIsInstance(query, Query)
+        self.assertEqual(list(query), self.places)
+        self.assertEqual(list(storage.query('User')), [])
+
+    def test_where(self):
+        """Test that where keeps the objects matching every condition"""
+        query = storage.query(Place).where(
+            ('price_by_night', '<', 100), ('max_guest', '>=', 4))
+        self.assertEqual(list(query), [self.places[0], self.places[3]])
+        query = storage.query(Place).where(city_id='c2', max_guest=2)
+        self.assertEqual(list(query), [self.places[2]])
+
+    def test_operators(self):
+        """Test every supported operator"""
+        expected = {
+            '==': [2, 3], '=': [2, 3], '!=': [0, 1, 4], '<': [0],
+            '<=': [0, 2, 3], '>': [1, 4], '>=': [1, 2, 3, 4],
+            }
+        for op, indexes in expected.items():
+            query = storage.query(Place).where(('price_by_night', op, 80))
+            self.assertCountEqual(list(query),
+                                  [self.places[i] for i in indexes], op)
+
+    def test_unsupported_operator(self):
+        """Test that an unknown operator raises ValueError"""
+        with self.assertRaises(ValueError):
+            storage.query(Place).where(('price_by_night', '~', 80))
+
+    def test_values_that_cannot_be_compared(self):
+        """Test that values of another type don't match"""
+        query = storage.query(Place).where(('price_by_night', '<', 'a'))
+        self.assertEqual(list(query), [])
+        query = storage.query(Place).where(('missing', '==', None))
+        self.assertEqual(list(query), [])
+
+    def test_order_by(self):
+        """Test sorting in ascending and descending order"""
+        query = storage.query(Place).order_by('price_by_night')
+        self.assertEqual([place.price_by_night for place in query],
+                         [50, 80, 80, 120, 150])
+        query = storage.query(Place).order_by('-price_by_night')
+        self.assertEqual([place.price_by_night for place in query],
+                         [150, 120, 80, 80, 50])
+
+    def test_limit(self):
+        """Test that limit keeps the first results, sorted or not"""
+        self.assertEqual(list(storage.query(Place).limit(2)),
+                         self.places[:2])
+        query = storage.query(Place).order_by('-price_by_night').limit(2)
+        self.assertEqual(list(query), [self.places[1], self.places[4]])
+        self.assertEqual(list(storage.query(Place).limit(0)), [])
+
+    def test_invalid_limit(self):
+        """Test that limit rejects invalid counts"""
+        with self.assertRaises(TypeError):
+            storage.query(Place).limit('2')
+        with self.assertRaises(ValueError):
+            storage.query(Place).limit(-1)
+        with self.assertRaises(ValueError):
+            storage.query(Place).limit(sys.maxsize + 1)
+
+    def test_offset(self):
+        """Test that offset skips the first results, sorted or not"""
+        self.assertEqual(list(storage.query(Place).offset(3)),
+                         self.places[3:])
+        self.assertEqual(list(storage.query(Place).offset(1).limit(2)),
+                         self.places[1:3])
+        query = storage.query(Place).order_by('-price_by_night')
+        self.assertEqual([place.price_by_night
+                          for place in query.offset(1).limit(2)], [120, 80])
+        query = storage.query(Place).where(city_id='c2').order_by('-name')
+        self.assertEqual(list(query.offset(1)), [self.places[2]])
+        query = storage.query(Place).where(('max_guest', '>=', 4))
+        self.assertEqual(
+            [place.price_by_night for place in
+             query.order_by('price_by_night').offset(1).limit(2)], [80, 120])
+        with self.assertRaises(TypeError):
+            storage.query(Place).offset('1')
+        with self.assertRaises(ValueError):
+            storage.query(Place).offset(-1)
+        with self.assertRaises(ValueError):
+            storage.query(Place).offset(sys.maxsize + 1)
+        query = storage.query(Place).offset(sys.maxsize).limit(sys.maxsize)
+        self.assertEqual(list(query), [])
+
+    def test_select(self):
+        """Test that select returns dictionaries of the given attributes"""
+        query = storage.query(Place).where(city_id='c3').select(
+            'name', 'price_by_night')
+        self.assertEqual(list(query), [{'name': 'p4', 'price_by_night': 120}])
+
+    def test_planner_uses_indexes(self):
+        """Test that an equality on an indexed attribute narrows down the
+        objects to check"""
+        keys = storage._candidates('Place', [('city_id', '==', 'c1')])
+        self.assertEqual(list(keys), ['Place.0', 'Place.1'])
+        keys = storage._candidates('Place', [('name', '==', 'p1')])
+        self.assertEqual(len(keys), 5)
+        keys = storage._candidates('Place', [('city_id', '!=', 'c1')])
+        self.assertEqual(len(keys), 5)
+
+    def test_planner_uses_range_indexes(self):
+        """Test that range conditions only check the part of the sorted
+        index within their bounds"""
+        keys = storage._candidates(
+            'Place', [('price_by_night', '>', 50),
+                      ('price_by_night', '<=', 120)])
+        self.assertEqual(keys, ['Place.2', 'Place.3', 'Place.4'])
+        keys = storage._candidates(
+            'Place', [('price_by_night', '>=', 80), ('max_guest', '>', 4)])
+        self.assertEqual(keys, ['Place.3'])
+        keys = storage._candidates('Place', [('price_by_night', '<', 'a')])
+        self.assertEqual(len(keys), 5)
+
+    def test_ties_keep_insertion_order(self):
+        """Test that objects with the same value come out in the same order
+        as a stable sort, whether the range index is walked or not"""
+        for reverse in (False, True):
+            expected = sorted(self.places, reverse=reverse,
+                              key=lambda place: place.price_by_night)
+            order = f"{'-' if reverse else ''}price_by_night"
+            self.assertEqual(list(storage.query(Place).order_by(order)),
+                             expected)
+            with patch.object(MemoryStorage, '_ordered', return_value=None):
+                self.assertEqual(
+                    list(storage.query(Place).order_by(order)), expected)
+                self.assertEqual(
+                    list(storage.query(Place).order_by(order).limit(3)),
+                    expected[:3])
+
+    def test_range_index_follows_changes(self):
+        """Test that the range indexes follow updates and deletes"""
+        self.places[0].price_by_night = 200
+        storage.touch(self.places[0])
+        storage.delete(self.places[1])
+        query = storage.query(Place).where(('price_by_night', '>', 100))
+        self.assertCountEqual(list(query), [self.places[0], self.places[4]])
+        self.assertEqual(
+            storage._ordered('Place', 'price_by_night'),
+            ['Place.2', 'Place.3', 'Place.4', 'Place.0'])
+
+    def test_non_numbers_are_not_range_indexed(self):
+        """Test that objects holding other values are still found by
+        queries going through the whole class"""
+        self.places[2].price_by_night = 'free'
+        storage.touch(self.places[2])
+        self.assertIsNone(storage._ordered('Place', 'price_by_night'))
+        query = storage.query(Place).where(price_by_night='free')
+        self.assertEqual(list(query), [self.places[2]])
+        query = storage.query(Place).where(('price_by_night', '<', 100))
+        self.assertEqual(list(query), [self.places[0], self.places[3]])
+
+    def test_top_k_walks_the_range_index(self):
+        """Test that sorted and limited queries stop after the first
+        results"""
+        with patch.object(Query, '_Query__matches', autospec=True,
+                          return_value=True) as matches:
+            query = storage.query(Place).order_by('-price_by_night').limit(2)
+            self.assertEqual(list(query), [self.places[1], self.places[4]])
+        self.assertEqual(matches.call_count, 2)
+
+    def test_range_indexes_after_load(self):
+        """Test that the range indexes are sorted after a load"""
+        storage._load({
+            f'Place.{i}': {'__class__': 'Place', 'id': str(i),
+                           'latitude': latitude}
+            for i, latitude in enumerate([3.5, -1.0, 2.25])
+            })
+        self.assertEqual(storage._ordered('Place', 'latitude'),
+                         ['Place.1', 'Place.2', 'Place.0'])
+        query = storage.query(Place).where(('latitude', '>', 0))
+        self.assertEqual([place.id for place in query], ['2', '0'])
+
+    def test_results_are_streamed(self):
+        """Test that objects are checked as results are consumed"""
+        with patch.object(Query, '_Query__matches', autospec=True,
+                          return_value=True) as matches:
+            results = iter(storage.query(Place))
+            next(results)
+        self.assertEqual(matches.call_count, 1)
+
+    def test_query_follows_updates(self):
+        """Test that queries use the indexes updated after a change"""
+        self.places[0].city_id = 'c3'
+        storage.touch(self.places[0])
+        query = storage.query(Place).where(city_id='c3')
+        self.assertCountEqual(list(query), [self.places[0], self.places[4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+"""Test module for the storage file formats"""
+
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+from models.engine import serializers
+
+
+class TestSerializers(unittest.TestCase):
+    """Class for testing writing and reading records in every format"""
+
+    def setUp(self):
+        """Setup records to serialize"""
+        self.records = {
+            f'User.{i}': {
+                'id': str(i),
+                'created_at': '2023-05-14T15:15:33.268285',
+                'first_name': 'Brian\nKim',
+                '__class__': 'User',
+            }
+            for i in range(3)
+        }
+
+    def dumps(self, name, records):
+        """Return the content written for records in the given format"""
+        serializer = serializers.formats[name]
+        tmp = tempfile.TemporaryFile()
+        serializer.write(tmp, [
+            serializer.fragment(key, record)
+            for key, record in records.items()
+        ])
+        tmp.seek(0)
+        with tmp:
+            return tmp.read()
+
+    def test_round_trip(self):
+        """Test that every format loads the records it writes"""
+        for name, serializer in serializers.formats.items():
+            data = self.dumps(name, self.records)
+            self.assertEqual(serializer.loads(data), self.records)
+            self.assertEqual(serializers.detect(data).loads(data),
+                             self.records)
+
+    def test_round_trip_without_records(self):
+        """Test that every format handles an empty store"""
+        for name, serializer in serializers.formats.items():
+            data = self.dumps(name, {})
+            self.assertEqual(serializer.loads(data), {})
+
+    def test_json_is_same_as_json_dump(self):
+        """Test that the json format is the original file.json format"""
+        self.assertEqual(self.dumps('json', self.records),
+                         json.dumps(self.records, indent=4).encode())
+        self.assertEqual(self.dumps('json', {}), b'{}')
+
+    def test_compact_is_smaller(self):
+        """Test that the compact format is smaller than the json format"""
+        self.assertLess(len(self.dumps('compact', self.records)),
+                        len(self.dumps('json', self.records)))
+
+    def test_detect(self):
+        """Test that binary files are detected by their header"""
+        binary = self.dumps('binary', self.records)
+        self.assertIs(serializers.detect(binary),
+                      serializers.formats['binary'])
+        self.assertIs(serializers.detect(b'{}'), serializers.formats['json'])
+
+    def test_binary_frames(self):
+        """Test that the keys of a binary file are read without its
+        records"""
+        serializer = serializers.formats['binary']
+        data = self.dumps('binary', self.records)
+        frames = list(serializer.frames(data))
+        self.assertEqual([key for key, offset, length in frames],
+                         list(self.records))
+        key, offset, length = frames[1]
+        self.assertEqual(serializer.load_frame(data, offset, length),
+                         self.records[key])
+
+    def test_binary_refuses_classes(self):
+        """Test that a binary file can't load classes or functions"""
+        serializer = serializers.formats['binary']
+        data = pickle.dumps(os.getcwd, protocol=5)
+        frame = serializer.header.pack(len(data), 6) + b'User.1' + data
+        with self.assertRaises(ValueError):
+            serializer.loads(serializer.magic + frame)
+
+    def test_truncated_binary_file(self):
+        """Test that a truncated binary file raises ValueError"""
+        data = self.dumps('binary', self.records)
+        with self.assertRaises(ValueError):
+            serializers.formats['binary'].loads(data[:-5])
+
+
+class TestConvert(unittest.TestCase):
+    """Class for testing the conversion of files between formats"""
+
+    def test_convert(self):
+        """Test converting a file to every format and back"""
+        records = {'State.1': {'id': '1', '__class__': 'State'}}
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'file.json')
+            with open(source, 'w') as f:
+                json.dump(records, f, indent=4)
+            for name in serializers.formats:
+                destination = os.path.join(tmp, f'file.{name}')
+                serializers.convert(source, destination, name)
+                with open(destination, 'rb') as f:
+                    data = f.read()
+                self.assertEqual(serializers.formats[name].loads(data),
+                                 records)
+                source = destination
+
+    def test_convert_to_unknown_format(self):
+        """Test that converting to an unknown format raises KeyError"""
+        with self.assertRaises(KeyError):
+            serializers.convert('file.json', 'file.xml', 'xml')
+
+
+if __name__ == '__main__':
+    unittest.main()